@@ -21,16 +21,20 @@
 #
 
 import copy
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import wraps
+import queue
 
 from .callbacks import callbacks as _callbacks
 from .deviceaction import ActionCreateDevice
 from .deviceaction import action_type_from_string, action_object_from_string
 from .devicelibs import lvm
-from .devices import PartitionDevice
+from .devices import Device, LVMLogicalVolumeDevice, PartitionDevice
 from .errors import DiskLabelCommitError
+from .flags import flags
 from . import tsort
-from .threads import blivet_lock, SynchronizedMeta
+from .storage_log import trace, traced
+from .threads import blivet_lock, run_delegated, SynchronizedMeta
 
 import logging
 log = logging.getLogger("blivet")
@@ -60,6 +64,7 @@ class ActionList(object, metaclass=SynchronizedMeta):
         self._remove_func = removefunc
         self._actions = []
         self._completed_actions = []
+        self._graph = None
         self.processing = False
 
     def __iter__(self):
@@ -154,39 +159,226 @@ class ActionList(object, metaclass=SynchronizedMeta):
                         self._actions.remove(action)
                         _callbacks.action_removed(action=action)
 
+    def _get_action_groups(self):
+        """ Group the actions whose devices are related to each other.
+
+            Devices are related if they share an ancestor or a container.
+            Apart from the ordering by action type, actions only ever require
+            actions from their own group.
+
+            :returns: lists of indices into the action list, one per group
+            :rtype: list of list of int
+        """
+        groups = {}     # device -> representative device of its group
+
+        def find(device):
+            root = groups.setdefault(device, device)
+            while root is not groups[root]:
+                root = groups[root]
+
+            # compress the path so that later lookups are cheap
+            while device is not root:
+                (device, groups[device]) = (groups[device], root)
+
+            return root
+
+        def union(device, other):
+            (root, other_root) = (find(device), find(other))
+            if root is not other_root:
+                groups[other_root] = root
+
+        for action in self._actions:
+            related = [action.container, getattr(action.device, "container", None)]
+            related.extend(action.device.ancestors)
+            for device in related:
+                if device is not None:
+                    union(action.device, device)
+
+        indices = {}
+        for (idx, action) in enumerate(self._actions):
+            indices.setdefault(find(action.device), []).append(idx)
+
+        return list(indices.values())
+
+    def _get_type_edges(self):
+        """ Return edges making actions of higher types precede lower ones.
+
+            Every non-container action requires all non-container actions of
+            a higher type (see :meth:`~.deviceaction.DeviceAction.requires`).
+            Instead of an edge for each such pair, actions of each type are
+            connected through one extra node per type, which keeps the number
+            of edges linear.
+
+            :returns: the number of extra nodes and the edges
+            :rtype: tuple of (int, list of (int, int))
+        """
+        by_type = {}
+        for (idx, action) in enumerate(self._actions):
+            if not action.is_container:
+                by_type.setdefault(action.type, []).append(idx)
+
+        edges = []
+        n_actions = len(self._actions)
+        types = sorted(by_type.keys(), reverse=True)
+        for (barrier, action_type) in enumerate(types[:-1]):
+            node = n_actions + barrier
+            edges.extend((idx, node) for idx in by_type[action_type])
+            edges.extend((node, idx) for idx in by_type[types[barrier + 1]])
+            if barrier:
+                edges.append((node - 1, node))
+
+        return (max(len(types) - 1, 0), edges)
+
+    def _get_sibling_edges(self, first_node):
+        """ Return edges for the orderings of actions on sibling devices.
+
+            A few rules of :meth:`~.deviceaction.DeviceAction.requires`
+            order actions whose devices don't depend on each other:
+
+                - partitions are created in ascending and destroyed in
+                  descending numerical order on each disk
+                - cached and non-linear LVs are created before the other LVs
+                  in their VG
+                - devices are grown after the shrink actions on devices they
+                  share an ancestor with
+
+            Each rule ranks a set of actions and every action requires all
+            actions of lower ranks in its set. Like the action types in
+            :meth:`_get_type_edges`, consecutive ranks are connected through
+            an extra node.
+
+            :param int first_node: the number of the first extra node
+            :returns: the number of extra nodes and the edges
+            :rtype: tuple of (int, list of (int, int))
+        """
+        ranked = {}     # (rule, device) -> {rank: [action index]}
+
+        def rank(rule, device, value, idx):
+            ranked.setdefault((rule, device), {}).setdefault(value, []).append(idx)
+
+        for (idx, action) in enumerate(self._actions):
+            device = action.device
+            if action.is_device and isinstance(device, PartitionDevice) and device.disk is not None:
+                number = getattr(device.parted_partition, "number", None)
+                if number is None:
+                    pass
+                elif action.is_create:
+                    rank("create partitions", device.disk, number, idx)
+                elif action.is_destroy and device.disklabel_supported:
+                    rank("destroy partitions", device.disk, -number, idx)
+            elif action.is_device and action.is_create and isinstance(device, LVMLogicalVolumeDevice):
+                rank("create cached LVs", device.vg, 0 if device.cached else 1, idx)
+                rank("create non-linear LVs", device.vg, 1 if device.seg_type == "linear" else 0, idx)
+
+            if action.is_shrink or (action.is_grow and action.is_device):
+                for ancestor in device.ancestors:
+                    rank("grow after shrink", ancestor, 1 if action.is_grow else 0, idx)
+
+        edges = []
+        node = first_node
+        for ranks in ranked.values():
+            values = sorted(ranks.keys())
+            for (value, next_value) in zip(values, values[1:]):
+                edges.extend((idx, node) for idx in ranks[value])
+                edges.extend((node, idx) for idx in ranks[next_value])
+                node += 1
+
+        return (node - first_node, edges)
+
+    @staticmethod
+    def _get_related_devices(action):
+        """ Return the devices whose actions the action can require or be required by.
+
+            These are the devices the action's device depends on, its
+            containers and its device. Actions on other devices are only
+            ordered by action type (see :meth:`_get_type_edges`) and by the
+            rules of :meth:`_get_sibling_edges`.
+
+            :rtype: set of :class:`~.devices.Device`
+        """
+        device = action.device
+        related = set(device.ancestors)
+        # devices some devices depend on besides their ancestors
+        related.update(getattr(device, "_internal_lvs", []))
+        if isinstance(device, PartitionDevice) and device.is_logical and device.disk is not None:
+            related.update(p for p in device.disk.children if p.is_extended)
+        for other in (action.container, getattr(device, "container", None),
+                      getattr(device, "origin", None), getattr(device, "source", None)):
+            if isinstance(other, Device):
+                related.add(other)
+
+        return related
+
+    def _get_dependency_edges(self, groups):
+        """ Return edges for the dependencies of actions on related devices.
+
+            Instead of asking every pair of actions in a group whether one
+            requires the other, the actions are looked up by the devices
+            they act on and each action is only compared with the actions on
+            its related devices (see :meth:`_get_related_devices`).
+
+            :param groups: the action groups (see :meth:`_get_action_groups`)
+            :returns: the edges
+            :rtype: list of (int, int)
+        """
+        edges = []
+        for group in groups:
+            by_device = {}
+            for idx in group:
+                action = self._actions[idx]
+                by_device.setdefault(action.device, []).append(idx)
+                if action.is_container:
+                    # member actions are required by actions in the container
+                    by_device.setdefault(action.container, []).append(idx)
+
+            compared = set()
+            for idx in group:
+                action = self._actions[idx]
+                candidates = set()
+                for device in self._get_related_devices(action):
+                    candidates.update(by_device.get(device, []))
+
+                # a pair can be found from both sides, it is compared once
+                for other_idx in sorted(candidates):
+                    pair = (min(idx, other_idx), max(idx, other_idx))
+                    if other_idx == idx or pair in compared:
+                        continue
+
+                    compared.add(pair)
+                    other = self._actions[other_idx]
+                    if action.requires(other):
+                        edges.append((other_idx, idx))
+                    if other.requires(action):
+                        edges.append((idx, other_idx))
+
+        return edges
+
     def sort(self):
         """ Sort actions based on dependencies. """
         if not self._actions:
             return
 
-        edges = []
-
         # collect all ordering requirements for the actions
-        for action in self._actions:
-            action_idx = self._actions.index(action)
-            children = []
-            for _action in self._actions:
-                if _action == action:
-                    continue
-
-                # create edges based on both action type and dependencies.
-                if _action.requires(action):
-                    children.append(_action)
-
-            for child in children:
-                child_idx = self._actions.index(child)
-                edges.append((action_idx, child_idx))
+        (n_barriers, edges) = self._get_type_edges()
+        (n_sibling_nodes, sibling_edges) = self._get_sibling_edges(len(self._actions) + n_barriers)
+        edges.extend(sibling_edges)
+        groups = self._get_action_groups()
+        edges.extend(self._get_dependency_edges(groups))
 
         # create a graph reflecting the ordering information we have
-        graph = tsort.create_graph(list(range(len(self._actions))), edges)
+        graph = tsort.create_graph(list(range(len(self._actions) + n_barriers + n_sibling_nodes)), edges)
 
         # perform a topological sort based on the graph's contents
         order = tsort.tsort(graph)
 
+        # keep the graph around for executing independent actions concurrently
+        self._graph = (self._actions, graph, groups)
+
         # now replace self._actions with a sorted version of the same list
         actions = []
         for idx in order:
-            actions.append(self._actions[idx])
+            if idx < len(self._actions):
+                actions.append(self._actions[idx])
         self._actions = actions
 
     def _pre_process(self, devices=None):
@@ -239,12 +431,13 @@ class ActionList(object, metaclass=SynchronizedMeta):
 
         log.info("sorting actions...")
         self.sort()
-        for action in self._actions:
-            log.debug("action: %s", action)
+        with lvm.devices_batch():
+            for action in self._actions:
+                log.debug("action: %s", action)
 
-            for device in (d for d in devices if d.depends_on(action.device)):
-                if device.format.type == "lvmpv":
-                    lvm.lvm_devices_add(device.path)
+                for device in (d for d in devices if d.depends_on(action.device)):
+                    if device.format.type == "lvmpv":
+                        lvm.lvm_devices_add(device.path)
 
     def _post_process(self, devices=None):
         """ Clean up relics from action queue execution. """
@@ -266,6 +459,7 @@ class ActionList(object, metaclass=SynchronizedMeta):
             partition.parted_partition = pdisk.getPartitionByPath(partition.path)
 
     @with_flag("processing")
+    @traced
     def process(self, callbacks=None, devices=None, fstab=None, dry_run=None):
         """
         Execute all registered actions.
@@ -281,6 +475,12 @@ class ActionList(object, metaclass=SynchronizedMeta):
 
         skip_fstab = fstab is None or fstab.dest_file is None
 
+        if not dry_run and flags.action_workers > 1 and len(self._actions) > 1:
+            with blivet_lock:
+                self._process_parallel(callbacks, devices, None if skip_fstab else fstab)
+            self._post_process(devices=devices)
+            return
+
         for action in self._actions[:]:
             log.info("executing action: %s", action)
             if dry_run:
@@ -289,47 +489,243 @@ class ActionList(object, metaclass=SynchronizedMeta):
             # get (b)efore (a)ction.(e)xecute fstab entry
             # (device may not exist afterwards)
             if not skip_fstab:
-                try:
-                    entry = fstab.entry_from_action(action)
-                except ValueError:
-                    # this device should not be in fstab
-                    bae_entry = None
-                else:
-                    bae_entry = fstab.find_entry(entry=entry)
+                bae_entry = self._get_fstab_entry(fstab, action)
 
             with blivet_lock:
-
-                try:
-                    action.execute(callbacks)
-                except DiskLabelCommitError:
-                    # it's likely that a previous action
-                    # triggered setup of an lvm or md device.
-                    # include deps no longer in the tree due to pending removal
-                    devs = devices + [a.device for a in self._actions]
-                    for dep in set(devs):
-                        if dep.exists and \
-                           any(dep.depends_on(disk) for disk in action.device.disks):
-                            dep.teardown(recursive=True)
-
-                    action.execute(callbacks)
-
-                for device in devices:
-                    # make sure we catch any renumbering parted does
-                    if device.exists and isinstance(device, PartitionDevice):
-                        # also update existence for partitions on unsupported disklabels
-                        if not device.disklabel_supported and \
-                           action.is_destroy and action.is_format and action.device == device.disk:
-                            device.exists = False
-                            continue
-
-                        device.update_name()
-                        device.format.device = device.path
-
-                self._completed_actions.append(self._actions.pop(0))
-                _callbacks.action_executed(action=action)
-
-                if not skip_fstab:
-                    fstab.update(action, bae_entry)
-                    fstab.write()
+                self._execute_action(action, callbacks, devices)
+                self._update_partitions(action, devices)
+                self._complete_action(action, None if skip_fstab else fstab,
+                                      None if skip_fstab else bae_entry)
 
         self._post_process(devices=devices)
+
+    def _get_fstab_entry(self, fstab, action):
+        """ Return the fstab entry of an action's device as it is before the action. """
+        try:
+            entry = fstab.entry_from_action(action)
+        except ValueError:
+            # this device should not be in fstab
+            return None
+        else:
+            return fstab.find_entry(entry=entry)
+
+    def _execute_action(self, action, callbacks, devices):
+        with trace("execute", action):
+            try:
+                action.execute(callbacks)
+            except DiskLabelCommitError:
+                # it's likely that a previous action
+                # triggered setup of an lvm or md device.
+                # include deps no longer in the tree due to pending removal
+                devs = devices + [a.device for a in self._actions]
+                for dep in set(devs):
+                    if dep.exists and \
+                       any(dep.depends_on(disk) for disk in action.device.disks):
+                        dep.teardown(recursive=True)
+
+                action.execute(callbacks)
+
+    def _update_partitions(self, action, devices):
+        # only the partitions on the disks the action changed can be renumbered
+        disks = action.device.disks
+        for device in devices:
+            # make sure we catch any renumbering parted does
+            if device.exists and isinstance(device, PartitionDevice) and device.disk in disks:
+                # also update existence for partitions on unsupported disklabels
+                if not device.disklabel_supported and \
+                   action.is_destroy and action.is_format and action.device == device.disk:
+                    device.exists = False
+                    continue
+
+                device.update_name()
+                device.format.device = device.path
+
+    def _complete_action(self, action, fstab=None, bae_entry=None):
+        self._actions.remove(action)
+        self._completed_actions.append(action)
+        _callbacks.action_executed(action=action)
+
+        if fstab is not None:
+            fstab.update(action, bae_entry)
+            fstab.write()
+
+    def _is_exclusive(self, action):
+        """ Return whether an action must not run concurrently with another such action.
+
+            libparted is not thread-safe and the LVM configuration (including
+            the list of devices LVM may use) is global, so the actions using
+            either of them run one at a time.
+        """
+        device = action.device
+        if isinstance(device, PartitionDevice) or device.partitioned or \
+           "disklabel" in (action.format.type, device.original_format.type):
+            return True
+
+        # md arrays remove stale LVM metadata from their members when created
+        return device.type.startswith("lvm") or device.type == "mdarray" or \
+            "lvmpv" in (action.format.type, device.format.type)
+
+    def _execute_delegated(self, action, callbacks, devices, exclusive):
+        self._execute_action(action, callbacks, devices)
+        if exclusive:
+            # still serialized with the other parted actions
+            self._update_partitions(action, devices)
+
+    def _get_dispatched_callbacks(self, callbacks, requests):
+        """ Return callbacks that are run by the thread processing the actions.
+
+            :param callbacks: the callbacks passed to :meth:`process`
+            :type callbacks: :class:`~.callbacks.DoItCallbacks`
+            :param requests: queue the worker threads put the calls into
+            :type requests: :class:`queue.Queue`
+
+            The worker thread calling one of the returned callbacks waits
+            until :meth:`_process_parallel` has run the original callback and
+            gets its return value (or exception).
+        """
+        if callbacks is None:
+            return None
+
+        def dispatch(callback):
+            if callback is None:
+                return None
+
+            def run_in_caller(data):
+                request = Future()
+                requests.put((callback, data, request))
+                return request.result()
+
+            return run_in_caller
+
+        return callbacks._replace(**dict((field, dispatch(callback))
+                                         for (field, callback) in callbacks._asdict().items()))
+
+    def _process_parallel(self, callbacks, devices, fstab=None):
+        """ Execute the sorted actions using up to flags.action_workers threads.
+
+            Actions run concurrently only if they belong to unrelated devices
+            (see :meth:`_get_action_groups`), all of the actions they require
+            have completed and at most one of them uses parted or changes the
+            LVM configuration (see :meth:`_is_exclusive`). All actions on
+            partitions and disklabels are therefore run one at a time, only
+            the actions on whole disks and the devices on top of them run in
+            parallel.
+
+            Completed actions are reported, and fstab updated, in the sorted
+            order. The callbacks the actions call while executing (see
+            :class:`~.callbacks.DoItCallbacks`) are run by this thread, one at
+            a time, in the order the actions call them. If an action fails,
+            no further actions are started; the ones already running are
+            allowed to finish and are reported as completed before the error
+            is raised.
+
+            Must be called with blivet_lock held. The worker threads execute
+            the actions on behalf of this thread.
+        """
+        (graph_actions, graph, groups) = self._graph
+        order = self._actions[:]
+        position = dict((action, pos) for (pos, action) in enumerate(order))
+        group_of = {}
+        for (group_idx, group) in enumerate(groups):
+            for idx in group:
+                group_of[idx] = group_idx
+        exclusive = dict((idx, self._is_exclusive(action)) for (idx, action) in enumerate(graph_actions))
+
+        incoming = dict(graph['incoming'])
+        ready = [n for n in graph['items'] if incoming[n] == 0]
+        running = {}        # future -> node
+        busy_groups = set()
+        exclusive_running = False
+        done = set()
+        bae_entries = {}
+        error = None
+        next_completed = 0
+        # finished futures and the callback calls of the workers
+        events = queue.Queue()
+        dispatched_callbacks = self._get_dispatched_callbacks(callbacks, events)
+
+        def priority(node):
+            # barriers first, then actions in the sorted order
+            if node >= len(graph_actions):
+                return -1
+            return position[graph_actions[node]]
+
+        def node_done(node):
+            for child in graph['outgoing'][node]:
+                incoming[child] -= 1
+                if incoming[child] == 0:
+                    ready.append(child)
+
+        with ThreadPoolExecutor(max_workers=flags.action_workers,
+                                thread_name_prefix="action") as executor:
+            while True:
+                # start all actions that are ready and do not share devices
+                # with a running action, in the sorted order
+                while error is None and ready:
+                    ready.sort(key=priority)
+                    startable = next((n for n in ready
+                                      if n >= len(graph_actions) or
+                                      (group_of[n] not in busy_groups and len(running) < flags.action_workers and
+                                       not (exclusive[n] and exclusive_running))),
+                                     None)
+                    if startable is None:
+                        break
+
+                    ready.remove(startable)
+                    if startable >= len(graph_actions):
+                        # barrier node, nothing to execute
+                        node_done(startable)
+                        continue
+
+                    action = graph_actions[startable]
+                    log.info("executing action: %s", action)
+                    if fstab is not None:
+                        bae_entries[action] = self._get_fstab_entry(fstab, action)
+
+                    busy_groups.add(group_of[startable])
+                    exclusive_running = exclusive_running or exclusive[startable]
+                    future = executor.submit(run_delegated, self._execute_delegated,
+                                             action, dispatched_callbacks, devices, exclusive[startable])
+                    running[future] = startable
+                    future.add_done_callback(events.put)
+
+                if not running:
+                    break
+
+                event = events.get()
+                if not isinstance(event, Future):
+                    (callback, data, request) = event
+                    try:
+                        request.set_result(callback(data))
+                    except Exception as e:  # pylint: disable=broad-except
+                        request.set_exception(e)
+                    continue
+
+                node = running.pop(event)
+                busy_groups.discard(group_of[node])
+                if exclusive[node]:
+                    exclusive_running = False
+                action = graph_actions[node]
+                try:
+                    event.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    log.error("action failed: %s: %s", action, e)
+                    if error is None:
+                        error = e
+                else:
+                    done.add(action)
+                    node_done(node)
+
+                # report the completed actions in the sorted order
+                while next_completed < len(order) and order[next_completed] in done:
+                    action = order[next_completed]
+                    self._complete_action(action, fstab, bae_entries.get(action))
+                    next_completed += 1
+
+        if error is not None:
+            # report the actions that completed after the failed one, too
+            for action in order[next_completed:]:
+                if action in done:
+                    self._complete_action(action, fstab, bae_entries.get(action))
+
+            raise error
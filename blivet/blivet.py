@@ -25,6 +25,7 @@ import shelve
 import contextlib
 import time
 import functools
+from collections import defaultdict
 
 from .storage_log import log_method_call, log_exception_info
 from .devices import BTRFSSubVolumeDevice, BTRFSVolumeDevice
@@ -47,7 +48,7 @@ from . import arch
 from . import devicefactory
 from . import __version__
 from . import devicelibs
-from .threads import SynchronizedMeta
+from .threads import blivet_lock, SynchronizedMeta
 from .static_data import encryption_data
 
 import logging
@@ -60,10 +61,59 @@ log = logging.getLogger("blivet")
 FSTAB_PATH = ""
 
 
+class _DeviceViews(object):
+
+    """ Lists of the devices in a device tree at one generation of the tree.
+
+        The lists are built in one pass over the tree and indexed by device
+        type and format type. They must not be modified, :class:`Blivet`
+        returns copies of them.
+    """
+
+    def __init__(self, state, devices):
+        self.state = state      # the tree's generation and the flags the lists depend on
+        self.devices = sorted(devices, key=natural_sort_key)
+        self.by_type = defaultdict(list)
+        self.by_format = defaultdict(list)
+        self.disks = []
+        self.partitioned = []
+        self.partitions = []
+
+        for device in sorted(self.devices, key=lambda d: d.name):
+            self.by_type[device.type].append(device)
+            self.by_format[device.format.type].append(device)
+            if device.is_disk:
+                self.disks.append(device)
+            if device.partitioned:
+                self.partitioned.append(device)
+            if isinstance(device, PartitionDevice):
+                self.partitions.append(device)
+
+    def __deepcopy__(self, memo):
+        # copies build their own views
+        return None
+
+    def of_types(self, *types):
+        """ Devices of the given types sorted by name. """
+        if len(types) == 1:
+            return list(self.by_type.get(types[0], []))
+
+        return sorted((d for t in types for d in self.by_type.get(t, [])),
+                      key=lambda d: d.name)
+
+    def of_format(self, fmt_type):
+        """ Devices with the given format type sorted by name. """
+        return list(self.by_format.get(fmt_type, []))
+
+
 class Blivet(object, metaclass=SynchronizedMeta):
 
     """ Top-level class for managing storage configuration. """
 
+    _unsynchronized_methods = ["do_it"]
+    _shared_methods = ["devices", "partitions", "vgs", "lvs", "thinlvs", "thinpools", "pvs", "mdarrays",
+                       "mdcontainers", "mdmembers", "btrfs_volumes", "stratis_pools", "swaps", "_views"]
+
     def __init__(self):
         # storage configuration variables
         self.edd_dict = {}
@@ -96,6 +146,9 @@ class Blivet(object, metaclass=SynchronizedMeta):
         else:
             log.debug("lsblk output:\n%s", out)
 
+        # views of the devices cached for the tree's current generation
+        self._device_views = None
+
         # these will both be empty until our reset method gets called
         self.devicetree = DeviceTree(ignored_disks=self.ignored_disks,
                                      exclusive_disks=self.exclusive_disks,
@@ -121,12 +174,15 @@ class Blivet(object, metaclass=SynchronizedMeta):
         :param callbacks: callbacks to be invoked when actions are executed
         :type callbacks: return value of the :func:`~.callbacks.create_new_callbacks_register`
 
+        Other threads can read the configuration between the actions, the
+        global lock is only held exclusively while an action is executed.
         """
 
-        self.devicetree.actions.process(callbacks=callbacks, devices=self.devices, fstab=self.fstab)
+        with blivet_lock.upgradable():
+            self.devicetree.actions.process(callbacks=callbacks, devices=self.devices, fstab=self.fstab)
 
-        if self.fstab:
-            self.fstab.read()
+            if self.fstab:
+                self.fstab.read()
 
     @property
     def next_id(self):
@@ -162,12 +218,62 @@ class Blivet(object, metaclass=SynchronizedMeta):
         if flags.include_nodev:
             self.devicetree.handle_nodev_filesystems()
 
+    def refresh(self, devices=None):
+        """ Update storage configuration to reflect changes in the system.
+
+            Only devices that have been added, removed or changed since the
+            last reset or refresh are rescanned; all other device instances
+            are kept. If any actions are scheduled this falls back to a full
+            :meth:`reset`, which cancels them.
+
+            :keyword devices: devices to rescan even if they look unchanged
+            :type devices: list of :class:`~.devices.StorageDevice`
+
+            See :meth:`devicetree.DeviceTree.repopulate` for more information.
+        """
+        if self.devicetree.actions.find():
+            log.info("actions are scheduled, doing a full reset instead of refresh")
+            self.reset()
+            return
+
+        log.info("refreshing Blivet (version %s) instance %s", __version__, self)
+
+        self.devicetree.repopulate(changed=devices)
+        self.edd_dict = get_edd_dict(self.partitioned)
+        self.devicetree.edd_dict = self.edd_dict
+
+        if self.fstab:
+            self.fstab.read()
+
+    def _views(self):
+        """ Views of the devices in the device tree.
+
+            The views are built again only after the tree's generation
+            changed, i.e. after devices were added, removed, hidden, renamed,
+            reformatted, created or destroyed or became (in)complete, or
+            after :attr:`~.flags.Flags.allow_inconsistent_config` changed.
+            Building the views checks the tree for duplicate UUIDs unless
+            inconsistent configurations are allowed, so views built while
+            they were allowed are not reused once they are not.
+
+            :rtype: :class:`_DeviceViews`
+        """
+        state = (self.devicetree.generation, flags.allow_inconsistent_config)
+        views = self._device_views
+        if views is None or views.state != state:
+            # usually called with the lock shared
+            with blivet_lock.caching():
+                views = self._device_views
+                if views is None or views.state != state:
+                    views = _DeviceViews(state, self.devicetree.devices)
+                    self._device_views = views
+
+        return views
+
     @property
     def devices(self):
         """ A list of all the devices in the device tree. """
-        devices = self.devicetree.devices
-        devices.sort(key=natural_sort_key)
-        return devices
+        return list(self._views().devices)
 
     @property
     def disks(self):
@@ -180,12 +286,11 @@ class Blivet(object, metaclass=SynchronizedMeta):
             system's disks.
         """
         disks = []
-        for device in self.devicetree.devices:
-            if device.is_disk:
-                if not device.media_present:
-                    log.info("Skipping disk: %s: No media present", device.name)
-                    continue
-                disks.append(device)
+        for device in self._views().disks:
+            if not device.media_present:
+                log.info("Skipping disk: %s: No media present", device.name)
+                continue
+            disks.append(device)
         disks.sort(key=self.compare_disks_key)
         return disks
 
@@ -203,17 +308,13 @@ class Blivet(object, metaclass=SynchronizedMeta):
             system's disks.
         """
         partitioned = []
-        for device in self.devicetree.devices:
-            if not device.partitioned:
-                continue
-
+        for device in self._views().partitioned:
             if not device.media_present:
                 log.info("Skipping device: %s: No media present", device.name)
                 continue
 
             partitioned.append(device)
 
-        partitioned.sort(key=lambda d: d.name)
         return partitioned
 
     @property
@@ -224,9 +325,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        partitions = [d for d in self.devices if isinstance(d, PartitionDevice)]
-        partitions.sort(key=lambda d: d.name)
-        return partitions
+        return list(self._views().partitions)
 
     @property
     def vgs(self):
@@ -236,9 +335,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        vgs = [d for d in self.devices if d.type == "lvmvg"]
-        vgs.sort(key=lambda d: d.name)
-        return vgs
+        return self._views().of_types("lvmvg")
 
     @property
     def lvs(self):
@@ -248,8 +345,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        lvs = (d for d in self.devices if d.type in ("lvmlv", "lvmthinpool", "lvmthinlv"))
-        return sorted(lvs, key=lambda d: d.name)
+        return self._views().of_types("lvmlv", "lvmthinpool", "lvmthinlv")
 
     @property
     def thinlvs(self):
@@ -259,9 +355,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        thin = [d for d in self.devices if d.type == "lvmthinlv"]
-        thin.sort(key=lambda d: d.name)
-        return thin
+        return self._views().of_types("lvmthinlv")
 
     @property
     def thinpools(self):
@@ -271,9 +365,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        pools = [d for d in self.devices if d.type == "lvmthinpool"]
-        pools.sort(key=lambda d: d.name)
-        return pools
+        return self._views().of_types("lvmthinpool")
 
     @property
     def pvs(self):
@@ -283,10 +375,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        devices = self.devicetree.devices
-        pvs = [d for d in devices if d.format.type == "lvmpv"]
-        pvs.sort(key=lambda d: d.name)
-        return pvs
+        return self._views().of_format("lvmpv")
 
     @property
     def mdarrays(self):
@@ -296,16 +385,12 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        arrays = [d for d in self.devices if d.type == "mdarray"]
-        arrays.sort(key=lambda d: d.name)
-        return arrays
+        return self._views().of_types("mdarray")
 
     @property
     def mdcontainers(self):
         """ A list of the MD containers in the device tree. """
-        arrays = [d for d in self.devices if d.type == "mdcontainer"]
-        arrays.sort(key=lambda d: d.name)
-        return arrays
+        return self._views().of_types("mdcontainer")
 
     @property
     def mdmembers(self):
@@ -315,10 +400,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        devices = self.devicetree.devices
-        members = [d for d in devices if d.format.type == "mdmember"]
-        members.sort(key=lambda d: d.name)
-        return members
+        return self._views().of_format("mdmember")
 
     @property
     def btrfs_volumes(self):
@@ -328,8 +410,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        return sorted((d for d in self.devices if d.type == "btrfs volume"),
-                      key=lambda d: d.name)
+        return self._views().of_types("btrfs volume")
 
     @property
     def stratis_pools(self):
@@ -339,8 +420,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        return sorted((d for d in self.devices if d.type == "stratis pool"),
-                      key=lambda d: d.name)
+        return self._views().of_types("stratis pool")
 
     @property
     def swaps(self):
@@ -350,10 +430,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             does not necessarily reflect the actual on-disk state of the
             system's disks.
         """
-        devices = self.devicetree.devices
-        swaps = [d for d in devices if d.format.type == "swap"]
-        swaps.sort(key=lambda d: d.name)
-        return swaps
+        return self._views().of_format("swap")
 
     @property
     def encryption_passphrase(self):
@@ -1065,18 +1142,19 @@ class Blivet(object, metaclass=SynchronizedMeta):
         else:
             parent_separator = "-"
 
+        names = set(self.names)
         if name_set:
-            if parent and "%s%s%s" % (parent.name, parent_separator, name) not in self.names:
+            if parent and "%s%s%s" % (parent.name, parent_separator, name) not in names:
                 return name
-            elif not parent and name not in self.names:
+            elif not parent and name not in names:
                 return name
 
         for suffix in range(100):
             if parent:
-                if "%s%s%s%02d" % (parent.name, parent_separator, name, suffix) not in self.names:
+                if "%s%s%s%02d" % (parent.name, parent_separator, name, suffix) not in names:
                     return "%s%02d" % (name, suffix)
             else:
-                if "%s%02d" % (name, suffix) not in self.names:
+                if "%s%02d" % (name, suffix) not in names:
                     return "%s%02d" % (name, suffix)
 
         raise RuntimeError("unable to find suitable device name")
@@ -1323,10 +1401,16 @@ class Blivet(object, metaclass=SynchronizedMeta):
         return factory.device
 
     def copy(self):
+        """ Return a copy of this instance.
+
+            The parted disks are only duplicated when the copy (or this
+            instance) accesses them, so disks left untouched in either of
+            them cost nothing.
+        """
         log.debug("starting Blivet copy")
         new = copy.deepcopy(self)
-        # go through and re-get parted_partitions from the disks since they
-        # don't get deep-copied
+        # the parted_partitions don't get deep-copied, they get re-read from
+        # the copied disks on first use
         hidden_partitions = [d for d in new.devicetree._hidden
                              if isinstance(d, PartitionDevice)]
         for partition in new.partitions + hidden_partitions:
@@ -1337,8 +1421,7 @@ class Blivet(object, metaclass=SynchronizedMeta):
             req_disks = (new.devicetree.get_device_by_id(disk.id) for disk in partition.req_disks)
             partition.req_disks = [disk for disk in req_disks if disk is not None]
 
-            p = partition.disk.format.parted_disk.getPartitionByPath(partition.path)
-            partition.parted_partition = p
+            partition._parted_partition_copied = True
 
         log.debug("finished Blivet copy")
         return new
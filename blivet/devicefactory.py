@@ -1052,13 +1052,10 @@ class DeviceFactory(object):
     # methods for error recovery
     #
     def _save_devicetree(self):
-        _blivet_copy = self.storage.copy()
-        self.__devices = _blivet_copy.devicetree._devices
-        self.__actions = _blivet_copy.devicetree._actions
+        self.__savepoint = self.storage.devicetree.savepoint()
 
     def _revert_devicetree(self):
-        self.storage.devicetree._devices = self.__devices
-        self.storage.devicetree._actions = self.__actions
+        self.storage.devicetree.rollback(self.__savepoint)
 
 
 class PartitionFactory(DeviceFactory):
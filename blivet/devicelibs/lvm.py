@@ -23,6 +23,7 @@
 import math
 import os
 import re
+import threading
 
 from collections import namedtuple
 import itertools
@@ -140,12 +141,19 @@ def _set_lvm_devices():
     blockdev.lvm.set_devices_filter(list(_lvm_devices))
 
 
+_devices_batch = threading.local()
+
+
 def needs_config_refresh(fn):
     if not availability.BLOCKDEV_LVM_PLUGIN.available:
         return lambda *args, **kwargs: None
 
     def fn_with_refresh(*args, **kwargs):
         ret = fn(*args, **kwargs)
+        if getattr(_devices_batch, "depth", 0):
+            _devices_batch.pending = True
+            return ret
+
         _set_global_config()
         _set_lvm_devices()
         return ret
@@ -153,6 +161,29 @@ def needs_config_refresh(fn):
     return fn_with_refresh
 
 
+@contextmanager
+def devices_batch():
+    """ Refresh the LVM configuration once for all changes of the devices list in a block.
+
+        Changes of the list of devices LVM is allowed to use made by this
+        thread in the block only take effect when the (outermost) block is
+        left. Do not run LVM commands in the block.
+    """
+    depth = getattr(_devices_batch, "depth", 0)
+    if depth == 0:
+        _devices_batch.pending = False
+
+    _devices_batch.depth = depth + 1
+    try:
+        yield
+    finally:
+        _devices_batch.depth = depth
+        if depth == 0 and _devices_batch.pending:
+            _devices_batch.pending = False
+            _set_global_config()
+            _set_lvm_devices()
+
+
 @needs_config_refresh
 def lvm_devices_add(path):
     """ Add a device (PV) to the list of devices LVM is allowed to use """
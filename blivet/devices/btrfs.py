@@ -566,6 +566,7 @@ class BTRFSSubVolumeDevice(BTRFSDevice):
 
     """ A btrfs subvolume pseudo-device. """
     _type = "btrfs subvolume"
+    _shared_methods = ["volume"]
 
     def __init__(self, *args, **kwargs):
         """
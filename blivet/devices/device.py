@@ -24,7 +24,7 @@ import pprint
 
 from .. import util
 from ..storage_log import log_method_call
-from ..threads import SynchronizedMeta
+from ..threads import blivet_lock, SynchronizedMeta
 
 import logging
 log = logging.getLogger("blivet")
@@ -70,6 +70,13 @@ class Device(util.ObjectID, metaclass=SynchronizedMeta):
     _type = "device"
     _packages = []
     _external_dependencies = []
+    _unsynchronized_methods = ["__setattr__"]
+    _shared_methods = ["name", "_get_name", "parents", "children", "ancestors", "type", "device_id",
+                       "depends_on", "_get_ancestor_cache"]
+
+    # attributes used to look up devices in the device tree (non-existent
+    # devices are always complete)
+    _lookup_key_attrs = frozenset(("_name", "id", "uuid", "sysfs_path", "_format", "exists"))
 
     def __init__(self, name, parents=None):
         """
@@ -93,9 +100,18 @@ class Device(util.ObjectID, metaclass=SynchronizedMeta):
             We can't do copy.deepcopy on parted objects, which is okay.
             For these parted objects, we just do a shallow copy.
         """
-        return util.variable_copy(self, memo,
-                                  omit=('node',),
-                                  shallow=('_parted_partition',))
+        new = util.variable_copy(self, memo,
+                                 omit=('node', '_ancestor_cache'),
+                                 shallow=('_parted_partition',))
+
+        # the copy's ancestors are copies, too
+        new._ancestor_cache = None
+        return new
+
+    def __setattr__(self, name, value):
+        if name in self._lookup_key_attrs and getattr(self, name, None) != value:
+            util.record_change(self)
+        super(Device, self).__setattr__(name, value)
 
     def __repr__(self):
         s = ("%(type)s instance (%(id)s) --\n"
@@ -124,6 +140,7 @@ class Device(util.ObjectID, metaclass=SynchronizedMeta):
             See :attr:`~.ParentList.appendfunc`.
         """
         parent.add_child(self)
+        util.record_change(self)
 
     def _remove_parent(self, parent):
         """ Called before removing a parent from this device.
@@ -131,13 +148,62 @@ class Device(util.ObjectID, metaclass=SynchronizedMeta):
             See :attr:`~.ParentList.removefunc`.
         """
         parent.remove_child(self)
+        util.record_change(self)
+
+    def _parents_changed(self, parent):  # pylint: disable=unused-argument
+        """ Called after adding or removing a parent of this device.
+
+            See :attr:`~.ParentList.changefunc`.
+        """
+        self._invalidate_ancestors()
+
+    def _invalidate_ancestors(self):
+        """ Drop the cached ancestors of this device and its descendants. """
+        # a device's ancestors are only ever cached together with those of
+        # all of its ancestors, so there is no need to go past a device
+        # without cached ancestors
+        devices = [self]
+        while devices:
+            device = devices.pop()
+            if getattr(device, "_ancestor_cache", None) is None and device is not self:
+                continue
+
+            device._ancestor_cache = None
+            devices.extend(getattr(device, "_children", []))
+
+    def _get_ancestor_cache(self):
+        """ Return this device's ancestors and the ancestors to ask about dependencies.
+
+            :returns: all ancestors, including this device, and the other
+                      ancestors whose class extends :meth:`depends_on`
+            :rtype: tuple of (frozenset, tuple)
+        """
+        cache = getattr(self, "_ancestor_cache", None)
+        if cache is not None:
+            return cache
+
+        # usually called with the lock shared
+        with blivet_lock.caching():
+            cache = getattr(self, "_ancestor_cache", None)
+            if cache is None:
+                ancestors = set([self])
+                for parent in self.parents:
+                    ancestors.update(parent._get_ancestor_cache()[0])
+
+                special = tuple(a for a in ancestors
+                                if a is not self and type(a).depends_on is not Device.depends_on)
+                cache = (frozenset(ancestors), special)
+                self._ancestor_cache = cache  # pylint: disable=attribute-defined-outside-init
+
+        return cache
 
     def _init_parent_list(self):
         """ Initialize this instance's parent list. """
         if not hasattr(self, "_parents"):
             # pylint: disable=attribute-defined-outside-init
             self._parents = ParentList(appendfunc=self._add_parent,
-                                       removefunc=self._remove_parent)
+                                       removefunc=self._remove_parent,
+                                       changefunc=self._parents_changed)
 
         # iterate over a copy of the parent list because we are altering it in
         # the for-cycle
@@ -228,14 +294,12 @@ class Device(util.ObjectID, metaclass=SynchronizedMeta):
             :rtype: bool
         """
         # XXX does a device depend on itself?
-        if dep in self.parents:
+        (ancestors, special) = self._get_ancestor_cache()
+        if dep is not self and dep in ancestors:
             return True
 
-        for parent in self.parents:
-            if parent.depends_on(dep):
-                return True
-
-        return False
+        # some devices depend on more than their ancestors
+        return any(a.depends_on(dep) for a in special)
 
     def dracut_setup_args(self):
         return set()
@@ -285,10 +349,7 @@ class Device(util.ObjectID, metaclass=SynchronizedMeta):
     @property
     def ancestors(self):
         """ A list of all of this device's ancestors, including itself. """
-        ancestors = set([self])
-        for p in [d for d in self.parents if d not in ancestors]:
-            ancestors.update(set(p.ancestors))
-        return list(ancestors)
+        return list(self._get_ancestor_cache()[0])
 
     @property
     def packages(self):
@@ -160,7 +160,7 @@ class ParentList(object):
             x = ml[i]   # not ml[i] = x
     """
 
-    def __init__(self, items=None, appendfunc=None, removefunc=None):
+    def __init__(self, items=None, appendfunc=None, removefunc=None, changefunc=None):
         """
             :keyword items: initial contents
             :type items: any iterable
@@ -168,6 +168,8 @@ class ParentList(object):
             :type appendfunc: callable
             :keyword removefunc: a function to call before removing an item
             :type removefunc: callable
+            :keyword changefunc: a function to call after adding or removing an item
+            :type changefunc: callable
 
             appendfunc and removefunc should take the item to be added or
             removed and perform any checks or other processing. The appropriate
@@ -188,6 +190,9 @@ class ParentList(object):
         self.removefunc = removefunc or (lambda i: True)
         """ a function to call before removing an item """
 
+        self.changefunc = changefunc or (lambda i: True)
+        """ a function to call after adding or removing an item """
+
     def __iter__(self):
         return iter(self.items)
 
@@ -213,6 +218,7 @@ class ParentList(object):
 
         self.appendfunc(y)
         self.items.append(y)
+        self.changefunc(y)
 
     def remove(self, y):
         """ Remove an item from the list after running a callback. """
@@ -221,3 +227,4 @@ class ParentList(object):
 
         self.removefunc(y)
         self.items.remove(y)
+        self.changefunc(y)
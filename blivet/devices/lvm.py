@@ -90,6 +90,9 @@ class LVMVolumeGroupDevice(ContainerDevice):
     _format_immutable = True
     _renamable = True
 
+    # incomplete VGs and their LVs are not listed in the device tree
+    _lookup_key_attrs = ContainerDevice._lookup_key_attrs | frozenset(("_complete", "has_duplicate"))
+
     @staticmethod
     def get_supported_pe_sizes():
         return [Size(pe_size) for pe_size in blockdev.lvm.get_supported_pe_sizes()]
@@ -734,6 +737,7 @@ class LVMLogicalVolumeBase(DMDevice, RaidDevice):
     _type = "lvmlv"
     _packages = ["lvm2"]
     _external_dependencies = [availability.BLOCKDEV_LVM_PLUGIN]
+    _shared_methods = ["vg", "pool"]
 
     config_actions_map = {"name": "_rename",
                           "compression": "_set_compression",
@@ -2432,6 +2436,8 @@ class LVMLogicalVolumeDevice(LVMLogicalVolumeBase, LVMInternalLogicalVolumeMixin
     # generally resizable, see :property:`resizable` for details
     _resizable = True
     _renamable = True
+    # the dispatch of the type-specific getters listed in _shared_methods
+    _shared_methods = ["_get_type_classes", "_try_specific_call"]
 
     def __init__(self, name, parents=None, size=None, uuid=None, seg_type=None,
                  fmt=None, exists=False, sysfs_path='', grow=None, maxsize=None,
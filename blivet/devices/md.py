@@ -58,6 +58,11 @@ class MDRaidArrayDevice(ContainerDevice, RaidDevice):
     _type = "mdarray"
     _packages = ["mdadm"]
     _dev_dir = "/dev/md"
+    _shared_methods = ["members", "member_devices", "_get_member_devices"]
+
+    # arrays missing some of their members are not listed in the device tree
+    _lookup_key_attrs = ContainerDevice._lookup_key_attrs | frozenset(("_member_devices",))
+
     _format_class_name = property(lambda s: "mdmember")
     _format_uuid_attr = property(lambda s: "md_uuid")
     _external_dependencies = [availability.BLOCKDEV_MDRAID_PLUGIN]
@@ -649,9 +654,9 @@ class MDRaidArrayDevice(ContainerDevice, RaidDevice):
             raise errors.MDRaidError(err)
 
         udev.settle()
-        for disk in disks:
-            udev.trigger(action="change", path=disk)
-        udev.settle()
+        with udev.settle_batch():
+            for disk in disks:
+                udev.trigger(action="change", path=disk)
 
     def _remove(self, member):
         self.setup()
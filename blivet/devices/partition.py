@@ -20,6 +20,7 @@
 #
 
 import os
+import threading
 import parted
 import _ped
 from uuid import UUID
@@ -34,6 +35,7 @@ from .. import util
 from .. import arch
 from ..flags import flags
 from ..storage_log import log_method_call
+from ..threads import blivet_lock
 from .. import udev
 from ..formats import DeviceFormat, get_format
 from ..devicelibs.gpt import gpt_part_uuid_for_mountpoint
@@ -48,6 +50,10 @@ from .storage import StorageDevice
 from .dm import DMDevice
 from .lib import device_path_to_name, device_name_to_disk_by_path, LINUX_SECTOR_SIZE
 
+# copies look up their parted partitions on access, which may happen in
+# threads holding the global lock shared
+_parted_partition_lock = threading.RLock()
+
 DEFAULT_PART_SIZE = Size("500MiB")
 
 # in case the default partition size doesn't fit
@@ -67,8 +73,13 @@ class PartitionDevice(StorageDevice):
     """
     _type = "partition"
     _resizable = True
+    _shared_methods = ["disk", "_get_disk", "parted_partition", "_get_parted_partition"]
     default_size = DEFAULT_PART_SIZE
 
+    # set by Blivet.copy; the parted partition is looked up in the disklabel
+    # copy's parted disk on first access
+    _parted_partition_copied = False
+
     config_actions_map = {"parted_flags": "_set_parted_flags"}
 
     def __init__(self, name, fmt=None, uuid=None,
@@ -450,7 +461,17 @@ class PartitionDevice(StorageDevice):
         return spec
 
     def _get_parted_partition(self):
-        return self._parted_partition
+        # usually called with the lock shared, the partition is looked up
+        # like a cached value
+        with blivet_lock.caching(), _parted_partition_lock:
+            if self._parted_partition_copied:
+                self._parted_partition = self.disk.format.parted_disk.getPartitionByPath(self.path)
+                self._parted_partition_copied = False
+            elif self._parted_partition is not None and self.disk and self.disk.format.type == "disklabel":
+                # changes made through the partition must not show in copies of the disklabel
+                self.disk.format.unshare_parted_disks()
+
+            return self._parted_partition
 
     def _set_parted_partition(self, partition):
         """ Set this PartitionDevice's parted Partition instance. """
@@ -460,6 +481,7 @@ class PartitionDevice(StorageDevice):
             raise ValueError("partition must be None or a parted.Partition instance")
 
         log.debug("device %s new parted_partition %s", self.name, partition)
+        self._parted_partition_copied = False
         self._parted_partition = partition
         self.update_name()
 
@@ -61,6 +61,9 @@ class StorageDevice(Device):
     _is_disk = False
     _encrypted = False
 
+    _shared_methods = ["path", "map_name", "disks", "is_disk", "partitionable", "partitioned", "format",
+                       "_get_format", "readonly", "protected", "complete"]
+
     config_actions_map = {"name": "_rename"}
 
     def __init__(self, name, fmt=None, uuid=None,
@@ -340,6 +343,8 @@ class StorageDevice(Device):
         if not self.exists:
             raise errors.DeviceError("device has not been created")
 
+        # the device node is only there once udev has processed its uevents
+        udev.settle_pending()
         try:
             udev_device = pyudev.Devices.from_device_file(udev.global_udev,
                                                           self.path)
@@ -495,6 +500,8 @@ class StorageDevice(Device):
                 self.teardown_parents(recursive=recursive)
             return
 
+        # udev must not hold the device open while it is being deactivated
+        udev.settle_pending()
         self._teardown(recursive=recursive)
         self._post_teardown(recursive=recursive)
 
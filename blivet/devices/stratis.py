@@ -314,6 +314,7 @@ class StratisFilesystemDevice(StorageDevice):
     _dev_dir = "/dev/stratis"
     _external_dependencies = [availability.STRATISPREDICTUSAGE_APP, availability.STRATIS_DBUS]
     _min_size = Size("512 MiB")
+    _shared_methods = ["pool"]
 
     def __init__(self, name, parents=None, size=None, uuid=None, exists=False,
                  grow=None, maxsize=None, size_limit=None):
@@ -20,10 +20,13 @@
 # Red Hat Author(s): Dave Lehman <dlehman@redhat.com>
 #
 
+import copy
+import itertools
 import os
 import pprint
 import re
 import warnings
+from collections import defaultdict
 
 import gi
 gi.require_version("BlockDev", "3.0")
@@ -44,7 +47,7 @@ from .flags import flags
 from . import util
 from .populator import PopulatorMixin
 from .storage_log import log_method_call, log_method_return
-from .threads import SynchronizedMeta
+from .threads import blivet_lock, SynchronizedMeta
 from .static_data import lvs_info
 
 import logging
@@ -52,6 +55,278 @@ log = logging.getLogger("blivet")
 
 _LVM_DEVICE_CLASSES = (LVMLogicalVolumeDevice, LVMVolumeGroupDevice)
 
+# generations are unique across trees so that a view of one tree is never
+# mistaken for a view of another one or of a rolled back state
+_generations = itertools.count(1)
+
+
+_LOOKUP_KEYS = ("name", "path", "sysfs_path", "uuid", "device_id", "id")
+
+
+class _DeviceIndex(object):
+    """ Secondary lookup tables for the devices in a device tree.
+
+        The index maps values of the device attributes listed in
+        :data:`_LOOKUP_KEYS` (plus the format's UUID, which is indexed as
+        "uuid") to the devices having them. It is kept up to date by the tree
+        when devices are added, removed, hidden or unhidden. The index
+        watches the indexed devices and their formats with its own
+        :class:`~.util.ChangeLog` and picks up the changes of their lookup
+        attributes before every lookup, so changes of devices in other trees
+        (or in no tree at all) are never looked at.
+
+        Devices are kept in the order of the device tree's device list
+        followed by the hidden device list so that lookups return the same
+        device as a linear search through the lists would.
+    """
+
+    def __init__(self):
+        self._devices = None
+        self._hidden = None
+        self._counts = None
+        self.changes = util.ChangeLog()
+        self._serial = self.changes.serial
+        self._order = itertools.count()
+
+        self._positions = {}        # device -> position in the lists
+        self._hidden_set = set()
+        self._keys = {}             # device -> tuple of (key, value) pairs
+        self._formats = {}          # device -> its indexed format
+        self._format_owners = {}    # id(format) -> device
+        self._maps = dict((key, defaultdict(list)) for key in _LOOKUP_KEYS)
+
+    def __deepcopy__(self, memo):
+        # the copy gets rebuilt from the copied device lists on first use
+        return _DeviceIndex()
+
+    @staticmethod
+    def _get_keys(device):
+        keys = [(key, getattr(device, key, None)) for key in _LOOKUP_KEYS]
+        keys.append(("uuid", getattr(getattr(device, "format", None), "uuid", None)))
+        return tuple((key, value) for (key, value) in keys if value is not None and value != "")
+
+    def _index(self, device):
+        keys = self._get_keys(device)
+        for (key, value) in keys:
+            if device not in self._maps[key][value]:
+                self._maps[key][value].append(device)
+
+        self._keys[device] = keys
+        self.changes.watch(device)
+        fmt = getattr(device, "format", None)
+        if fmt is not None:
+            self._formats[device] = fmt
+            self._format_owners[id(fmt)] = device
+            self.changes.watch(fmt)
+
+    def _unindex(self, device):
+        for (key, value) in self._keys.pop(device, ()):
+            matches = self._maps[key].get(value)
+            if matches and device in matches:
+                matches.remove(device)
+                if not matches:
+                    del self._maps[key][value]
+
+        fmt = self._formats.pop(device, None)
+        if fmt is not None and self._format_owners.get(id(fmt)) is device:
+            del self._format_owners[id(fmt)]
+            self.changes.unwatch(fmt)
+
+    def _reindex(self, device):
+        """ Update the lookup keys of a device and, if its name changed, its descendants. """
+        old_keys = self._keys.get(device, ())
+        self._unindex(device)
+        self._index(device)
+
+        if dict(old_keys).get("name") != dict(self._keys[device]).get("name"):
+            # names and paths of LVs, partitions, etc. are derived from their parents' names
+            for child in getattr(device, "_children", []):
+                if child in self._keys:
+                    self._reindex(child)
+
+    def rebuild(self, devices, hidden):
+        """ Rebuild the index from scratch.
+
+            :param list devices: the tree's device list
+            :param list hidden: the tree's hidden device list
+        """
+        for device in list(self._keys):
+            self._unindex(device)
+            self.changes.unwatch(device)
+
+        self._serial = self.changes.serial
+        self._devices = devices
+        self._hidden = hidden
+        self._positions = {}
+        self._hidden_set = set(hidden)
+        self._keys = {}
+        self._formats = {}
+        self._format_owners = {}
+        self._maps = dict((key, defaultdict(list)) for key in _LOOKUP_KEYS)
+        for device in devices + hidden:
+            self._positions[device] = next(self._order)
+            self._index(device)
+
+        self._counts = (len(devices), len(hidden))
+
+    def sync(self, devices, hidden):
+        """ Make sure the index reflects the current state of the tree.
+
+            :param list devices: the tree's device list
+            :param list hidden: the tree's hidden device list
+        """
+        if devices is not self._devices or hidden is not self._hidden or \
+           self._counts != (len(devices), len(hidden)):
+            # the lists were replaced or modified behind our back
+            self.rebuild(devices, hidden)
+            return
+
+        (self._serial, changed) = self.changes.since(self._serial)
+        if changed is None:
+            self.rebuild(devices, hidden)
+            return
+
+        for obj in changed:
+            if obj not in self._keys:
+                owner = self._format_owners.get(id(obj))
+                if owner is None or getattr(owner, "format", None) is not obj:
+                    continue
+                obj = owner
+
+            self._reindex(obj)
+
+    def add(self, device, hidden=False):
+        """ Add a device that has just been appended to one of the lists. """
+        if device in self._keys:
+            self._unindex(device)
+
+        self._positions[device] = next(self._order)
+        if hidden:
+            self._hidden_set.add(device)
+        else:
+            self._hidden_set.discard(device)
+        self._index(device)
+        self._update_counts()
+
+    def remove(self, device):
+        """ Remove a device that has just been removed from one of the lists. """
+        self._unindex(device)
+        self.changes.unwatch(device)
+        self._positions.pop(device, None)
+        self._hidden_set.discard(device)
+        self._update_counts()
+
+    def _update_counts(self):
+        if self._devices is not None and self._hidden is not None:
+            self._counts = (len(self._devices), len(self._hidden))
+
+    def contains(self, device, hidden=False):
+        """ Return True if the device is in the tree.
+
+            :param device: the device
+            :keyword bool hidden: whether to consider hidden devices
+        """
+        if device not in self._keys:
+            return False
+
+        return hidden or device not in self._hidden_set
+
+    def find(self, key, value, incomplete=False, hidden=False):
+        """ Return a list of devices with a matching lookup key.
+
+            :param str key: the key (one of :data:`_LOOKUP_KEYS`)
+            :param value: the value to match
+            :param bool incomplete: include incomplete devices in result
+            :param bool hidden: include hidden devices in result
+            :returns: the matching devices, in the order of the tree's lists
+            :rtype: list of :class:`~.devices.Device`
+        """
+        matches = [d for d in self._maps[key].get(value, [])
+                   if (hidden or d not in self._hidden_set) and
+                   (incomplete or getattr(d, "complete", True))]
+        return sorted(matches, key=self.sort_key)
+
+    def sort_key(self, device):
+        """ Key function sorting devices in the order of the tree's lists. """
+        return (device in self._hidden_set, self._positions[device])
+
+
+class _Savepoint(object):
+
+    """ State of a device tree that can be restored later.
+
+        Instead of deep-copying the tree, a savepoint keeps a shallow copy of
+        the attributes of the tree, its action list and every device, parent
+        list, format and action it knows about. Lists, sets and dicts held in
+        those attributes are copied as well because they are modified in
+        place (children of a device, LVs of a VG, ...). Parted disks are
+        duplicated since partition allocation changes them in place.
+    """
+
+    def __init__(self, tree):
+        self._states = {}
+        self._parted_disks = []
+
+        self._save(tree)
+        self._save(tree._actions)
+        for action in tree._actions._actions:
+            self._save(action)
+            self._save_device(action.device)
+
+        for device in tree._devices + tree._hidden:
+            self._save_device(device)
+
+    @staticmethod
+    def _copy_state(state):
+        state = dict(state)
+        for (attr, value) in state.items():
+            if isinstance(value, (list, set, dict)):
+                state[attr] = copy.copy(value)
+
+        return state
+
+    def _save(self, obj):
+        if id(obj) not in self._states:
+            self._states[id(obj)] = (obj, self._copy_state(obj.__dict__))
+
+    def _save_device(self, device):
+        if id(device) in self._states:
+            return
+
+        self._save(device)
+        self._save(device.parents)
+        for fmt in (device.format, getattr(device, "original_format", None)):
+            if fmt is not None:
+                if fmt.type == "disklabel":
+                    # the saved state must not refer to parted disks shared with copies
+                    fmt.unshare_parted_disks()
+                self._save(fmt)
+
+        if device.format.type == "disklabel" and device.format._parted_disk is not None:
+            self._parted_disks.append((device.format, device.format._parted_disk.duplicate()))
+
+    def restore(self, tree):
+        """ Restore the saved state.
+
+            :param tree: the device tree the savepoint was created for
+            :type tree: :class:`DeviceTreeBase`
+        """
+        for (obj, state) in self._states.values():
+            obj.__dict__.clear()
+            obj.__dict__.update(self._copy_state(state))
+
+        for (disklabel, parted_disk) in self._parted_disks:
+            disklabel._parted_disk = parted_disk.duplicate()
+
+        # the restored parted disks hold new parted partitions
+        restored = set(id(disklabel) for (disklabel, _parted_disk) in self._parted_disks)
+        for partition in tree._devices + tree._hidden:
+            if isinstance(partition, PartitionDevice) and partition._parted_partition and \
+               id(partition.disk.format) in restored:
+                partition.parted_partition = partition.disk.format.parted_disk.getPartitionByPath(partition.path)
+
+        tree._lookup_index.rebuild(tree._devices, tree._hidden)
+
 
 class DeviceTreeBase(object, metaclass=SynchronizedMeta):
     """ A quasi-tree that represents the devices in the system.
@@ -72,6 +347,11 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
         :class:`~.deviceaction.DeviceAction` instances can only be registered
         for leaf devices, except for resize actions.
     """
+    _shared_methods = ["generation", "devices", "uuids", "labels", "_filter_devices", "_find_devices",
+                       "get_device_by_sysfs_path", "get_device_by_uuid", "get_device_by_label",
+                       "get_device_by_name", "get_device_by_path", "get_device_by_id",
+                       "get_device_by_device_id"]
+
     def __init__(self, ignored_disks=None, exclusive_disks=None):
         """
             :keyword ignored_disks: ignored disks
@@ -80,6 +360,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             :type exclusive_disks: list
         """
         self._devices = []
+        self._lookup_index = _DeviceIndex()
+        self._names = (None, None, [])     # the state of the tree, the LVs and the names in use
         self.reset(ignored_disks, exclusive_disks)
 
     def reset(self, ignored_disks=None, exclusive_disks=None):
@@ -100,6 +382,9 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
                                    removefunc=self._cancel_action)
 
         self._hidden = []
+        self._lookup_index.rebuild(self._devices, self._hidden)
+        self._generation_serial = self._lookup_index.changes.serial
+        self._tree_changed()
 
         lvm.lvm_devices_reset()
 
@@ -153,22 +438,59 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
 
     @property
     def names(self):
-        """ List of devices names """
-        lv_info = list(lvs_info.cache.keys())
+        """ List of devices names
 
-        names = []
-        for dev in self._devices + self._hidden:
-            # don't include "req%d" partition names
-            if (dev.type != "partition" or not dev.name.startswith("req")) and \
-               dev.name not in names:
-                names.append(dev.name)
+            This includes the names of the LVs on the system that are not in
+            the tree, unless they are scheduled for removal.
+        """
+        # the names are only listed again after the tree, its actions or the LVs changed
+        state = (self.generation, len(self._actions._actions))
+        lvs = lvs_info.cache
+        (names_state, names_lvs, names) = self._names
+        if names_state != state or names_lvs is not lvs:
+            names = []
+            seen = set()
+            for dev in self._devices + self._hidden:
+                # don't include "req%d" partition names
+                if (dev.type != "partition" or not dev.name.startswith("req")) and \
+                   dev.name not in seen:
+                    seen.add(dev.name)
+                    names.append(dev.name)
+
+            # include LVs that are not in the devicetree and not scheduled for removal
+            removed_names = set(ac.device.name for ac in self.actions.find(action_type="destroy",
+                                                                           object_type="device"))
+            names.extend(n for n in lvs if n not in seen and n not in removed_names)
+            self._names = (state, lvs, names)
+
+        return list(names)
 
-        # include LVs that are not in the devicetree and not scheduled for removal
-        removed_names = [ac.device.name for ac in self.actions.find(action_type="destroy",
-                                                                    object_type="device")]
-        names.extend(n for n in lv_info if n not in names and n not in removed_names)
+    @property
+    def generation(self):
+        """ Modification generation of the tree.
+
+            The generation increases every time a device is added, removed,
+            hidden or unhidden and every time a device in the tree changes in
+            a way that affects lookups or the list of devices: when it is
+            renamed, gets a new format, is created or destroyed (or its format
+            is), or when its completeness may have changed. Views of the tree's
+            devices can be cached as long as the generation they were built
+            for stays the same.
+
+            :rtype: int
+        """
+        serial = self._lookup_index.changes.serial
+        if serial != self._generation_serial:
+            with blivet_lock.caching():
+                if serial != self._generation_serial:
+                    # a device in the tree changed
+                    self._generation_serial = serial
+                    self._tree_changed()
 
-        return names
+        return self._generation
+
+    def _tree_changed(self):
+        self._generation = next(_generations)
 
     def _add_device(self, newdev, new=True):
         """ Add a device to the tree.
@@ -179,8 +501,9 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             Raise DeviceTreeError if the device's identifier is already
             in the list.
         """
-        if newdev.uuid and newdev.uuid in [d.uuid for d in self._devices] and \
-           not isinstance(newdev, NoDevice):
+        self._lookup_index.sync(self._devices, self._hidden)
+        if newdev.uuid and not isinstance(newdev, NoDevice) and \
+           any(d.uuid == newdev.uuid for d in self._lookup_index.find("uuid", newdev.uuid, incomplete=True)):
             # Just found a device with already existing UUID. Is it the same device?
             dev = self.get_device_by_uuid(newdev.uuid, incomplete=True, hidden=True)
             if dev.name == newdev.name:
@@ -191,11 +514,13 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
 
         # make sure this device's parent devices are in the tree already
         for parent in newdev.parents:
-            if parent not in self._devices:
+            if not self._lookup_index.contains(parent):
                 raise DeviceTreeError("parent device not in tree")
 
         newdev.add_hook(new=new)
         self._devices.append(newdev)
+        self._lookup_index.add(newdev)
+        self._tree_changed()
 
         callbacks.device_added(device=newdev)
         log.info("added %s %s (id %d) to device tree", newdev.type,
@@ -216,7 +541,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
 
                 Only leaves may be removed.
         """
-        if dev not in self._devices:
+        self._lookup_index.sync(self._devices, self._hidden)
+        if not self._lookup_index.contains(dev):
             raise ValueError("Device '%s' not in tree" % dev.name)
 
         if not dev.isleaf and not force:
@@ -236,6 +562,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
                         device.update_name()
 
         self._devices.remove(dev)
+        self._lookup_index.remove(dev)
+        self._tree_changed()
         callbacks.device_removed(device=dev)
         log.info("removed %s %s (id %d) from device tree", dev.type,
                  dev.name,
@@ -367,6 +695,29 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             # add the device back into the tree
             self._add_device(action.device, new=False)
 
+    #
+    # Savepoints
+    #
+    def savepoint(self):
+        """ Save the current state of the tree, its devices and its actions.
+
+            :returns: a savepoint to pass to :meth:`rollback`
+        """
+        return _Savepoint(self)
+
+    def rollback(self, savepoint):
+        """ Restore the state of the tree saved in a savepoint.
+
+            All changes made to the devices, formats and actions known to the
+            tree at the time of the savepoint are undone, devices and actions
+            added since are removed from the tree. The savepoint can be used
+            for further rollbacks.
+
+            :param savepoint: the savepoint returned by :meth:`savepoint`
+        """
+        savepoint.restore(self)
+        self._tree_changed()
+
     #
     # Device control
     #
@@ -496,6 +847,33 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             devices = (d for d in devices if getattr(d, "complete", True))
         return devices
 
+    def _find_devices(self, key, value, incomplete=False, hidden=False):
+        """ Return list of devices with a matching lookup key.
+
+            :param str key: the key to match ("name", "path", "sysfs_path",
+                            "uuid", "device_id" or "id")
+            :param value: the value to match
+            :param bool incomplete: include incomplete devices in result
+            :param bool hidden: include hidden devices in result
+            :returns: the matching devices in the order of the device list
+            :rtype: list of :class:`~.devices.Device`
+
+            LVM device names and paths are also matched with the double
+            dashes used by device-mapper replaced by single dashes.
+        """
+        # lookups run with the global lock shared, the index is updated here
+        with blivet_lock.caching():
+            self._lookup_index.sync(self._devices, self._hidden)
+            matches = self._lookup_index.find(key, value, incomplete=incomplete, hidden=hidden)
+            if key in ("name", "path") and "--" in value:
+                lvm_matches = [d for d in self._lookup_index.find(key, value.replace("--", "-"),
+                                                                  incomplete=incomplete, hidden=hidden)
+                               if isinstance(d, _LVM_DEVICE_CLASSES) and d not in matches]
+                if lvm_matches:
+                    matches = sorted(matches + lvm_matches, key=self._lookup_index.sort_key)
+
+        return matches
+
     def get_device_by_sysfs_path(self, path, incomplete=False, hidden=False):
         """ Return a list of devices with a matching sysfs path.
 
@@ -508,8 +886,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
         log_method_call(self, path=path, incomplete=incomplete, hidden=hidden)
         result = None
         if path:
-            devices = self._filter_devices(incomplete=incomplete, hidden=hidden)
-            result = next((d for d in devices if d.sysfs_path == path), None)
+            matches = self._find_devices("sysfs_path", path, incomplete=incomplete, hidden=hidden)
+            result = next(iter(matches), None)
         log_method_return(self, result)
         return result
 
@@ -525,8 +903,7 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
         log_method_call(self, uuid=uuid, incomplete=incomplete, hidden=hidden)
         result = None
         if uuid:
-            devices = self._filter_devices(incomplete=incomplete, hidden=hidden)
-            matches = [d for d in devices if d.uuid == uuid or d.format.uuid == uuid]
+            matches = self._find_devices("uuid", uuid, incomplete=incomplete, hidden=hidden)
             if len(matches) > 1:
                 log.error("found non-unique UUID %s: %s", uuid, [m.name for m in matches])
                 raise DuplicateUUIDError("Duplicate UUID '%s' found for devices: %s"
@@ -566,10 +943,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
         log_method_call(self, name=name, incomplete=incomplete, hidden=hidden)
         result = None
         if name:
-            devices = self._filter_devices(incomplete=incomplete, hidden=hidden)
-            result = next((d for d in devices if d.name == name or
-                          (isinstance(d, _LVM_DEVICE_CLASSES) and d.name == name.replace("--", "-"))),
-                          None)
+            matches = self._find_devices("name", name, incomplete=incomplete, hidden=hidden)
+            result = next(iter(matches), None)
         log_method_return(self, result)
         return result
 
@@ -588,14 +963,12 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
         log_method_call(self, path=path, incomplete=incomplete, hidden=hidden)
         result = None
         if path:
-            devices = self._filter_devices(incomplete=incomplete, hidden=hidden)
+            matches = self._find_devices("path", path, incomplete=incomplete, hidden=hidden)
 
             # The usual order of the devices list is one where leaves are at
             # the end. So that the search can prefer leaves to interior nodes
-            # the list that is searched is the reverse of the devices list.
-            result = next((d for d in reversed(list(devices)) if d.path == path or
-                          (isinstance(d, _LVM_DEVICE_CLASSES) and d.path == path.replace("--", "-"))),
-                          None)
+            # the last match is the one returned.
+            result = next(reversed(matches), None)
 
         log_method_return(self, result)
         return result
@@ -610,8 +983,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             :rtype: :class:`~.devices.Device`
         """
         log_method_call(self, id_num=id_num, incomplete=incomplete, hidden=hidden)
-        devices = self._filter_devices(incomplete=incomplete, hidden=hidden)
-        result = next((d for d in devices if d.id == id_num), None)
+        matches = self._find_devices("id", id_num, incomplete=incomplete, hidden=hidden)
+        result = next(iter(matches), None)
         log_method_return(self, result)
         return result
 
@@ -625,8 +998,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             :rtype: :class:`~.devices.Device`
         """
         log_method_call(self, device_id=device_id, incomplete=incomplete, hidden=hidden)
-        devices = self._filter_devices(incomplete=incomplete, hidden=hidden)
-        result = next((d for d in devices if d.device_id == device_id), None)
+        matches = self._find_devices("device_id", device_id, incomplete=incomplete, hidden=hidden)
+        result = next(iter(matches), None)
         log_method_return(self, result)
         return result
 
@@ -876,6 +1249,10 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             Therefore, _remove_device() is invoked with the force parameter
             set to True, to skip the isleaf check.
         """
+        with lvm.devices_batch():
+            self._hide(device)
+
+    def _hide(self, device):
         if device in self._hidden:
             return
 
@@ -886,7 +1263,7 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
             self.cancel_disk_actions([device])
 
         for d in device.children:
-            self.hide(d)
+            self._hide(d)
 
         log.info("hiding device %s", device)
 
@@ -896,6 +1273,8 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
         self._remove_device(device, force=True, modparent=False)
 
         self._hidden.append(device)
+        self._lookup_index.add(device, hidden=True)
+        self._tree_changed()
         if device.format.type == "lvmpv":
             lvm.lvm_devices_remove(device.path)
 
@@ -912,19 +1291,22 @@ class DeviceTreeBase(object, metaclass=SynchronizedMeta):
 
         """
 
-        # the hidden list should be in leaves-first order
-        for hidden in reversed(self._hidden):
-            if hidden == device or hidden.depends_on(device) and \
-               not any(parent in self._hidden for parent in hidden.parents):
-
-                log.info("unhiding device %s %s (id %d)", hidden.type,
-                         hidden.name,
-                         hidden.id)
-                self._hidden.remove(hidden)
-                self._devices.append(hidden)
-                hidden.add_hook(new=False)
-                if hidden.format.type == "lvmpv":
-                    lvm.lvm_devices_add(hidden.path)
+        with lvm.devices_batch():
+            # the hidden list should be in leaves-first order
+            for hidden in reversed(self._hidden):
+                if hidden == device or hidden.depends_on(device) and \
+                   not any(parent in self._hidden for parent in hidden.parents):
+
+                    log.info("unhiding device %s %s (id %d)", hidden.type,
+                             hidden.name,
+                             hidden.id)
+                    self._hidden.remove(hidden)
+                    self._devices.append(hidden)
+                    self._lookup_index.add(hidden)
+                    self._tree_changed()
+                    hidden.add_hook(new=False)
+                    if hidden.format.type == "lvmpv":
+                        lvm.lvm_devices_add(hidden.path)
 
     def expand_taglist(self, taglist):
         """ Expands tags in input list into devices.
@@ -21,8 +21,10 @@
 #
 
 import abc
+import asyncio
+from collections import deque
 import inspect
-from threading import current_thread, RLock, Thread
+from threading import current_thread, Lock, RLock, Thread
 import pyudev
 import sys
 import time
@@ -115,11 +117,39 @@ class EventMask(util.ObjectID):
         return self._device_match(event) and self._action_match(event)
 
 
+class EventQueueStatistics(object):
+
+    """ Numbers of events queued, merged and handled and their latency. """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queued = 0
+        """ events waiting to be handled """
+        self.max_queued = 0
+        """ largest number of events waiting to be handled at once """
+        self.handled = 0
+        """ events passed to the handler """
+        self.coalesced = 0
+        """ change events replaced by a later change event on the same device """
+        self.cancelled = 0
+        """ events dropped because the device was removed before they were handled """
+        self.total_latency = 0.0
+        """ seconds the handled events waited in the queue """
+        self.max_latency = 0.0
+        """ longest time a handled event waited in the queue """
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.handled if self.handled else 0.0
+
+
 #
 # EventManager
 #
 class EventManager(object, metaclass=abc.ABCMeta):
-    def __init__(self, handler_cb=None, notify_cb=None, error_cb=None):
+    def __init__(self, handler_cb=None, notify_cb=None, error_cb=None, loop=None):
         self._handler_cb = None
         """ event handler (must accept 'event', 'notify_cb' kwargs """
 
@@ -144,6 +174,27 @@ class EventManager(object, metaclass=abc.ABCMeta):
         self._lock = RLock()
         """Re-entrant lock to serialize access to mask list."""
 
+        self._loop = loop
+        """ asyncio event loop to run the handler in, None for worker threads """
+
+        self._queue_lock = Lock()
+        """ lock protecting the event queue """
+
+        self._pending = dict()
+        """ events not handled yet, in order of arrival, per device """
+
+        self._ready = deque()
+        """ devices with pending events and no event being handled """
+
+        self._active = set()
+        """ devices with an event being handled """
+
+        self._workers = 0
+        """ number of running workers """
+
+        self.stats = EventQueueStatistics()
+        """ statistics of the event queue """
+
     @property
     def handler_cb(self):
         """ the main event handler """
@@ -180,6 +231,22 @@ class EventManager(object, metaclass=abc.ABCMeta):
 
         self._error_cb = cb
 
+    @property
+    def loop(self):
+        """ asyncio event loop the handler runs in
+
+            If set, the handler may be a coroutine function, which is run in
+            the loop's thread. Other handlers are run in the loop's default
+            executor. If not set, the handler is run in worker threads.
+
+            The loop must be running when the events arrive.
+        """
+        return self._loop
+
+    @loop.setter
+    def loop(self, loop):
+        self._loop = loop
+
     @property
     @abc.abstractmethod
     def enabled(self):
@@ -234,12 +301,23 @@ class EventManager(object, metaclass=abc.ABCMeta):
     def _create_event(self, *args, **kwargs):
         pass
 
+    def _event_key(self, event):
+        """ Return the key of the device events are serialized and merged on. """
+        return event.device
+
     def handle_event(self, *args, **kwargs):
         """ Handle an event by running the registered handler.
 
-            Currently the handler is run in a separate thread. This removes any
-            threading-related expectations about the behavior of whatever is
-            telling us about the events.
+            The event is queued and the handler is run by up to
+            :attr:`~.flags.Flags.event_workers` workers, either in threads
+            or in the :attr:`loop`. This removes any threading-related
+            expectations about the behavior of whatever is telling us about
+            the events.
+
+            Events on one device are handled one by one, in order of arrival.
+            Bursts of events are merged while they wait in the queue: a change
+            event replaces a pending change event on the same device and a
+            remove event cancels a pending add event and everything after it.
 
             Unhandled exceptions in event handler threads present a bit of a
             challenge. Generally, an unhandled exception in an event handler
@@ -260,33 +338,166 @@ class EventManager(object, metaclass=abc.ABCMeta):
             event_log.debug("ignoring masked event %s", event)
             return
 
-        t = Thread(target=self._run_event_handler,
-                   name="event%d" % event.id,
-                   kwargs={"event": event})
-        t.daemon = True  # py2 compat
-        t.start()
+        if self._queue_event(event):
+            self._start_worker()
+
+    def _queue_event(self, event):
+        """ Add an event to the queue, merging it with the pending events.
+
+            :returns: whether a new worker should be started
+            :rtype: bool
+        """
+        key = self._event_key(event)
+        with self._queue_lock:
+            pending = self._pending.setdefault(key, deque())
+            was_idle = not pending and key not in self._active
+
+            actions = [e.action for e in pending]
+            if event.action == "change" and actions and actions[-1] == "change":
+                event_log.debug("event %s replaces %s", event, pending[-1])
+                pending[-1] = event
+                self.stats.coalesced += 1
+                return False
+            elif event.action == "remove" and "add" in actions:
+                idx = len(actions) - 1 - actions[::-1].index("add")
+                cancelled = len(pending) - idx
+                event_log.debug("event %s cancels %d pending events", event, cancelled)
+                for _i in range(cancelled):
+                    pending.pop()
+                self.stats.queued -= cancelled
+                self.stats.cancelled += cancelled + 1
+                if not pending and key not in self._active:
+                    del self._pending[key]
+                    self._ready.remove(key)
+                return False
+
+            pending.append(event)
+            self.stats.queued += 1
+            self.stats.max_queued = max(self.stats.max_queued, self.stats.queued)
+            if was_idle:
+                self._ready.append(key)
+
+            if self._workers < max(flags.event_workers, 1):
+                self._workers += 1
+                return True
+
+        return False
+
+    def _next_event(self):
+        """ Return the next event to handle or None if there is none.
+
+            A worker that gets None must exit.
+        """
+        with self._queue_lock:
+            if not self._ready:
+                self._workers -= 1
+                return None
+
+            key = self._ready.popleft()
+            event = self._pending[key].popleft()
+            self._active.add(key)
+
+            latency = time.time() - event.initialized
+            self.stats.queued -= 1
+            self.stats.handled += 1
+            self.stats.total_latency += latency
+            self.stats.max_latency = max(self.stats.max_latency, latency)
+            return event
+
+    def _event_done(self, event):
+        """ Allow the next event on the event's device to be handled. """
+        key = self._event_key(event)
+        with self._queue_lock:
+            self._active.discard(key)
+            if self._pending.get(key):
+                self._ready.append(key)
+            else:
+                self._pending.pop(key, None)
+
+    def _start_worker(self):
+        if self._loop is not None:
+            worker = self._run_async_worker()
+            try:
+                if not self._loop.is_running():
+                    raise RuntimeError("event loop is not running")
+                asyncio.run_coroutine_threadsafe(worker, self._loop)
+            except RuntimeError as e:
+                # the events stay queued for the next worker
+                event_log.error("failed to start event worker: %s", e)
+                worker.close()
+                with self._queue_lock:
+                    self._workers -= 1
+        else:
+            t = Thread(target=self._run_worker, name="event-worker")
+            t.daemon = True  # py2 compat
+            t.start()
+
+    def _run_worker(self):
+        """ Handle queued events until there are none left. """
+        while True:
+            event = self._next_event()
+            if event is None:
+                return
+
+            try:
+                self._run_event_handler(event)
+            finally:
+                self._event_done(event)
+
+    async def _run_async_worker(self):
+        """ Handle queued events in the event loop until there are none left.
+
+            Handlers that are not coroutine functions are run in the loop's
+            default executor so that they don't block the loop.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            event = self._next_event()
+            if event is None:
+                return
+
+            try:
+                if inspect.iscoroutinefunction(self.handler_cb):
+                    result = self._run_event_handler(event)
+                else:
+                    result = await loop.run_in_executor(None, self._run_event_handler, event)
+                if inspect.isawaitable(result):
+                    try:
+                        await result
+                    except Exception:  # pylint: disable=broad-except
+                        self._handle_exception()
+            finally:
+                self._event_done(event)
 
     def _run_event_handler(self, event):
-        """ Run the event handler and account for unhandled exceptions. """
+        """ Run the event handler and account for unhandled exceptions.
+
+            :returns: the handler's return value
+        """
         if self.handler_cb is None:
-            return
+            return None
 
         try:
             # Pass the notify callback to the handler so it can run the
             # callback and pass thread-local data to it.
-            self.handler_cb(event=event, notify_cb=self.notify_cb)  # pylint: disable=not-callable
+            return self.handler_cb(event=event, notify_cb=self.notify_cb)  # pylint: disable=not-callable
         except Exception:  # pylint: disable=broad-except
-            event_log.error(traceback.format_exc())
-            exc_info = sys.exc_info()
-            if self.error_cb is not None:
-                self.error_cb(exc_info)  # pylint: disable=not-callable
-            else:
-                threads.save_thread_exception(current_thread(), exc_info)
+            self._handle_exception()
+            return None
+
+    def _handle_exception(self):
+        """ Report the exception being handled to the application. """
+        event_log.error(traceback.format_exc())
+        exc_info = sys.exc_info()
+        if self.error_cb is not None:
+            self.error_cb(exc_info)  # pylint: disable=not-callable
+        else:
+            threads.save_thread_exception(current_thread(), exc_info)
 
 
 class UdevEventManager(EventManager):
-    def __init__(self, handler_cb=None, notify_cb=None):
-        super(UdevEventManager, self).__init__(handler_cb=handler_cb, notify_cb=notify_cb)
+    def __init__(self, handler_cb=None, notify_cb=None, loop=None):
+        super(UdevEventManager, self).__init__(handler_cb=handler_cb, notify_cb=notify_cb, loop=loop)
         self._pyudev_observer = None
 
     @property
@@ -318,6 +529,14 @@ class UdevEventManager(EventManager):
     def __call__(self, *args, **kwargs):
         return self
 
+    def handle_event(self, *args, **kwargs):
+        # any uevent, masked or not, can change what device specs resolve to
+        udev.invalidate_devspec_index()
+        super(UdevEventManager, self).handle_event(*args, **kwargs)
+
+    def _event_key(self, event):
+        return event.info.sys_path
+
     def _create_event(self, *args, **kwargs):
         return Event(args[0].action, udev.device_get_name(args[0]), args[0])
 
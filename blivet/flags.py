@@ -93,5 +93,34 @@ class Flags(object):
         # Allow online filesystem resizes
         self.allow_online_fs_resize = False
 
+        # number of threads used to probe devices during populate;
+        # devices are still added to the tree one by one, in the same
+        # order as with a single thread
+        self.populate_workers = 1
+
+        # number of threads used to execute actions on unrelated devices
+        # concurrently; 1 executes all actions one by one
+        self.action_workers = 1
+
+        # check the populator helpers chosen via the dispatch tables against
+        # a linear scan of all helpers (debugging aid)
+        self.verify_helper_dispatch = False
+
+        # load the LVM, multipath and Stratis information in the background
+        # at the start of populate
+        self.prefetch_device_info = True
+
+        # check the availability of external tools and libblockdev plugins
+        # in the background at the start of populate
+        self.probe_dependencies = False
+
+        # file to cache the availability of external tools and libblockdev
+        # plugins in between runs; None disables the cache
+        self.availability_cache = None
+
+        # maximum number of workers running the event handler; events on
+        # one device are always handled one by one
+        self.event_workers = 4
+
 
 flags = Flags()
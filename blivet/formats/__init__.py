@@ -33,6 +33,7 @@ from .. import udev
 from ..util import get_sysfs_path_by_name
 from ..util import run_program
 from ..util import ObjectID
+from ..util import record_change
 from ..storage_log import log_method_call
 from ..errors import DeviceFormatError, FormatCreateError, FormatDestroyError, FormatSetupError
 from ..i18n import N_
@@ -159,6 +160,11 @@ class DeviceFormat(ObjectID, metaclass=SynchronizedMeta):
     _hidden = False                     # hide devices with this formatting?
     _ks_mountpoint = None
     _protected = False
+    _unsynchronized_methods = ["__setattr__"]
+    _shared_methods = ["type", "device", "_get_device", "label", "_get_label", "hidden", "protected"]
+
+    # attributes used to look up devices in the device tree
+    _lookup_key_attrs = frozenset(("uuid", "exists"))
 
     _resize_class = fsresize.UnimplementedFSResize
     _size_info_class = fssize.UnimplementedFSSize
@@ -209,6 +215,11 @@ class DeviceFormat(ObjectID, metaclass=SynchronizedMeta):
         # size is known.
         self._resizable = False
 
+    def __setattr__(self, name, value):
+        if name in self._lookup_key_attrs and getattr(self, name, None) != value:
+            record_change(self)
+        super(DeviceFormat, self).__setattr__(name, value)
+
     def __repr__(self):
         s = ("%(classname)s instance (%(id)s) object id %(object_id)d--\n"
              "  type = %(type)s  name = %(name)s  status = %(status)s\n"
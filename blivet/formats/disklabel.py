@@ -22,6 +22,8 @@
 
 import gi
 import os
+import threading
+import weakref
 
 gi.require_version("BlockDev", "3.0")
 from gi.repository import BlockDev as blockdev
@@ -43,6 +45,88 @@ import logging
 log = logging.getLogger("blivet")
 
 
+# the parted disks are duplicated on access, which may happen in threads
+# holding the global lock shared
+_share_lock = threading.RLock()
+
+
+class _PartedDiskShare(object):
+
+    """ A parted disk shared by a disklabel and its copies. """
+
+    def __init__(self, parted_disk):
+        self.parted_disk = parted_disk
+        self.copies = []    # weak references to the copies sharing it
+
+
+class _SharedPartedDiskAttribute(object):
+
+    """ A parted disk attribute of :class:`DiskLabel` shared with copies.
+
+        Copies of a disklabel do not duplicate its parted disks right away.
+        A copy duplicates the shared parted disk on first access to the
+        attribute. When the original accesses it, all copies still sharing
+        it get their duplicates first, since parted objects can be changed
+        through any reference. The value is kept in the instance's __dict__
+        under the same name.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._share_name = name + "_share"
+
+    def _unshare(self, label):
+        with _share_lock:
+            share = label.__dict__.get(self._share_name)
+            if share is None:
+                return
+
+            label.__dict__[self._share_name] = None
+            if label.__dict__.get(self._name) is share.parted_disk:
+                # the original, hand out the duplicates before anything changes
+                for ref in share.copies:
+                    copy = ref()
+                    if copy is not None and copy.__dict__.get(self._share_name) is share:
+                        copy.__dict__[self._share_name] = None
+                        copy.__dict__[self._name] = share.parted_disk.duplicate()
+                share.copies = []
+            else:
+                label.__dict__[self._name] = share.parted_disk.duplicate()
+
+    def __get__(self, label, owner=None):
+        if label is None:
+            return self
+
+        self._unshare(label)
+        return label.__dict__.get(self._name)
+
+    def __set__(self, label, value):
+        with _share_lock:
+            share = label.__dict__.get(self._share_name)
+            if share is not None and label.__dict__.get(self._name) is share.parted_disk:
+                self._unshare(label)
+            label.__dict__[self._share_name] = None
+            label.__dict__[self._name] = value
+
+    def share(self, label, copy):
+        """ Make copy share the value of this attribute with label. """
+        with _share_lock:
+            share = label.__dict__.get(self._share_name)
+            if share is None:
+                value = label.__dict__.get(self._name)
+                if value is None:
+                    copy.__dict__[self._share_name] = None
+                    copy.__dict__[self._name] = None
+                    return
+
+                share = _PartedDiskShare(value)
+                label.__dict__[self._share_name] = share
+
+            share.copies.append(weakref.ref(copy))
+            copy.__dict__[self._share_name] = share
+            copy.__dict__[self._name] = None
+
+
 class DiskLabel(DeviceFormat):
 
     """ Disklabel """
@@ -51,6 +135,9 @@ class DiskLabel(DeviceFormat):
     _formattable = True                # can be formatted
     _default_label_type = None
 
+    _parted_disk = _SharedPartedDiskAttribute("_parted_disk")
+    _orig_parted_disk = _SharedPartedDiskAttribute("_orig_parted_disk")
+
     def __init__(self, **kwargs):
         """
             :keyword device: full path to the block device node
@@ -92,11 +179,24 @@ class DiskLabel(DeviceFormat):
         """ Create a deep copy of a Disklabel instance.
 
             We can't do copy.deepcopy on parted objects, which is okay.
+            The parted disks are shared with the copy until one of them
+            accesses them, see :class:`_SharedPartedDiskAttribute`.
         """
-        return util.variable_copy(self, memo,
-                                  shallow=('_parted_device', '_optimal_alignment', '_minimal_alignment',
-                                           '_disk_label_alignment'),
-                                  duplicate=('_parted_disk', '_orig_parted_disk'))
+        parted_disks = ('_parted_disk', '_orig_parted_disk',
+                        '_parted_disk_share', '_orig_parted_disk_share')
+        new = util.variable_copy(self, memo,
+                                 omit=parted_disks,
+                                 shallow=('_parted_device', '_optimal_alignment', '_minimal_alignment',
+                                          '_disk_label_alignment'))
+        DiskLabel._parted_disk.share(self, new)
+        DiskLabel._orig_parted_disk.share(self, new)
+        return new
+
+    def unshare_parted_disks(self):
+        """ Stop sharing this instance's parted disks with copies of it. """
+        # pylint: disable=pointless-statement
+        self._parted_disk
+        self._orig_parted_disk
 
     def __repr__(self):
         s = DeviceFormat.__repr__(self)
@@ -361,6 +461,8 @@ class DiskLabel(DeviceFormat):
         """ Commit the current partition table to disk and notify the OS. """
         log_method_call(self, device=self.device,
                         numparts=len(self.partitions))
+        # the kernel refuses to re-read the table while udev probes the disk
+        udev.settle_pending()
         try:
             self.parted_disk.commit()
         except parted.DiskException as msg:
@@ -373,6 +475,7 @@ class DiskLabel(DeviceFormat):
         """ Commit the current partition table to disk. """
         log_method_call(self, device=self.device,
                         numparts=len(self.partitions))
+        udev.settle_pending()
         try:
             self.parted_disk.commitToDevice()
         except parted.DiskException as msg:
@@ -28,6 +28,8 @@ import tempfile
 import uuid as uuid_mod
 import random
 import stat
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 from parted import fileSystemType, PARTITION_BOOT
@@ -50,13 +52,14 @@ from ..tasks import fssync
 from ..tasks import fsuuid
 from ..tasks import fswritelabel
 from ..tasks import fswriteuuid
-from ..errors import FormatCreateError, FSError, FSReadLabelError
+from ..errors import FormatCreateError, FSError, FSReadLabelError, StorageError
 from ..errors import FSWriteLabelError, FSWriteUUIDError
 from . import DeviceFormat, register_device_format
 from .. import util
 from ..flags import flags
 from ..fstab import HAVE_LIBMOUNT
 from ..storage_log import log_exception_info, log_method_call
+from ..threads import blivet_lock, run_delegated
 from .. import arch
 from ..size import Size, ROUND_UP
 from ..i18n import N_
@@ -73,6 +76,51 @@ log = logging.getLogger("blivet")
 AVAILABLE_FILESYSTEMS = kernel_filesystems
 
 
+class _SizeInfoAttribute(object):
+
+    """ An attribute of :class:`FS` set by :meth:`FS.update_size_info`.
+
+        Accessing the attribute runs the size probe postponed by the
+        constructor, if any. The value is kept in the instance's __dict__
+        under the same name.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __get__(self, fs, owner=None):
+        if fs is None:
+            return self
+
+        if fs.__dict__.get("_size_info_pending"):
+            fs._probe_pending_size_info()
+        return fs.__dict__[self._name]
+
+    def __set__(self, fs, value):
+        if fs.__dict__.get("_size_info_pending"):
+            fs._probe_pending_size_info()
+        fs.__dict__[self._name] = value
+
+
+def prefetch_size_info(filesystems, max_workers=None):
+    """ Run the postponed size probes of existing filesystems concurrently.
+
+        :param filesystems: the filesystems to probe
+        :type filesystems: list of :class:`FS`
+        :keyword int max_workers: maximum number of probes to run at a time
+                                  (default: number of filesystems, at most 8)
+    """
+    pending = [fs for fs in filesystems if fs.__dict__.get("_size_info_pending")]
+    if not pending:
+        return
+
+    # the probes only touch their filesystem, so run them on behalf of this thread
+    with blivet_lock:
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(pending), 8)) as executor:
+            for result in [executor.submit(run_delegated, fs._run_pending_size_probe) for fs in pending]:
+                result.result()
+
+
 class FS(DeviceFormat):
 
     """ Filesystem base class. """
@@ -99,6 +147,13 @@ class FS(DeviceFormat):
     # support for resize: grow/shrink, online/offline
     _resize_support = 0
 
+    # current and minimum size, probed on first use (see update_size_info)
+    _size_info_pending = False
+    _size_probe_device = None
+    _size = _SizeInfoAttribute("_size")
+    _target_size = _SizeInfoAttribute("_target_size")
+    _min_instance_size = _SizeInfoAttribute("_min_instance_size")
+
     # directories that even a newly created empty filesystem can contain (e.g. lost+found)
     _system_dirs = []
 
@@ -156,15 +211,11 @@ class FS(DeviceFormat):
 
         self._user_mountopts = self.mountopts
 
-        if flags.auto_dev_updates and self._resize.available:
-            # if you want current/min size you have to call update_size_info
-            try:
-                self.update_size_info()
-            except FSError:
-                log.warning("%s filesystem on %s needs repair", self.type,
-                            self.device)
-
         self._target_size = self._size
+        if flags.auto_dev_updates and self._resize.available and self.exists:
+            # current/min size are obtained from the filesystem on first use,
+            # call update_size_info to obtain them right away
+            self._size_info_pending = True
 
         if self.supported:
             self.check_module()
@@ -352,6 +403,7 @@ class FS(DeviceFormat):
         #     its unknown actual minimum size.
         #   * self._get_min_size() is only run if fsck succeeds and a current
         #     existing size can be obtained.
+        self._size_info_pending = False
         if not self.exists:
             return
 
@@ -386,6 +438,60 @@ class FS(DeviceFormat):
         except (FSError, NotImplementedError) as e:
             log.warning("Failed to obtain minimum size for device %s: %s", self.device, e)
 
+    def _probe_pending_size_info(self):
+        """ Run the size probe postponed by the constructor. """
+        if not self._size_info_pending:
+            return
+
+        # the sizes are usually read with the lock shared
+        with blivet_lock.caching():
+            self._run_pending_size_probe()
+
+    @property
+    def size_probe_device(self):
+        """ The device to set up for the size probe postponed by the
+            constructor if its node does not exist (e.g. it has been torn
+            down since it was found), or None.
+        """
+        return self._size_probe_device() if self._size_probe_device else None
+
+    @size_probe_device.setter
+    def size_probe_device(self, device):
+        self._size_probe_device = weakref.ref(device) if device is not None else None
+
+    def _run_pending_size_probe(self):
+        if not self._size_info_pending:
+            return
+
+        device = None
+        if not self.device or not os.path.exists(self.device):
+            device = self.size_probe_device
+            if device is None or not device.exists:
+                log.debug("postponing the size probe of %s filesystem on %s, device is not accessible",
+                          self.type, self.device)
+                return
+
+            try:
+                device.setup()
+            except StorageError as e:
+                log.debug("postponing the size probe of %s filesystem on %s, failed to set up %s: %s",
+                          self.type, self.device, device.name, e)
+                return
+
+        try:
+            self.update_size_info()
+        except FSError:
+            log.warning("%s filesystem on %s needs repair", self.type,
+                        self.device)
+        finally:
+            if device is not None:
+                try:
+                    device.teardown()
+                except StorageError as e:
+                    log.warning("failed to tear down %s after probing its filesystem: %s", device.name, e)
+
+        self._target_size = self._size
+
     def _pad_size(self, size):
         """ Return a size padded according to some inflating rules.
 
@@ -847,6 +953,7 @@ class FS(DeviceFormat):
     @property
     def resizable(self):
         """ Can formats of this filesystem type be resized? """
+        self._probe_pending_size_info()
         return super(FS, self).resizable and self._resize.available
 
     def _get_options(self):
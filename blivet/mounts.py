@@ -20,6 +20,9 @@
 # Red Hat Author(s): Vojtech Trefny <vtrefny@redhat.com>
 #
 from collections import defaultdict
+from threading import Lock
+import select
+
 from .udev import resolve_devspec
 from . import util
 from .devicelibs import btrfs
@@ -30,69 +33,24 @@ log = logging.getLogger("blivet")
 import os
 
 
-class _MountinfoCache(object):
-
-    """ Cache for info from /proc/self/mountinfo. Looks up the root of the
-        mount within the filesystem using a pair of mountpoint, mount
-        source as keys.
-
-        This is a very simple helper class for MountsCache, and would
-        have to be altered for general purpose use.
-
-        Note that only info for fstype btrfs is stored within the cache,
-        as MountsCache methods only require information for btrfs.
-    """
-
-    def __init__(self):
-        self._cache = None
-
-    def _get_cache(self):
-        """ Reads lines in /proc/self/mountinfo and builds a table. """
-        cache = {}
-
-        with open("/proc/self/mountinfo") as mountinfos:
-            for line in mountinfos:
-                fields = line.split()
-                separator_index = fields.index("-")
-                fstype = fields[separator_index + 1]
-                if not fstype.startswith("btrfs"):
-                    continue
-
-                root = fields[3]
-                mountpoint = fields[4]
-                # store the canonical device path
-                devspec = resolve_devspec(fields[separator_index + 2],
-                                          sysname=True)
-                cache[(devspec, mountpoint)] = root
-
-        return cache
-
-    def get_root(self, devspec, mountpoint):
-        """ Retrieves the root of the mount within the filesystem
-            that corresponds to devspec and mountpoint.
-
-            :param str devspec: device specification
-            :param str mountpoint: mountpoint
-            :rtype: str or NoneType
-            :returns: the root of the mount within the filesystem, if available
-        """
-        if self._cache is None:
-            self._cache = self._get_cache()
-
-        # get the canonical device path
-        devspec = resolve_devspec(devspec, sysname=True)
-        return self._cache.get((devspec, mountpoint))
-
-
 class MountsCache(object):
 
-    """ Cache object for system mountpoints; checks /proc/mounts and
-        /proc/self/mountinfo for up-to-date information.
+    """ Cache object for system mountpoints; reads /proc/self/mountinfo
+        when the mount table changes.
+
+        Changes are detected by polling the open mountinfo file, which the
+        kernel marks with POLLPRI whenever something is mounted or unmounted,
+        so checking for changes costs a single poll() call.
     """
 
     def __init__(self):
         self.mounts_hash = 0
         self.mountpoints = defaultdict(list)
+        self._mounted_paths = {}
+        self._lock = Lock()
+        self._mountinfo = None
+        self._poller = None
+        self._watch_failed = False
 
     def get_mountpoints(self, devspec, subvolspec=None):
         """ Get mountpoints for selected device
@@ -139,48 +97,104 @@ class MountsCache(object):
         """
         self._cache_check()
 
-        return any(path in p for p in self.mountpoints.values())
+        return path in self._mounted_paths
+
+    def _read_mountinfo(self):
+        if self._mountinfo is not None:
+            self._mountinfo.seek(0)
+            return self._mountinfo.read()
+
+        with open("/proc/self/mountinfo") as mountinfo:
+            return mountinfo.read()
 
     def _get_active_mounts(self):
-        """ Get information about mounted devices from /proc/mounts and
-            /proc/self/mountinfo
+        """ Get information about mounted devices from /proc/self/mountinfo
 
             Refreshes self.mountpoints with current mountpoint information
         """
-        self.mountpoints = defaultdict(list)
-        mountinfo = _MountinfoCache()
-
-        with open("/proc/mounts") as mounts:
-            for line in mounts:
-                try:
-                    (devspec, mountpoint, fstype, _rest) = line.split(None, 3)
-                except ValueError:
-                    log.error("failed to parse /proc/mounts line: %s", line)
-                    continue
-
-                # use the canonical device path (if available)
-                if devspec.startswith("/dev"):
-                    devspec = resolve_devspec(devspec, sysname=True) or devspec
-
-                if fstype == "btrfs":
-                    root = mountinfo.get_root(devspec, mountpoint)
-                    if root is not None:
-                        subvolspec = root[1:] or str(btrfs.MAIN_VOLUME_ID)
-                        self.mountpoints[(devspec, subvolspec)].append(mountpoint)
-                    else:
-                        log.error("failed to obtain subvolspec for btrfs device %s at mountpoint %s", devspec, mountpoint)
-                else:
-                    self.mountpoints[(devspec, None)].append(mountpoint)
+        mountpoints = defaultdict(list)
+        mounted_paths = {}
+        sysnames = {}
+
+        for line in self._read_mountinfo().splitlines():
+            # mount ID, parent ID, major:minor, root, mount point, mount
+            # options, optional fields, separator, fstype, mount source, ...
+            fields = line.split()
+            try:
+                separator_index = fields.index("-", 6)
+                (majmin, root, mountpoint) = fields[2:5]
+                (fstype, devspec) = fields[separator_index + 1:separator_index + 3]
+            except ValueError:
+                log.error("failed to parse /proc/self/mountinfo line: %s", line)
+                continue
 
-    def _cache_check(self):
-        """ Computes the SHA256 hash on /proc/mounts and updates the cache on change
-        """
+            # use the canonical device path (if available)
+            if devspec.startswith("/dev"):
+                if majmin not in sysnames:
+                    sysnames[majmin] = self._get_sysname(majmin, devspec)
+                devspec = sysnames[majmin] or devspec
+
+            if fstype == "btrfs":
+                subvolspec = root[1:] or str(btrfs.MAIN_VOLUME_ID)
+            else:
+                subvolspec = None
 
-        sha256hash = util.sha256_file("/proc/mounts")
+            mountpoints[(devspec, subvolspec)].append(mountpoint)
+            mounted_paths.setdefault(mountpoint, []).append((devspec, subvolspec))
 
-        if sha256hash != self.mounts_hash:
-            self.mounts_hash = sha256hash
-            self._get_active_mounts()
+        self.mountpoints = mountpoints
+        self._mounted_paths = mounted_paths
+
+    def _get_sysname(self, majmin, devspec):
+        """ Get the sysfs name of a mounted block device.
+
+            :param str majmin: device number from mountinfo ("major:minor")
+            :param str devspec: mount source
+            :rtype: str or NoneType
+        """
+        # btrfs (like other filesystems spanning multiple devices) reports
+        # an anonymous device number, not the one of the mount source
+        if not majmin.startswith("0:"):
+            sys_path = "/sys/dev/block/%s" % majmin
+            if os.path.exists(sys_path):
+                return os.path.basename(os.path.realpath(sys_path))
+
+        return resolve_devspec(devspec, sysname=True)
+
+    def _watch_mountinfo(self):
+        """ Open /proc/self/mountinfo to be notified about changes of the mount table. """
+        try:
+            self._mountinfo = open("/proc/self/mountinfo")
+            self._poller = select.poll()
+            self._poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+        except (OSError, AttributeError) as e:
+            log.debug("cannot watch /proc/self/mountinfo for changes: %s", e)
+            if self._mountinfo is not None:
+                self._mountinfo.close()
+            self._mountinfo = None
+            self._poller = None
+            self._watch_failed = True
+            return False
+
+        return True
+
+    def _cache_check(self):
+        """ Updates the cache if the mount table has changed since it was read
+        """
+        with self._lock:
+            if self._poller is None:
+                if self._watch_failed or not self._watch_mountinfo():
+                    # no change notifications, compare the contents
+                    sha256hash = util.sha256_file("/proc/self/mountinfo")
+                    if sha256hash != self.mounts_hash:
+                        self.mounts_hash = sha256hash
+                        self._get_active_mounts()
+                    return
+
+                # first check since the file was opened
+                self._get_active_mounts()
+            elif self._poller.poll(0):
+                self._get_active_mounts()
 
 
 mounts_cache = MountsCache()
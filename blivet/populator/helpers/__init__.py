@@ -1,7 +1,11 @@
 import inspect as _inspect
 
+from ... import udev
+from ...flags import flags
+
 from .devicepopulator import DevicePopulator
 from .formatpopulator import FormatPopulator
+from .populatorhelper import PopulatorHelper
 
 from .btrfs import BTRFSFormatPopulator
 from .boot import EFIFormatPopulator, MacEFIFormatPopulator
@@ -17,11 +21,19 @@ from .optical import OpticalDevicePopulator
 from .partition import PartitionDevicePopulator
 from .stratis import StratisFormatPopulator, StratisXFSFormatPopulator
 
-__all__ = ["get_device_helper", "get_format_helper"]
+import logging
+log = logging.getLogger("blivet")
+
+__all__ = ["get_device_helper", "get_format_helper", "get_helper_probes"]
 
 _device_helpers = []
 _format_helpers = []
 
+# dispatch tables mapping a device classification to the helpers that can
+# possibly match it, in priority order
+_device_dispatch = {}
+_format_dispatch = {}
+
 
 def _build_helper_lists():
     """Build lists of known device and format helper classes."""
@@ -40,17 +52,77 @@ def _build_helper_lists():
     _device_helpers.sort(key=lambda h: h.priority, reverse=True)
     _format_helpers.sort(key=lambda h: h.priority, reverse=True)
 
+    _device_dispatch.clear()
+    _format_dispatch.clear()
+
 
 _build_helper_lists()
 
 
+def _helper_can_match(helper, features):
+    if helper._dm_subsystems is not None and features.dm_subsystem not in helper._dm_subsystems:
+        return False
+
+    return all(getattr(features, name) == value for name, value in (helper._features or {}).items())
+
+
+def _get_device_candidates(data):
+    """ Return the device helpers that can match the specified data.
+
+        Devices are classified by their udev features (device-mapper
+        subsystem, dm, md and partition devices), which rules out all helpers
+        limited to other kinds of devices without calling their match methods.
+    """
+    features = udev.device_get_features(data)
+    key = (features.dm_subsystem, features.is_dm, features.is_md, features.is_partition)
+    candidates = _device_dispatch.get(key)
+    if candidates is None:
+        candidates = [h for h in _device_helpers if _helper_can_match(h, features)]
+        _device_dispatch[key] = candidates
+
+    return candidates
+
+
+def _get_format_candidates(data):
+    """ Return the format helpers that can match the specified data.
+
+        Formats are classified by their udev format type, which rules out
+        all helpers limited to other format types without calling their
+        match methods.
+    """
+    fmt_type = udev.device_get_format(data)
+    candidates = _format_dispatch.get(fmt_type)
+    if candidates is None:
+        candidates = []
+        for helper in _format_helpers:
+            fmt_types = helper.udev_format_types()
+            if fmt_types is None or fmt_type in fmt_types:
+                candidates.append(helper)
+        _format_dispatch[fmt_type] = candidates
+
+    return candidates
+
+
+def _verify_helper(helper, expected, data):
+    if helper is not expected:
+        log.error("helper dispatch mismatch for %s: got %s, expected %s",
+                  data.get("SYS_NAME"), helper, expected)
+
+    return expected
+
+
 def get_device_helper(data):
     """ Return the device helper class appropriate for the specified data.
 
         The helper lists are sorted according to priorities defined within each
         class. This function returns the first matching class.
     """
-    return next((h for h in _device_helpers if h.match(data)), None)
+    helper = next((h for h in _get_device_candidates(data) if h.match(data)), None)
+    if flags.verify_helper_dispatch:
+        expected = next((h for h in _device_helpers if h.match(data)), None)
+        helper = _verify_helper(helper, expected, data)
+
+    return helper
 
 
 def get_format_helper(data, device):
@@ -59,4 +131,38 @@ def get_format_helper(data, device):
         The helper lists are sorted according to priorities defined within each
         class. This function returns the first matching class.
     """
-    return next((h for h in _format_helpers if h.match(data, device=device)), None)
+    helper = next((h for h in _get_format_candidates(data) if h.match(data, device=device)), None)
+    if flags.verify_helper_dispatch:
+        expected = next((h for h in _format_helpers if h.match(data, device=device)), None)
+        helper = _verify_helper(helper, expected, data)
+
+    return helper
+
+
+def get_helper_probes(data, device_helper=None):
+    """ Run the probes of the helpers that are going to handle the specified data.
+
+        Besides the device helper, the format helpers limited to the data's
+        udev format type are probed. A helper whose probe fails is left out,
+        it probes the device itself when it is used.
+
+        :param :class:`pyudev.Device` data: udev data describing a device
+        :param device_helper: the device helper class for the data, if any
+        :returns: results of :meth:`~.PopulatorHelper.probe` keyed by helper class
+        :rtype: dict
+    """
+    helpers = [h for h in _get_format_candidates(data) if h.udev_format_types() is not None]
+    if device_helper is not None:
+        helpers.insert(0, device_helper)
+
+    probes = {}
+    for helper in helpers:
+        if helper.probe.__func__ is PopulatorHelper.probe.__func__:
+            continue
+
+        try:
+            probes[helper] = helper.probe(data)
+        except Exception as e:  # pylint: disable=broad-except
+            log.debug("failed to probe %s for %s: %s", data.get("SYS_NAME"), helper.__name__, e)
+
+    return probes
@@ -43,6 +43,10 @@ class BootFormatPopulator(FormatPopulator):
                 (device.bootable or not cls._bootable) and
                 fmt.min_size <= device.size <= fmt.max_size)
 
+    @classmethod
+    def udev_format_types(cls):
+        return [cls._base_type_specifier]
+
 
 class EFIFormatPopulator(BootFormatPopulator):
     _type_specifier = "efi"
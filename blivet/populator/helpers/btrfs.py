@@ -34,11 +34,14 @@ class BTRFSFormatPopulator(FormatPopulator):
     priority = 100
     _type_specifier = "btrfs"
 
-    def _get_kwargs(self):
-        kwargs = super(BTRFSFormatPopulator, self)._get_kwargs()
+    @classmethod
+    def udev_uuid(cls, data):
         # the format's uuid attr will contain the UUID_SUB, while the
         # overarching volume UUID will be stored as vol_uuid
-        kwargs["uuid"] = self.data["ID_FS_UUID_SUB"]
+        return data["ID_FS_UUID_SUB"]
+
+    def _get_kwargs(self):
+        kwargs = super(BTRFSFormatPopulator, self)._get_kwargs()
         kwargs["vol_uuid"] = udev.device_get_uuid(self.data)
         return kwargs
 
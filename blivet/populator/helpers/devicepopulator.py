@@ -31,6 +31,14 @@ class DevicePopulator(PopulatorHelper):
         Subclasses must define a match method and, if they want to instantiate
         a device, a run method.
     """
+    _dm_subsystems = None
+    """ Device-mapper subsystems this helper can match, None if not limited. """
+
+    _features = None
+    """ Values of :class:`~.udev.DeviceFeatures` fields a device needs to have
+        for this helper to match it, None if not limited.
+    """
+
     @classmethod
     def match(cls, data):
         return False
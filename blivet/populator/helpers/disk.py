@@ -46,6 +46,7 @@ log = logging.getLogger("blivet")
 class DiskDevicePopulator(DevicePopulator):
     priority = 10
     _device_class = DiskDevice
+    _features = {"is_partition": False}
 
     @classmethod
     def match(cls, data):
@@ -44,10 +44,14 @@ class DiskLabelFormatPopulator(FormatPopulator):
                 udev.device_get_format(data) not in ("iso9660", "udf") and
                 not (device.is_disk and udev.device_get_format(data) == "mpath_member"))
 
-    def _get_kwargs(self):
-        kwargs = super(DiskLabelFormatPopulator, self)._get_kwargs()
-        kwargs["uuid"] = udev.device_get_disklabel_uuid(self.data)
-        return kwargs
+    @classmethod
+    def udev_format_types(cls):
+        # disklabels are not reported as a udev format type
+        return None
+
+    @classmethod
+    def udev_uuid(cls, data):
+        return udev.device_get_disklabel_uuid(data)
 
     def run(self):
         disklabel_type = udev.device_get_disklabel_type(self.data)
@@ -32,6 +32,7 @@ log = logging.getLogger("blivet")
 
 class DMDevicePopulator(DevicePopulator):
     priority = 50
+    _features = {"is_dm": True}
 
     @classmethod
     @availability.blockdev_dm_required()
@@ -52,20 +52,42 @@ class FormatPopulator(PopulatorHelper):
         if cls is FormatPopulator:
             ret = True
         else:
-            format_class = formats.get_device_format_class(cls._type_specifier)
-            fmt_types = []
-            if format_class is not None:
-                fmt_types = format_class._udev_types[:]
-                if cls._type_specifier and cls._type_specifier not in fmt_types:
-                    fmt_types.append(cls._type_specifier)
-
-            ret = (udev.device_get_format(data) in fmt_types)
+            ret = (udev.device_get_format(data) in cls.udev_format_types())
 
         return ret
 
+    @classmethod
+    def udev_format_types(cls):
+        """ Return the udev format types this helper can match.
+
+            :returns: list of udev format types or None if any type can match
+            :rtype: list of str or NoneType
+        """
+        if cls is FormatPopulator:
+            return None
+
+        format_class = formats.get_device_format_class(cls._type_specifier)
+        fmt_types = []
+        if format_class is not None:
+            fmt_types = format_class._udev_types[:]
+            if cls._type_specifier and cls._type_specifier not in fmt_types:
+                fmt_types.append(cls._type_specifier)
+
+        return fmt_types
+
+    @classmethod
+    def udev_uuid(cls, data):
+        """ Return the uuid of the format this helper creates for the given data.
+
+            :param :class:`pyudev.Device` data: udev data describing a device
+            :returns: the value for the format's uuid attribute
+            :rtype: str or NoneType
+        """
+        return udev.device_get_uuid(data)
+
     def _get_kwargs(self):
         """ Return a kwargs dict to pass to DeviceFormat constructor. """
-        kwargs = {"uuid": udev.device_get_uuid(self.data),
+        kwargs = {"uuid": self.udev_uuid(self.data),
                   "label": udev.device_get_label(self.data),
                   "device": self.device.path,
                   "serial": udev.device_get_serial(self.data),
@@ -88,6 +110,10 @@ class FormatPopulator(PopulatorHelper):
         try:
             log.info("type detected on '%s' is '%s'", self.device.name, type_spec)
             self.device.format = formats.get_format(type_spec, **kwargs)
+            if isinstance(self.device.format, formats.fs.FS):
+                # the filesystem probes its size on first use, when the device
+                # may have been torn down
+                self.device.format.size_probe_device = self.device
         except FSError:
             log.warning("type '%s' on '%s' invalid, assuming no format",
                         type_spec, self.device.name)
@@ -37,15 +37,19 @@ class LoopDevicePopulator(DevicePopulator):
     def match(cls, data):
         return udev.device_is_loop(data)
 
+    @classmethod
+    def probe(cls, data):
+        try:
+            return blockdev.loop.info(udev.device_get_name(data))
+        except blockdev.LoopError:
+            return None
+
     def run(self):
         name = udev.device_get_name(self.data)
         log_method_call(self, name=name)
         sysfs_path = udev.device_get_sysfs_path(self.data)
-        try:
-            info = blockdev.loop.info(name)
-        except blockdev.LoopError:
-            return None
-        if not info.backing_file:
+        info = self.probe_data
+        if info is None or not info.backing_file:
             return None
         file_device = self._devicetree.get_device_by_name(info.backing_file)
         if not file_device:
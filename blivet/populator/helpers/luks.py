@@ -38,6 +38,8 @@ log = logging.getLogger("blivet")
 
 
 class LUKSDevicePopulator(DevicePopulator):
+    _dm_subsystems = ("crypt",)
+
     @classmethod
     def match(cls, data):
         return udev.device_is_dm_luks(data)
@@ -53,21 +55,30 @@ class LUKSDevicePopulator(DevicePopulator):
 
 
 class IntegrityDevicePopulator(DevicePopulator):
+    _dm_subsystems = ("crypt",)
+
     @classmethod
     def match(cls, data):
         return udev.device_is_dm_integrity(data)
 
+    @classmethod
+    def probe(cls, data):
+        name = udev.device_get_name(data)
+        try:
+            return blockdev.crypto.integrity_info(name)
+        except blockdev.BlockDevError:
+            log.info("failed to get information about integrity device %s", name)
+            return None
+
     def run(self):
         parents = self._devicetree._add_parent_devices(self.data)
         name = udev.device_get_name(self.data)
 
-        try:
-            info = blockdev.crypto.integrity_info(name)
+        info = self.probe_data
+        if info is not None:
             # integrity algorithm is not part of the on-disk metadata but for active
             # device we can get it from device mapper so let's set it here
             parents[0].format.algorithm = info.algorithm
-        except blockdev.BlockDevError:
-            log.info("failed to get information about integrity device %s", name)
 
         device = IntegrityDevice(name,
                                  sysfs_path=udev.device_get_sysfs_path(self.data),
@@ -78,6 +89,8 @@ class IntegrityDevicePopulator(DevicePopulator):
 
 
 class BITLKDevicePopulator(DevicePopulator):
+    _dm_subsystems = ("crypt",)
+
     @classmethod
     def match(cls, data):
         return udev.device_is_dm_bitlk(data)
@@ -96,6 +109,15 @@ class LUKSFormatPopulator(FormatPopulator):
     priority = 100
     _type_specifier = "luks"
 
+    @classmethod
+    def probe(cls, data):
+        path = udev.device_get_devname(data)
+        try:
+            return blockdev.crypto.luks_info(path)
+        except blockdev.CryptoError as e:
+            log.warning("Failed to get information about LUKS format on %s: %s", path, str(e))
+            return None
+
     def _get_kwargs(self):
         kwargs = super(LUKSFormatPopulator, self)._get_kwargs()
 
@@ -108,11 +130,8 @@ class LUKSFormatPopulator(FormatPopulator):
         kwargs["luks_version"] = "luks%s" % udev.device_get_format_version(self.data)
         kwargs["label"] = udev.device_get_label(self.data)
 
-        try:
-            info = blockdev.crypto.luks_info(self.device.path)
-        except blockdev.CryptoError as e:
-            log.warning("Failed to get information about LUKS format on %s: %s", self.device, str(e))
-        else:
+        info = self.probe_data
+        if info is not None:
             if info.hw_encryption == blockdev.CryptoLUKSHWEncryptionType.OPAL_HW_AND_SW:
                 kwargs["luks_version"] = "luks2-hw-opal"
             elif info.hw_encryption == blockdev.CryptoLUKSHWEncryptionType.OPAL_HW_ONLY:
@@ -38,12 +38,15 @@ from .devicepopulator import DevicePopulator
 from .formatpopulator import FormatPopulator
 
 from ...static_data import lvs_info, pvs_info, vgs_info
+from ...static_data.prefetch import prefetch_caches
 
 import logging
 log = logging.getLogger("blivet")
 
 
 class LVMDevicePopulator(DevicePopulator):
+    _dm_subsystems = ("lvm",)
+
     @classmethod
     @availability.blockdev_lvm_required()
     def match(cls, data):
@@ -96,11 +99,17 @@ class LVMFormatPopulator(FormatPopulator):
     def _get_kwargs(self):
         kwargs = super(LVMFormatPopulator, self)._get_kwargs()
 
-        # new PV, add it to the LVM devices list and re-run pvs/lvs/vgs
+        # new PV, add it to the LVM devices list and re-run pvs/lvs/vgs unless
+        # they already ran (or are running) with the PV on the list
         lvm.lvm_devices_add(self.device.path)
-        pvs_info.drop_cache()
-        vgs_info.drop_cache()
-        lvs_info.drop_cache()
+        stale = [info for info in (pvs_info, vgs_info, lvs_info)
+                 if not info.loaded_with_device(self.device.path)]
+        for info in stale:
+            info.drop_cache()
+
+        if flags.prefetch_device_info:
+            # the VG and LV populators need vgs and lvs later on
+            prefetch_caches(stale)
 
         pv_info = pvs_info.cache.get(self.device.path, None)
 
@@ -43,6 +43,8 @@ log = logging.getLogger("blivet")
 
 
 class MDDevicePopulator(DevicePopulator):
+    _features = {"is_md": True}
+
     @classmethod
     @availability.blockdev_md_required()
     def match(cls, data):
@@ -119,19 +121,27 @@ class MDFormatPopulator(FormatPopulator):
             # for BIOS RAIDs we can't get the UUID from udev, we'll get it from mdadm in `run` below
             kwargs["md_uuid"] = None
 
-        # reset the uuid to the member-specific value
-        # this will be None for members of v0 metadata arrays
-        kwargs["uuid"] = udev.device_get_md_device_uuid(self.data)
-
         return kwargs
 
-    def run(self):
-        super(MDFormatPopulator, self).run()
+    @classmethod
+    def udev_uuid(cls, data):
+        # the member-specific uuid, this will be None for members of v0
+        # metadata arrays
+        return udev.device_get_md_device_uuid(data)
+
+    @classmethod
+    def probe(cls, data):
         try:
-            md_info = blockdev.md.examine(self.device.path)
+            return blockdev.md.examine(udev.device_get_devname(data))
         except blockdev.MDRaidError as e:
             # This could just mean the member is not part of any array.
             log.debug("blockdev.md.examine error: %s", str(e))
+            return None
+
+    def run(self):
+        super(MDFormatPopulator, self).run()
+        md_info = self.probe_data
+        if md_info is None:
             return
 
         # Use mdadm info if udev info is missing
@@ -31,6 +31,8 @@ log = logging.getLogger("blivet")
 
 
 class MultipathDevicePopulator(DevicePopulator):
+    _dm_subsystems = ("mpath",)
+
     @classmethod
     def match(cls, data):
         return (udev.device_is_dm_mpath(data) and
@@ -56,11 +58,15 @@ class MultipathFormatPopulator(FormatPopulator):
     priority = 100
     _type_specifier = "multipath_member"
 
-    def _get_kwargs(self):
-        kwargs = super(MultipathFormatPopulator, self)._get_kwargs()
+    @classmethod
+    def udev_uuid(cls, data):
         # blkid does not care that the UUID it sees on a multipath member is
         # for the multipath set's (and not the member's) formatting, so we
         # have to discard it.
+        return None
+
+    def _get_kwargs(self):
+        kwargs = super(MultipathFormatPopulator, self)._get_kwargs()
         kwargs.pop("uuid")
         kwargs.pop("label")
         return kwargs
@@ -21,6 +21,9 @@
 #
 
 
+_NOT_PROBED = object()
+
+
 class PopulatorHelper(object):
     """ Class to hold type-specific code for populating the devicetree. """
 
@@ -37,6 +40,33 @@ class PopulatorHelper(object):
         self._devicetree = devicetree
         self.data = data
         self.device = device
+        self._probe_data = _NOT_PROBED
+
+    @classmethod
+    def probe(cls, data):  # pylint: disable=unused-argument
+        """ Gather the information about a device that does not depend on the tree.
+
+            When devices are probed in parallel (see
+            :attr:`~.flags.Flags.populate_workers`) this runs in a worker
+            thread before the helper is used, so it must not access the device
+            tree or call any synchronized methods.
+
+            :param :class:`pyudev.Device` data: udev data describing a device
+            :returns: the information, for :meth:`run` to use via :attr:`probe_data`
+        """
+        return None
+
+    @property
+    def probe_data(self):
+        """ Result of :meth:`probe` for this helper's device. """
+        if self._probe_data is _NOT_PROBED:
+            return self.probe(self.data)
+
+        return self._probe_data
+
+    @probe_data.setter
+    def probe_data(self, probe_data):
+        self._probe_data = probe_data
 
     @classmethod
     def match(cls, data):
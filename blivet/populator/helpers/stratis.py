@@ -246,6 +246,10 @@ class StratisXFSFormatPopulator(FormatPopulator):
 
         return False
 
+    @classmethod
+    def udev_format_types(cls):
+        return ["xfs"]
+
     def run(self):
         """ Create a format instance and associate it with the device instance. """
         kwargs = self._get_kwargs()
@@ -24,6 +24,8 @@ import os
 import pprint
 import copy
 import parted
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import gi
 gi.require_version("BlockDev", "3.0")
@@ -43,17 +45,22 @@ from .. import formats
 from .. import udev
 from .. import util
 from ..flags import flags
-from ..storage_log import log_method_call
+from ..storage_log import lazy_format, log_method_call, traced
 from ..tasks import availability
 from ..threads import SynchronizedMeta
-from .helpers import get_device_helper, get_format_helper
+from .helpers import get_device_helper, get_format_helper, get_helper_probes
 from ..static_data import lvs_info, pvs_info, vgs_info, encryption_data, mpath_members, stratis_info
+from ..static_data.prefetch import prefetch_caches
 from ..callbacks import callbacks
 
 import logging
 log = logging.getLogger("blivet")
 
 
+DeviceProbe = namedtuple("DeviceProbe", ["info", "helper_class", "readonly", "helper_probes"])
+""" Results of probing a device that do not depend on the device tree. """
+
+
 def parted_exn_handler(exn_type, exn_options, exn_msg):
     """ Answer any of parted's yes/no questions in the affirmative.
 
@@ -71,6 +78,10 @@ def parted_exn_handler(exn_type, exn_options, exn_msg):
 
 
 class PopulatorMixin(object, metaclass=SynchronizedMeta):
+    # these run in the worker threads of a parallel populate while the main
+    # thread holds the lock
+    _unsynchronized_methods = ["_probe_device", "_is_readonly_device"]
+
     def __init__(self, disk_images=None):
         """
             :keyword disk_images: dictionary of disk images
@@ -89,6 +100,9 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         # initialize attributes that may later hold cached lvm info
         self.drop_device_info_cache()
 
+        # results of probing devices in parallel, keyed by sysfs path
+        self._device_probes = {}
+
         self._cleanup = False
 
     def _add_parent_devices(self, info):
@@ -145,14 +159,6 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
 
         return parent_devices
 
-    def _add_name(self, name):
-        if name not in self.names:
-            self.names.append(name)
-
-    def _remove_name(self, name):
-        if name in self.names:
-            self.names.remove(name)
-
     def _reason_to_skip_device(self, info):
         sysfs_path = udev.device_get_sysfs_path(info)
         uuid = udev.device_get_uuid(info)
@@ -213,10 +219,27 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
             # remove children from tree so that we don't stumble upon them later
             self.recursive_remove(device, actions=False, remove_device=False)
 
+    def _get_device_probe(self, info):
+        """ Return the result of probing the device in parallel, if any.
+
+            The probe is only used for the very info it was created from so
+            that devices re-read from udev during the scan are probed again.
+        """
+        probe = self._device_probes.get(udev.device_get_sysfs_path(info))
+        if probe is not None and probe.info is info:
+            return probe
+
+        return None
+
+    def _is_readonly_device(self, info):
+        return udev.device_is_disk(info) and \
+            util.get_sysfs_attr(udev.device_get_sysfs_path(info), 'ro') == '1'
+
     def _mark_readonly_device(self, info, device):
         # If this device is read-only, mark it as such now.
-        if udev.device_is_disk(info) and \
-                util.get_sysfs_attr(udev.device_get_sysfs_path(info), 'ro') == '1':
+        probe = self._get_device_probe(info)
+        readonly = probe.readonly if probe else self._is_readonly_device(info)
+        if readonly:
             device.readonly = True
 
     def _update_exclusive_disks(self, device):
@@ -233,8 +256,54 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         return get_format_helper(info, device=device)
 
     def _get_device_helper(self, info):
+        probe = self._get_device_probe(info)
+        if probe is not None:
+            return probe.helper_class
+
         return get_device_helper(info)
 
+    def _get_helper(self, helper_class, info, device=None):
+        """ Return a helper instance using the results of probing the device in parallel. """
+        helper = helper_class(self, info, device=device)
+        probe = self._get_device_probe(info)
+        if probe is not None and helper_class in probe.helper_probes:
+            helper.probe_data = probe.helper_probes[helper_class]
+
+        return helper
+
+    def _probe_device(self, info):
+        """ Gather information about a device that does not depend on the tree.
+
+            Besides picking the device helper this runs the helpers' probes,
+            i.e. the libblockdev queries of the device and its format (see
+            :func:`~.helpers.get_helper_probes`). This runs in a worker
+            thread, so it must not access the device tree or call any
+            synchronized methods.
+
+            :param dict info: udev info for the device
+            :rtype: :class:`DeviceProbe`
+        """
+        helper_class = get_device_helper(info)
+        return DeviceProbe(info=info,
+                           helper_class=helper_class,
+                           readonly=self._is_readonly_device(info),
+                           helper_probes=get_helper_probes(info, helper_class))
+
+    def _probe_devices(self, devices):
+        """ Probe devices in parallel if enabled by :attr:`~.flags.Flags.populate_workers`.
+
+            :param list devices: udev info for the devices about to be scanned
+        """
+        self._device_probes = {}
+        workers = min(flags.populate_workers, len(devices))
+        if workers <= 1:
+            return
+
+        log.debug("probing %d devices using %d workers", len(devices), workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="populate") as executor:
+            for probe in executor.map(self._probe_device, devices):
+                self._device_probes[udev.device_get_sysfs_path(probe.info)] = probe
+
     def _get_stratis_blockdev(self, info):
         """ Traverses from a stratis DM device to the parent blockdev """
         while True:
@@ -246,6 +315,7 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
                 return udev.device_get_name(parents[0])
             info = parents[0]
 
+    @traced
     def handle_device(self, info, update_orig_fmt=False):
         """
             :param :class:`pyudev.Device` info: udev info for the device
@@ -257,7 +327,7 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
             will not be updated unless update_orig_fmt is True.
         """
         name = udev.device_get_name(info)
-        log_method_call(self, name=name, info=pprint.pformat(dict(info)))
+        log_method_call(self, name=name, info=lazy_format(lambda i: pprint.pformat(dict(i)), info))
         sysfs_path = udev.device_get_sysfs_path(info)
 
         reason = self._reason_to_skip_device(info)
@@ -296,8 +366,6 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
                 self.handle_format(bdev_info, bdev, force=True)
             return
 
-        # make sure we note the name of every device we see
-        self._add_name(name)
         device = self.get_device_by_name(name)
         device = self._handle_degraded_md(info, device)
         self._clear_new_multipath_member(device)
@@ -311,7 +379,7 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
 
         if helper_class is not None:
             try:
-                device = helper_class(self, info).run()
+                device = self._get_helper(helper_class, info).run()
             except DeviceTreeError as e:
                 log.error("error handling device %s: %s", name, str(e))
                 device = self.get_device_by_name(name, incomplete=True, hidden=True)
@@ -341,6 +409,7 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         device.device_links = udev.device_get_symlinks(info)
         callbacks.device_scanned(device_name=name)
 
+    @traced
     def handle_format(self, info, device, force=False):
         log_method_call(self, name=getattr(device, "name", None))
 
@@ -364,22 +433,23 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         helper_class = self._get_format_helper(info, device=device)
         if helper_class is not None:
             try:
-                helper_class(self, info, device).run()
+                self._get_helper(helper_class, info, device=device).run()
             except DeviceTreeError as e:
                 log.error("error handling formatting on %s: %s", device.name, str(e))
 
         log.info("got format: %s", device.format)
 
     def _handle_inconsistencies(self):
-        for vg in [d for d in self.devices if d.type == "lvmvg"]:
-            if vg.complete:
-                continue
+        with lvm.devices_batch():
+            for vg in [d for d in self.devices if d.type == "lvmvg"]:
+                if vg.complete:
+                    continue
 
-            # Make sure lvm doesn't get confused by PVs that belong to
-            # incomplete VGs. We will add the PVs to the accept list when/if
-            # the time comes to remove the incomplete VG and its PVs.
-            for pv in vg.pvs:
-                lvm.lvm_devices_remove(pv.path)
+                # Make sure lvm doesn't get confused by PVs that belong to
+                # incomplete VGs. We will add the PVs to the accept list when/if
+                # the time comes to remove the incomplete VG and its PVs.
+                for pv in vg.pvs:
+                    lvm.lvm_devices_remove(pv.path)
 
     def set_disk_images(self, images):
         """ Set the disk images and reflect them in exclusive_disks.
@@ -460,6 +530,7 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         # Method is here for compatibility with blivet 1.x
         encryption_data.save_passphrase(device)
 
+    @traced
     def populate(self, cleanup_only=False):
         """ Locate all storage devices.
 
@@ -484,6 +555,7 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         log.info("DeviceTree.populate: ignored_disks is %s ; exclusive_disks is %s",
                  self.ignored_disks, self.exclusive_disks)
 
+        self.probe_dependencies()
         disklib.update_volume_info()
         self.drop_device_info_cache()
 
@@ -497,16 +569,32 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
                 log.error("Failed to set mpath friendly names: %s", str(e))
 
         self.setup_disk_images()
+        self.prefetch_device_info()
+        self._scan_devices()
 
-        old_devices = {}
+        # After having the complete tree we make sure that the system
+        # inconsistencies are ignored or resolved.
+        self._handle_inconsistencies()
+
+    def _scan_devices(self, old_devices=None):
+        """ Scan udev devices until no new devices appear.
+
+            :keyword dict old_devices: udev info of devices not to scan, keyed by name
+        """
+        old_devices = old_devices or {}
         n_devices = 0
         report = True
 
+        # devices appearing while we scan (activated LVs, assembled arrays,
+        # ...) are picked up from the monitor instead of enumerating all
+        # devices again
+        monitor = udev.start_device_monitor()
+        new_devices = udev.get_devices()
+
         # Now, loop and scan for devices that have appeared since the two above
         # blocks or since previous iterations.
         while True:
             devices = []
-            new_devices = udev.get_devices()
 
             for new_device in new_devices:
                 new_name = udev.device_get_name(new_device)
@@ -524,13 +612,128 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
                 report = False
 
             log.info("devices to scan: %s", [udev.device_get_name(d) for d in devices])
-            for dev in devices:
-                self.handle_device(dev)
+            self._probe_devices(devices)
+            try:
+                for dev in devices:
+                    self.handle_device(dev)
+            finally:
+                self._device_probes = {}
+
+            new_devices = monitor.get_devices() if monitor is not None else None
+            if new_devices is None:
+                # no monitor or it lost some events
+                monitor = None
+                new_devices = udev.get_devices()
+
+    def repopulate(self, changed=None):
+        """ Update the tree to reflect changes of the system's devices.
+
+            Unlike :meth:`populate` this only rescans the devices that have
+            changed since the tree was populated, keeping all other device
+            instances intact. Devices are matched to the current udev data
+            by their sysfs path. Devices that are gone or whose name or format
+            UUID differs are removed from the tree along with their descendants
+            (disks are kept but lose their formatting) and then, like any new
+            devices, scanned again.
+
+            :keyword changed: devices to rescan even if they look unchanged
+            :type changed: list of :class:`~.devices.StorageDevice`
+            :raises: :class:`~.errors.DeviceTreeError` if actions are scheduled
 
-        # After having the complete tree we make sure that the system
-        # inconsistencies are ignored or resolved.
+            .. note::
+
+                The tree must not contain any changes that have not been
+                committed to disk yet, since those cannot be reconciled with
+                the system's state.
+        """
+        if self.actions.find():
+            raise DeviceTreeError("cannot repopulate a device tree with scheduled actions")
+
+        parted.register_exn_handler(parted_exn_handler)
+        try:
+            self._repopulate(changed=changed)
+        finally:
+            parted.clear_exn_handler()
+            self._hide_ignored_disks()
+
+    def _repopulate(self, changed=None):
+        log.info("DeviceTree.repopulate: changed is %s",
+                 [d.name for d in changed or []])
+
+        disklib.update_volume_info()
+        self.drop_device_info_cache()
+
+        # force LVM DBusD to refresh its internal state
+        lvm.lvm_dbusd_refresh()
+        self.prefetch_device_info()
+
+        infos = dict((udev.device_get_sysfs_path(info), info) for info in udev.get_devices())
+
+        stale = list(changed or [])
+        for device in self.devices:
+            if not device.exists or not device.sysfs_path:
+                continue
+
+            info = infos.get(device.sysfs_path)
+            if info is None or self._device_changed(device, info):
+                log.debug("%s has changed", device.name)
+                stale.append(device)
+
+                # a partition that went away also changed its disk's partition table
+                if info is None and device.type == "partition":
+                    stale.extend(d for d in device.parents if d not in stale)
+
+        # a new partition means that the disk's partition table changed
+        for (sysfs_path, info) in infos.items():
+            if udev.device_is_partition(info) and \
+               not self.get_device_by_sysfs_path(sysfs_path, incomplete=True, hidden=True):
+                disk = self.get_device_by_sysfs_path(os.path.dirname(sysfs_path))
+                if disk is not None and disk not in stale:
+                    log.debug("%s has a new partition", disk.name)
+                    stale.append(disk)
+
+        for device in stale:
+            # the device may have been removed along with another stale device
+            if device not in self.devices:
+                continue
+
+            self.recursive_remove(device, actions=False, modparent=False)
+            if device in self.devices:
+                # disks stay in the tree, but their formatting will be rescanned
+                device.original_format = copy.deepcopy(device.format)
+
+        # scan all devices except the ones that are still in the tree unchanged
+        old_devices = {}
+        for (sysfs_path, info) in infos.items():
+            device = self.get_device_by_sysfs_path(sysfs_path, incomplete=True, hidden=True)
+            if device is not None and device not in stale:
+                old_devices[udev.device_get_name(info)] = info
+
+        self._scan_devices(old_devices=old_devices)
         self._handle_inconsistencies()
 
+    def _device_changed(self, device, info):
+        """ Return True if the udev info no longer matches the device.
+
+            :param device: a device in the tree
+            :type device: :class:`~.devices.StorageDevice`
+            :param dict info: the current udev info for the device
+            :rtype: bool
+        """
+        name = udev.device_get_name(info)
+        if device.name not in (name, name.replace("--", "-")):
+            return True
+
+        # formats take their uuid from different udev properties, e.g. btrfs
+        # and md members use the member-specific one
+        helper_class = self._get_format_helper(info, device=device)
+        if helper_class is not None:
+            uuid = helper_class.udev_uuid(info)
+        else:
+            uuid = udev.device_get_uuid(info)
+
+        return uuid != device.format.uuid
+
     def drop_device_info_cache(self):
         """ Drop cached device information. """
         lvs_info.drop_cache()
@@ -539,6 +742,42 @@ class PopulatorMixin(object, metaclass=SynchronizedMeta):
         mpath_members.drop_cache()
         stratis_info.drop_cache()
 
+    def prefetch_device_info(self):
+        """ Start loading the cached device information in the background.
+
+            The LVM, multipath and Stratis queries run concurrently with each
+            other and with the device scan, which waits for their results
+            when it needs them. Disabled by :attr:`~.flags.Flags.prefetch_device_info`.
+        """
+        if not flags.prefetch_device_info:
+            return
+
+        prefetch_caches([lvs_info, pvs_info, vgs_info, mpath_members, stratis_info])
+
+    def probe_filesystem_sizes(self):
+        """ Run the postponed size probes of the filesystems found.
+
+            The filesystems probe their sizes on first use. Callers that need
+            all of them can call this right after :meth:`populate` to run the
+            probes concurrently, while the devices are still set up from the
+            scan (see :func:`~.formats.fs.prefetch_size_info`).
+        """
+        formats.fs.prefetch_size_info([d.format for d in self.devices
+                                       if isinstance(d.format, formats.fs.FS)])
+
+    def probe_dependencies(self):
+        """ Start checking the availability of the external dependencies in the background.
+
+            The checks of the external tools and libblockdev plugins run
+            concurrently instead of one by one when the devices and formats
+            first need them. Enabled by :attr:`~.flags.Flags.probe_dependencies`,
+            the results are cached in :attr:`~.flags.Flags.availability_cache`.
+        """
+        if not flags.probe_dependencies:
+            return
+
+        availability.probe_resources(cache_file=flags.availability_cache, wait=False)
+
     def handle_nodev_filesystems(self):
         with open("/proc/mounts") as mounts:
             for line in mounts:
@@ -90,8 +90,9 @@ class Size(bytesize.Size):
     def __mod__(self, other):
         return Size(bytesize.Size.__mod__(self, other))
 
-    def __deepcopy__(self, memo_dict):
-        return Size(bytesize.Size.__deepcopy__(self, memo_dict))
+    def __deepcopy__(self, memo_dict):  # pylint: disable=unused-argument
+        # Size instances are immutable, copies can share them
+        return self
 
     # pylint: disable=arguments-differ,arguments-renamed
     def convert_to(self, spec=None):
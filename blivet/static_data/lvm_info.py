@@ -25,107 +25,170 @@ gi.require_version("BlockDev", "3.0")
 
 from gi.repository import BlockDev as blockdev
 
+from ..tasks import availability
+from .prefetch import PrefetchableCache
+
 import logging
 log = logging.getLogger("blivet")
 
 
-class LVsInfo(object):
+class _LVMInfo(PrefetchableCache):
+    """ Base class for the LVM caches.
+
+        LVM only reports the devices it is allowed to use, so the caches
+        remember the list of allowed devices they were loaded with (see
+        :meth:`loaded_with_device`).
+    """
+
+    def __init__(self):
+        super(_LVMInfo, self).__init__()
+        self._lvm_devices = None
+
+    def _prefetch_wanted(self):
+        return availability.BLOCKDEV_LVM_PLUGIN.available
+
+    def _record_lvm_devices(self):
+        from ..devicelibs import lvm
+        self._lvm_devices = lvm.lvm_devices_copy()
+
+    def prefetch(self, executor):
+        self._record_lvm_devices()
+        super(_LVMInfo, self).prefetch(executor)
+
+    def loaded_with_device(self, path):
+        """ Whether the cache is (being) loaded with LVM allowed to use a device.
+
+            :param str path: path of the device
+            :rtype: bool
+        """
+        return self._lvm_devices is not None and path in self._lvm_devices
+
+    def drop_cache(self):
+        self._cancel_prefetch()
+        self._lvm_devices = None
+
+
+class LVsInfo(_LVMInfo):
     """ Class to be used as a singleton.
         Maintains the LVs cache.
     """
 
     def __init__(self):
+        super(LVsInfo, self).__init__()
         self._lvs_cache = None
 
+    def _load(self):
+        try:
+            lvs = blockdev.lvm.lvs()
+        except NotImplementedError:
+            log.error("libblockdev lvm plugin is missing")
+            return dict()
+
+        return dict(("%s-%s" % (lv.vg_name, lv.lv_name), lv) for lv in lvs)
+
     @property
     def cache(self):
         if self._lvs_cache is None:
-            try:
-                lvs = blockdev.lvm.lvs()
-            except NotImplementedError:
-                log.error("libblockdev lvm plugin is missing")
-                self._lvs_cache = dict()
-                return self._lvs_cache
-
-            self._lvs_cache = dict(("%s-%s" % (lv.vg_name, lv.lv_name), lv) for lv in lvs)
+            self._lvs_cache = self._get_prefetched()
+        if self._lvs_cache is None:
+            self._record_lvm_devices()
+            self._lvs_cache = self._load()
 
         return self._lvs_cache
 
     def drop_cache(self):
+        super(LVsInfo, self).drop_cache()
         self._lvs_cache = None
 
 
 lvs_info = LVsInfo()
 
 
-class PVsInfo(object):
+class PVsInfo(_LVMInfo):
     """ Class to be used as a singleton.
         Maintains the PVs cache.
     """
 
     def __init__(self):
+        super(PVsInfo, self).__init__()
         self._pvs_cache = None
 
+    def _load(self):
+        pvs_cache = dict()
+
+        try:
+            pvs = blockdev.lvm.pvs()
+        except NotImplementedError:
+            log.error("libblockdev lvm plugin is missing")
+            return pvs_cache
+
+        for pv in pvs:
+            pvs_cache[pv.pv_name] = pv
+            # TODO: add get_all_device_symlinks() and resolve_device_symlink() functions to
+            #       libblockdev and use them here
+            if pv.pv_name.startswith("/dev/md/"):
+                try:
+                    md_node = blockdev.md.node_from_name(pv.pv_name[len("/dev/md/"):])
+                    pvs_cache["/dev/" + md_node] = pv
+                except blockdev.MDRaidError:
+                    pass
+            elif pv.pv_name.startswith("/dev/md"):
+                try:
+                    md_named_dev = blockdev.md.name_from_node(pv.pv_name[len("/dev/"):])
+                    pvs_cache["/dev/md/" + md_named_dev] = pv
+                except blockdev.MDRaidError:
+                    pass
+
+        return pvs_cache
+
     @property
     def cache(self):
         if self._pvs_cache is None:
-            self._pvs_cache = dict()
-
-            try:
-                pvs = blockdev.lvm.pvs()
-            except NotImplementedError:
-                log.error("libblockdev lvm plugin is missing")
-                return self._pvs_cache
-
-            for pv in pvs:
-                self._pvs_cache[pv.pv_name] = pv
-                # TODO: add get_all_device_symlinks() and resolve_device_symlink() functions to
-                #       libblockdev and use them here
-                if pv.pv_name.startswith("/dev/md/"):
-                    try:
-                        md_node = blockdev.md.node_from_name(pv.pv_name[len("/dev/md/"):])
-                        self._pvs_cache["/dev/" + md_node] = pv
-                    except blockdev.MDRaidError:
-                        pass
-                elif pv.pv_name.startswith("/dev/md"):
-                    try:
-                        md_named_dev = blockdev.md.name_from_node(pv.pv_name[len("/dev/"):])
-                        self._pvs_cache["/dev/md/" + md_named_dev] = pv
-                    except blockdev.MDRaidError:
-                        pass
+            self._pvs_cache = self._get_prefetched()
+        if self._pvs_cache is None:
+            self._record_lvm_devices()
+            self._pvs_cache = self._load()
 
         return self._pvs_cache
 
     def drop_cache(self):
+        super(PVsInfo, self).drop_cache()
         self._pvs_cache = None
 
 
 pvs_info = PVsInfo()
 
 
-class VGsInfo(object):
+class VGsInfo(_LVMInfo):
     """ Class to be used as a singleton.
         Maintains the VGs cache.
     """
 
     def __init__(self):
+        super(VGsInfo, self).__init__()
         self._vgs_cache = None
 
+    def _load(self):
+        try:
+            vgs = blockdev.lvm.vgs()
+        except NotImplementedError:
+            log.error("libblockdev lvm plugin is missing")
+            return dict()
+
+        return dict(("%s" % (vg.uuid), vg) for vg in vgs)
+
     @property
     def cache(self):
         if self._vgs_cache is None:
-            try:
-                vgs = blockdev.lvm.vgs()
-            except NotImplementedError:
-                log.error("libblockdev lvm plugin is missing")
-                self._vgs_cache = dict()
-                return self._vgs_cache
-
-            self._vgs_cache = dict(("%s" % (vg.uuid), vg) for vg in vgs)
+            self._vgs_cache = self._get_prefetched()
+        if self._vgs_cache is None:
+            self._record_lvm_devices()
+            self._vgs_cache = self._load()
 
         return self._vgs_cache
 
     def drop_cache(self):
+        super(VGsInfo, self).drop_cache()
         self._vgs_cache = None
 
 
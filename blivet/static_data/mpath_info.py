@@ -28,30 +28,42 @@ import logging
 log = logging.getLogger("blivet")
 
 from ..tasks import availability
+from .prefetch import PrefetchableCache
 
 
-class MpathMembers(object):
+class MpathMembers(PrefetchableCache):
     """A cache for querying multipath member devices"""
 
     def __init__(self):
+        super(MpathMembers, self).__init__()
         self._members = None
 
+    def _load(self):
+        if availability.BLOCKDEV_MPATH_PLUGIN.available:
+            return set(blockdev.mpath.get_mpath_members())
+        else:
+            return set()
+
+    def _get_members(self):
+        if self._members is None:
+            self._members = self._get_prefetched()
+        if self._members is None:
+            self._members = self._load()
+
+        return self._members
+
     def is_mpath_member(self, device):
         """Checks if the given device is a member of some multipath mapping or not.
 
         :param str device: path of the device to query
 
         """
-        if self._members is None:
-            if availability.BLOCKDEV_MPATH_PLUGIN.available:
-                self._members = set(blockdev.mpath.get_mpath_members())
-            else:
-                self._members = set()
+        members = self._get_members()
 
         device = os.path.realpath(device)
         device = device[len("/dev/"):]
 
-        return device in self._members
+        return device in members
 
     def update_cache(self, device):
         """Update the cache with the given device (checks and adds it is an mpath member)
@@ -63,9 +75,10 @@ class MpathMembers(object):
         device = device[len("/dev/"):]
 
         if availability.BLOCKDEV_MPATH_PLUGIN.available and blockdev.mpath.is_mpath_member(device):
-            self._members.add(device)
+            self._get_members().add(device)
 
     def drop_cache(self):
+        self._cancel_prefetch()
         self._members = None
 
 
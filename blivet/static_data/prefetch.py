@@ -0,0 +1,96 @@
+# prefetch.py
+# Background loading of the device information caches.
+#
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU Lesser General Public License v.2, or (at your option) any later
+# version. This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY expressed or implied, including the implied
+# warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See
+# the GNU Lesser General Public License for more details.  You should have
+# received a copy of the GNU Lesser General Public License along with this
+# program; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA 02110-1301, USA.  Any Red Hat trademarks
+# that are incorporated in the source code or documentation are not subject
+# to the GNU Lesser General Public License and may only be used or
+# replicated with the express permission of Red Hat, Inc.
+#
+
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+log = logging.getLogger("blivet")
+
+
+class PrefetchableCache(object):
+    """ Base class for caches that can be filled in the background.
+
+        Subclasses implement :meth:`_load` which returns the new contents
+        of the cache and use :meth:`_get_prefetched` before loading the
+        cache themselves.
+    """
+
+    def __init__(self):
+        self._prefetch_future = None
+
+    def _load(self):
+        """ Return the contents of the cache. """
+        raise NotImplementedError()
+
+    def _prefetch_wanted(self):
+        """ Whether loading the cache in the background is worth it. """
+        return True
+
+    def _prefetch(self):
+        if not self._prefetch_wanted():
+            return None
+
+        return self._load()
+
+    def prefetch(self, executor):
+        """ Start loading the cache in the background.
+
+            :param executor: executor to run the load in
+            :type executor: :class:`concurrent.futures.Executor`
+        """
+        self._cancel_prefetch()
+        self._prefetch_future = executor.submit(self._prefetch)
+
+    def _get_prefetched(self):
+        """ Wait for the background load, if any, and return its result.
+
+            :returns: the contents of the cache or None if not prefetched
+            :raises: any exception raised by the background load
+        """
+        future = self._prefetch_future
+        if future is None:
+            return None
+
+        self._prefetch_future = None
+        return future.result()
+
+    def _cancel_prefetch(self):
+        """ Forget about the background load, its result would be stale. """
+        if self._prefetch_future is not None:
+            self._prefetch_future.cancel()
+            self._prefetch_future = None
+
+
+def prefetch_caches(caches):
+    """ Start loading the given caches concurrently in the background.
+
+        :param caches: the caches to load
+        :type caches: list of :class:`PrefetchableCache`
+    """
+    if not caches:
+        return
+
+    log.debug("prefetching %d device info caches", len(caches))
+    executor = ThreadPoolExecutor(max_workers=len(caches), thread_name_prefix="prefetch")
+    for cache in caches:
+        cache.prefetch(executor)
+
+    # the caches wait for the results when they are accessed
+    executor.shutdown(wait=False)
@@ -29,6 +29,7 @@ from dasbus.typing import get_native
 
 from .. import util
 from ..size import Size
+from .prefetch import PrefetchableCache
 
 import logging
 log = logging.getLogger("blivet")
@@ -69,12 +70,13 @@ def _get_all_properties(obj_path, interface):
     return get_native(properties)
 
 
-class StratisInfo(object):
+class StratisInfo(PrefetchableCache):
     """ Class to be used as a singleton.
         Maintains the Stratis devices info cache.
     """
 
     def __init__(self):
+        super(StratisInfo, self).__init__()
         self._info_cache = None
 
     def _get_pool_info(self, pool_path):
@@ -201,22 +203,22 @@ class StratisInfo(object):
 
         return stopped_pools
 
-    def _get_stratis_info(self):
-        self._info_cache = dict()
-        self._info_cache["pools"] = dict()
-        self._info_cache["blockdevs"] = dict()
-        self._info_cache["filesystems"] = dict()
-        self._info_cache["stopped_pools"] = []
+    def _load(self):
+        info_cache = dict()
+        info_cache["pools"] = dict()
+        info_cache["blockdevs"] = dict()
+        info_cache["filesystems"] = dict()
+        info_cache["stopped_pools"] = []
 
         try:
             ret = util.check_object_available(STRATIS_SERVICE, STRATIS_PATH)
         except DBusError:
             log.warning("Stratis DBus service is not running")
-            return
+            return info_cache
         else:
             if not ret:
                 log.warning("Stratis DBus service is not available")
-                return
+                return info_cache
 
         proxy = util.SystemBus.get_proxy(STRATIS_SERVICE, STRATIS_PATH, "org.freedesktop.DBus.ObjectManager")
 
@@ -225,49 +227,53 @@ class StratisInfo(object):
             if STRATIS_POOL_INTF in interfaces.keys():
                 pool_info = self._get_pool_info(path)
                 if pool_info:
-                    self._info_cache["pools"][pool_info.uuid] = pool_info
+                    info_cache["pools"][pool_info.uuid] = pool_info
 
             if STRATIS_FILESYSTEM_INTF in interfaces.keys():
                 fs_info = self._get_filesystem_info(path)
                 if fs_info:
-                    self._info_cache["filesystems"][fs_info.uuid] = fs_info
+                    info_cache["filesystems"][fs_info.uuid] = fs_info
 
             if STRATIS_BLOCKDEV_INTF in interfaces.keys():
                 bd_info = self._get_blockdev_info(path)
                 if bd_info:
-                    self._info_cache["blockdevs"][bd_info.uuid] = bd_info
+                    info_cache["blockdevs"][bd_info.uuid] = bd_info
 
-        self._info_cache["stopped_pools"] = self._get_stopped_pools_info()
+        info_cache["stopped_pools"] = self._get_stopped_pools_info()
+        return info_cache
 
-    @property
-    def pools(self):
+    def _prefetch_wanted(self):
+        # XXX we can't import this at the top, circular imports make python mad
+        from ..tasks import availability
+        # don't complain about a missing service nobody asked about
+        return availability.STRATIS_DBUS.available
+
+    def _get_stratis_info(self):
+        if self._info_cache is None:
+            self._info_cache = self._get_prefetched()
         if self._info_cache is None:
-            self._get_stratis_info()
+            self._info_cache = self._load()
 
-        return self._info_cache["pools"]
+        return self._info_cache
 
     @property
-    def filesystems(self):
-        if self._info_cache is None:
-            self._get_stratis_info()
+    def pools(self):
+        return self._get_stratis_info()["pools"]
 
-        return self._info_cache["filesystems"]
+    @property
+    def filesystems(self):
+        return self._get_stratis_info()["filesystems"]
 
     @property
     def blockdevs(self):
-        if self._info_cache is None:
-            self._get_stratis_info()
-
-        return self._info_cache["blockdevs"]
+        return self._get_stratis_info()["blockdevs"]
 
     @property
     def stopped_pools(self):
-        if self._info_cache is None:
-            self._get_stratis_info()
-
-        return self._info_cache["stopped_pools"]
+        return self._get_stratis_info()["stopped_pools"]
 
     def drop_cache(self):
+        self._cancel_prefetch()
         self._info_cache = None
 
     def get_pool_info(self, pool_name):
@@ -1,7 +1,10 @@
-import inspect
 import logging
 import sys
+import threading
+import time
 import traceback
+from collections import namedtuple
+from functools import wraps
 
 from .flags import flags
 
@@ -9,18 +12,123 @@ log = logging.getLogger("blivet")
 log.addHandler(logging.NullHandler())
 
 
-def function_name_and_depth():
-    IGNORED_FUNCS = ["function_name_and_depth",
-                     "log_method_call",
-                     "log_method_return"]
-    stack = inspect.stack()
+# A finished traced call: its name and the arguments it was traced with, the
+# number of traced calls it was nested in, its time.perf_counter() start, its
+# duration in seconds and the name of the thread it ran in.
+Span = namedtuple("Span", ["name", "args", "depth", "start", "duration", "thread"])
 
-    for i, frame in enumerate(stack):
-        methodname = frame[3]
-        if methodname not in IGNORED_FUNCS:
-            return (methodname, len(stack) - i)
 
-    return ("unknown function?", 0)
+class _TraceState(threading.local):
+    """ Per-thread depth of the traced calls. """
+    depth = 0
+
+
+_trace_state = _TraceState()
+
+# replaced, never modified in place, so it can be read without locking
+_span_handlers = ()
+
+
+def add_span_handler(handler):
+    """ Start passing the spans of traced calls to a handler.
+
+        :param handler: function called with each finished :class:`Span`
+        :type handler: callable
+
+        The handler is called in the thread that ran the traced call.
+    """
+    global _span_handlers  # pylint: disable=global-statement
+    _span_handlers = _span_handlers + (handler,)
+
+
+def remove_span_handler(handler):
+    """ Stop passing spans to a handler added with :func:`add_span_handler`. """
+    global _span_handlers  # pylint: disable=global-statement
+    _span_handlers = tuple(h for h in _span_handlers if h != handler)
+
+
+def tracing_enabled():
+    """ Whether the traced calls are logged or recorded as spans. """
+    return bool(flags.debug or _span_handlers)
+
+
+class trace(object):  # pylint: disable=invalid-name
+    """ Context manager tracing the code run in it as one call.
+
+        :param str name: name of the traced call
+        :param args: arguments to record with the span
+
+        The call increases the depth used to indent the debug log messages
+        and is passed as a :class:`Span` to the span handlers.  Nothing is
+        done unless debug logging is on or there is a span handler.
+    """
+
+    __slots__ = ("name", "args", "_start")
+
+    def __init__(self, name, *args):
+        self.name = name
+        self.args = args
+        self._start = None
+
+    def __enter__(self):
+        if flags.debug or _span_handlers:
+            _trace_state.depth += 1
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._start is None:
+            return
+
+        duration = time.perf_counter() - self._start
+        _trace_state.depth -= 1
+        if _span_handlers:
+            span = Span(self.name, self.args, _trace_state.depth, self._start, duration,
+                        threading.current_thread().name)
+            for handler in _span_handlers:
+                handler(span)
+
+
+def traced(func):
+    """ Decorator tracing each call of a function, see :class:`trace`.
+
+        The span is named by the function's qualified name and records its
+        positional arguments except for self.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not (flags.debug or _span_handlers):
+            return func(*args, **kwargs)
+
+        with trace(func.__qualname__, *args[1:]):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class lazy_format(object):  # pylint: disable=invalid-name
+    """ Argument for log calls formatted only when the record is emitted.
+
+        :param func: function returning the formatted value
+        :param args: arguments for func
+    """
+
+    __slots__ = ("_func", "_args")
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self):
+        return str(self._func(*self._args))
+
+    __repr__ = __str__
+
+
+def _caller_and_depth():
+    """ Return the name of the function logging and the indentation depth. """
+    # skip this function and the logging function calling it
+    return (sys._getframe(2).f_code.co_name, _trace_state.depth + 1)  # pylint: disable=protected-access
 
 
 def log_method_call(d, *args, **kwargs):
@@ -28,7 +136,7 @@ def log_method_call(d, *args, **kwargs):
         return
 
     classname = d.__class__.__name__
-    (methodname, depth) = function_name_and_depth()
+    (methodname, depth) = _caller_and_depth()
     spaces = depth * ' '
     fmt = "%s%s.%s:"
     fmt_args = [spaces, classname, methodname]
@@ -47,8 +155,11 @@ def log_method_call(d, *args, **kwargs):
 
 
 def log_method_return(d, retval):
+    if not flags.debug:
+        return
+
     classname = d.__class__.__name__
-    (methodname, depth) = function_name_and_depth()
+    (methodname, depth) = _caller_and_depth()
     spaces = depth * ' '
     fmt = "%s%s.%s returned %s"
     fmt_args = (spaces, classname, methodname, retval)
@@ -72,8 +183,7 @@ def log_exception_info(log_func=log.debug, fmt_str=None, fmt_args=None, ignored=
        is prepended with an 'IGNORED' prefix.
     """
     fmt_args = fmt_args or []
-    (_methodname, depth) = function_name_and_depth()
-    indent = depth * ' '
+    indent = (_trace_state.depth + 1) * ' '
     prefix = 'IGNORED:' + indent if ignored else indent
     log_func("%sCaught exception, continuing.", prefix)
     if fmt_str:
@@ -20,12 +20,20 @@
 # Red Hat Author(s): Anne Mulhern <amulhern@redhat.com>
 
 import abc
+import functools
+import json
+import os
 import shutil
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 from packaging.version import Version
 
 from ..devicelibs.stratis import STRATIS_SERVICE, STRATIS_PATH, STRATIS_MANAGER_INTF
 from .. import util
+from .. import __version__
 
 import gi
 gi.require_version("BlockDev", "3.0")
@@ -40,6 +48,10 @@ log = logging.getLogger("blivet")
 
 CACHE_AVAILABILITY = True
 
+# all external resources, checked by probe_resources() by default
+_resources = weakref.WeakSet()
+_resources_lock = threading.Lock()
+
 
 class ExternalResource(object):
 
@@ -55,6 +67,10 @@ class ExternalResource(object):
         self._method = method
         self.name = name
         self._availability_errors = None
+        self._probe_future = None
+
+        with _resources_lock:
+            _resources.add(self)
 
     def __str__(self):
         return self.name
@@ -76,7 +92,9 @@ class ExternalResource(object):
 
         # Check for errors if necessary.
         if self._availability_errors is None:
-            _errors = self._method.availability_errors(self)
+            _errors = self._get_probed()
+            if _errors is None:
+                _errors = self._method.availability_errors(self)
 
         # Update error cache if necessary.
         if CACHE_AVAILABILITY and self._availability_errors is None:
@@ -93,11 +111,53 @@ class ExternalResource(object):
         """
         return self.availability_errors == []
 
+    @property
+    def cache_key(self):
+        """ Key of the resource in an :class:`AvailabilityCache`.
+
+            :returns: the key or None if the availability must not be cached
+            :rtype: str or NoneType
+        """
+        return self._method.cache_key(self)
+
+    def probe(self, executor):
+        """ Start checking the availability in the background.
+
+            :param executor: executor to run the check in
+            :type executor: :class:`concurrent.futures.Executor`
+            :returns: the future of the check
+            :rtype: :class:`concurrent.futures.Future`
+        """
+        self._probe_future = executor.submit(self._method.availability_errors, self)
+        return self._probe_future
+
+    def _get_probed(self):
+        """ Wait for the background check, if any, and return its result.
+
+            :returns: the availability errors or None if not probed or if
+                      the check failed
+        """
+        future = self._probe_future
+        if future is None:
+            return None
+
+        self._probe_future = None
+        try:
+            return future.result()
+        except Exception as e:  # pylint: disable=broad-except
+            # check again, the error will be raised where it is expected
+            log.debug("probing availability of %s failed: %s", self.name, e)
+            return None
+
 
 class Method(object, metaclass=abc.ABCMeta):
 
     """ Method for determining if external resource is available."""
 
+    # whether the availability can be checked before the resource is needed;
+    # the check must not have side effects
+    probe_in_advance = True
+
     @abc.abstractmethod
     def availability_errors(self, resource):
         """ Returns [] if the resource is available.
@@ -110,6 +170,17 @@ class Method(object, metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    def cache_key(self, resource):
+        """ Key of the resource in an :class:`AvailabilityCache`.
+
+            :param resource: any external resource
+            :type resource: :class:`ExternalResource`
+
+            :returns: the key or None if the availability must not be cached
+            :rtype: str or NoneType
+        """
+        return None
+
 
 class Path(Method):
 
@@ -129,6 +200,9 @@ class Path(Method):
         else:
             return []
 
+    def cache_key(self, resource):
+        return "path:%s" % resource.name
+
 
 Path = Path()
 
@@ -191,6 +265,10 @@ class VersionMethod(Method):
 
         return self._availability_errors[:]
 
+    def cache_key(self, resource):
+        return "version:%s:%s:%s:%s" % (resource.name, self.version_info.required_version,
+                                        self.version_info.version_opt, self.version_info.version_regex)
+
 
 class BlockDevTechInfo(object):
 
@@ -249,6 +327,10 @@ class BlockDevMethod(Method):
             else:
                 return []
 
+    def cache_key(self, resource):
+        technologies = sorted((int(tech), int(mode)) for (tech, mode) in self._tech_info.technologies.items())
+        return "blockdev:%s:%s" % (self._tech_info.plugin_name, technologies)
+
 
 class BlockDevFSMethod(Method):
 
@@ -295,11 +377,17 @@ class BlockDevFSMethod(Method):
             else:
                 return []
 
+    def cache_key(self, resource):
+        return "blockdev-fs:%s:%s" % (self.operation, self.fstype)
+
 
 class DBusMethod(Method):
 
     """ Methods for when application is actually a DBus service. """
 
+    # the check starts the service if it is not running
+    probe_in_advance = False
+
     def __init__(self, dbus_name, dbus_path, version_intf=None, version=None):
         """ Initializer.
 
@@ -416,6 +504,192 @@ def available_resource(name):
     return ExternalResource(AvailableMethod, name)
 
 
+def _blockdev_libraries():
+    """ Paths of the loaded libblockdev library and plugins. """
+    libraries = set()
+    try:
+        with open("/proc/self/maps") as maps:
+            for line in maps:
+                fields = line.split(None, 5)
+                if len(fields) == 6 and os.path.basename(fields[5].strip()).startswith(("libblockdev", "libbd_")):
+                    libraries.add(fields[5].strip())
+    except OSError:
+        pass
+
+    return sorted(libraries)
+
+
+def _environment_fingerprint():
+    """ Identify the state of the system the availability of the resources depends on.
+
+        Installing, updating or removing a package changes the modification
+        time of the directories it puts binaries in, so the directories in
+        $PATH are checked instead of every binary.
+    """
+    files = {}
+    for path in os.environ.get("PATH", os.defpath).split(os.pathsep) + _blockdev_libraries():
+        try:
+            st = os.stat(path)
+        except OSError:
+            files[path] = None
+        else:
+            files[path] = [st.st_ino, st.st_mtime_ns]
+
+    return {"blivet": __version__, "files": files}
+
+
+class AvailabilityCache(object):
+
+    """ On-disk cache of the availability of external resources.
+
+        The cache is only used if blivet, the directories in $PATH and the
+        loaded libblockdev library and plugins didn't change since it was
+        written. Resources whose check has side effects or depends on the
+        state of running services are never cached.
+    """
+
+    def __init__(self, path):
+        """
+            :param str path: path of the cache file
+        """
+        self.path = path
+        self._fingerprint = _environment_fingerprint()
+        self._entries = {}
+        self._changed = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.debug("availability cache %s not loaded: %s", self.path, e)
+            return
+
+        if not isinstance(data, dict) or data.get("fingerprint") != self._fingerprint:
+            log.debug("availability cache %s is out of date", self.path)
+            return
+
+        self._entries = data.get("resources", {})
+
+    def get(self, key):
+        """ Return the cached availability errors of a resource.
+
+            :param str key: the cache key of the resource
+            :returns: the availability errors or None if not cached
+            :rtype: list of str or NoneType
+        """
+        with self._lock:
+            errors = self._entries.get(key)
+
+        return list(errors) if errors is not None else None
+
+    def set(self, key, errors):
+        """ Store the availability errors of a resource.
+
+            :param str key: the cache key of the resource
+            :param errors: the availability errors
+            :type errors: list of str
+        """
+        with self._lock:
+            if self._entries.get(key) != errors:
+                self._entries[key] = list(errors)
+                self._changed = True
+
+    def save(self):
+        """ Write the cache file if anything changed. """
+        with self._lock:
+            if not self._changed:
+                return
+
+            data = {"fingerprint": self._fingerprint, "resources": dict(self._entries)}
+            self._changed = False
+
+        # replace the file atomically, other processes may be reading it
+        tmp_path = None
+        try:
+            (fd, tmp_path) = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".",
+                                              prefix=".availability")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("failed to write availability cache %s: %s", self.path, e)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def _cache_probe_results(cache, probes):
+    """ Store the results of the checks in the cache and save it once all are done. """
+    remaining = [len(probes)]
+    lock = threading.Lock()
+
+    def done(key, future):
+        if not future.cancelled() and future.exception() is None:
+            cache.set(key, future.result())
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+
+        if last:
+            cache.save()
+
+    for (key, future) in probes:
+        future.add_done_callback(functools.partial(done, key))
+
+
+def probe_resources(resources=None, cache_file=None, wait=True, max_workers=None):
+    """ Check the availability of external resources concurrently.
+
+        Instead of checking the resources one by one when they are first
+        needed, the checks run in a pool of threads. A resource asked for
+        its availability while its check is running waits for the result.
+
+        :keyword resources: the resources to check, all resources whose
+                            check has no side effects by default
+        :type resources: list of :class:`ExternalResource` or NoneType
+        :keyword cache_file: path of an :class:`AvailabilityCache` file to
+                             read the results from and store them in
+        :type cache_file: str or NoneType
+        :keyword bool wait: whether to wait for the checks to finish
+        :keyword max_workers: maximum number of concurrent checks
+        :type max_workers: int or NoneType
+    """
+    if not CACHE_AVAILABILITY:
+        # the results would not be kept
+        return
+
+    if resources is None:
+        with _resources_lock:
+            resources = [r for r in _resources if r._method.probe_in_advance]
+
+    cache = AvailabilityCache(cache_file) if cache_file else None
+
+    pending = []
+    for resource in resources:
+        if resource._availability_errors is not None or resource._probe_future is not None:
+            continue
+
+        errors = cache.get(resource.cache_key) if cache and resource.cache_key else None
+        if errors is not None:
+            resource._availability_errors = errors
+        else:
+            pending.append(resource)
+
+    if not pending:
+        return
+
+    log.debug("probing availability of %d external resources", len(pending))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="probe")
+    probes = [(resource.cache_key, resource.probe(executor)) for resource in pending]
+    if cache is not None:
+        _cache_probe_results(cache, [(key, future) for (key, future) in probes if key])
+
+    executor.shutdown(wait=wait)
+
+
 # libblockdev btrfs plugin required technologies and modes
 BLOCKDEV_BTRFS_ALL_MODES = (blockdev.BtrfsTechMode.CREATE |
                             blockdev.BtrfsTechMode.DELETE |
@@ -22,58 +22,325 @@
 
 import functools
 import threading
+from contextlib import contextmanager
 from types import FunctionType
 from abc import ABCMeta
 
 from .errors import ThreadError
 
-blivet_lock = threading.RLock()
+
+class ReadWriteLock(object):
+    """ Re-entrant lock with exclusive, shared and upgradable modes.
+
+        Used as a context manager or via :meth:`acquire` and :meth:`release`
+        the lock is exclusive, like :class:`threading.RLock`. :meth:`shared`
+        lets any number of threads hold the lock at once as long as no thread
+        holds it exclusively. :meth:`upgradable` excludes other writers but
+        not readers and the holding thread can take the exclusive lock on top
+        of it, waiting for the readers to finish.
+
+        Nested requests of a thread that holds the lock in any mode do not
+        block, except for exclusive requests under an upgradable lock. A
+        thread holding the lock shared cannot take it exclusively, such a
+        request raises :class:`RuntimeError`: the code run under a shared
+        lock must only read, apart from filling caches in a :meth:`caching`
+        block, where exclusive requests don't block either.
+
+        Threads waiting for the exclusive lock have priority over new readers.
+    """
+
+    _EXCLUSIVE = "exclusive"
+    _SHARED = "shared"
+    _UPGRADABLE = "upgradable"
+    _NESTED = "nested"
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._writer = None             # ident of the thread holding the lock exclusively
+        self._upgrader = None           # ident of the thread holding the lock upgradable
+        self._readers = 0               # number of threads holding the lock shared
+        self._writers_waiting = 0       # threads waiting for the exclusive lock
+        self._upgrade_waiting = False   # the upgradable lock holder waits for it
+        self._cache_lock = threading.RLock()
+        self._local = threading.local()
+
+    def _held_modes(self):
+        try:
+            return self._local.modes
+        except AttributeError:
+            self._local.modes = []
+            return self._local.modes
+
+    def _caching(self):
+        return getattr(self._local, "caching", 0)
+
+    def _wait(self, predicate, blocking, timeout):
+        if not blocking:
+            return predicate()
+
+        return self._cond.wait_for(predicate, None if timeout < 0 else timeout)
+
+    def acquire(self, blocking=True, timeout=-1):
+        """ Acquire the lock exclusively.
+
+            :returns: whether the lock was acquired
+            :rtype: bool
+        """
+        modes = self._held_modes()
+        if self._EXCLUSIVE in modes or (modes and self._caching()):
+            modes.append(self._NESTED)
+            return True
+        elif modes and self._UPGRADABLE not in modes:
+            # the other readers may be waiting for this thread, so it cannot
+            # wait for them
+            raise RuntimeError("cannot acquire the lock exclusively while holding it shared")
+
+        ident = threading.get_ident()
+        with self._cond:
+            # writers kept out by an upgradable lock don't hold back readers
+            upgrading = self._upgrader == ident
+            if upgrading:
+                self._upgrade_waiting = True
+            else:
+                self._writers_waiting += 1
+            try:
+                acquired = self._wait(lambda: (self._writer is None and self._readers == 0 and
+                                               self._upgrader in (None, ident)),
+                                      blocking, timeout)
+            finally:
+                if upgrading:
+                    self._upgrade_waiting = False
+                else:
+                    self._writers_waiting -= 1
+                self._cond.notify_all()
+
+            if not acquired:
+                return False
+
+            self._writer = ident
+
+        modes.append(self._EXCLUSIVE)
+        return True
+
+    def _can_read(self):
+        if self._writer is not None or self._upgrade_waiting:
+            return False
+
+        return self._upgrader is not None or not self._writers_waiting
+
+    def acquire_shared(self, blocking=True, timeout=-1):
+        """ Acquire the lock shared with other readers.
+
+            :returns: whether the lock was acquired
+            :rtype: bool
+        """
+        modes = self._held_modes()
+        if modes:
+            modes.append(self._NESTED)
+            return True
+
+        with self._cond:
+            if not self._wait(self._can_read, blocking, timeout):
+                return False
+
+            self._readers += 1
+
+        modes.append(self._SHARED)
+        return True
+
+    def acquire_upgradable(self, blocking=True, timeout=-1):
+        """ Acquire the lock shared with readers but not with other writers.
+
+            :returns: whether the lock was acquired
+            :rtype: bool
+        """
+        modes = self._held_modes()
+        if modes:
+            modes.append(self._NESTED)
+            return True
+
+        with self._cond:
+            if not self._wait(lambda: self._writer is None and self._upgrader is None,
+                              blocking, timeout):
+                return False
+
+            self._upgrader = threading.get_ident()
+
+        modes.append(self._UPGRADABLE)
+        return True
+
+    def release(self):
+        """ Release the lock acquired last by this thread, in any mode. """
+        modes = self._held_modes()
+        if not modes:
+            raise RuntimeError("cannot release un-acquired lock")
+
+        mode = modes.pop()
+        if mode == self._NESTED:
+            return
+
+        with self._cond:
+            if mode == self._EXCLUSIVE:
+                self._writer = None
+            elif mode == self._SHARED:
+                self._readers -= 1
+            else:
+                self._upgrader = None
+            self._cond.notify_all()
+
+    release_shared = release
+    release_upgradable = release
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    @contextmanager
+    def shared(self):
+        """ Context manager holding the lock shared. """
+        self.acquire_shared()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    @contextmanager
+    def upgradable(self):
+        """ Context manager holding the lock upgradable. """
+        self.acquire_upgradable()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    @contextmanager
+    def caching(self):
+        """ Context manager for updating cached state while holding the lock in any mode.
+
+            Only one thread at a time runs in a caching block. Code reading
+            a cache has to check it again in the block before updating it,
+            another reader may have done it in the meantime.
+        """
+        # an upgradable lock holder would wait for the readers waiting here
+        # if it took the exclusive lock in the block, so it takes it first
+        upgrade = self._UPGRADABLE in self._held_modes()
+        if upgrade:
+            self.acquire()
+        try:
+            with self._cache_lock:
+                self._local.caching = self._caching() + 1
+                try:
+                    yield self
+                finally:
+                    self._local.caching -= 1
+        finally:
+            if upgrade:
+                self.release()
+
+
+blivet_lock = ReadWriteLock()
+
+_lock_delegates = set()
+""" idents of threads running synchronized code on behalf of the lock holder """
 
 
 def _is_main_thread():
     return threading.current_thread() == threading.main_thread()
 
 
+def run_delegated(func, *args, **kwargs):
+    """ Run a callable on behalf of the thread holding the global lock.
+
+        Synchronized code run by func does not try to acquire the lock, which
+        is held by the thread that delegated the work. That thread must hold
+        the lock until func returns and make sure that the work it delegates
+        to different threads does not touch the same objects.
+    """
+    ident = threading.get_ident()
+    _lock_delegates.add(ident)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _lock_delegates.discard(ident)
+
+
+def _raise_thread_exception():
+    """ Raise the exception of a failed thread in the main thread. """
+    if _is_main_thread():
+        exn_info = get_thread_exception()
+        if exn_info[1]:
+            clear_thread_exception()
+            raise ThreadError("raising queued exception") from exn_info[1]
+
+
 def exclusive(m):
     """ Run a callable while holding the global lock. """
     @functools.wraps(m, set(functools.WRAPPER_ASSIGNMENTS) & set(dir(m)))
     def run_with_lock(*args, **kwargs):
-        with blivet_lock:
-            if _is_main_thread():
-                exn_info = get_thread_exception()
-                if exn_info[1]:
-                    clear_thread_exception()
-                    raise ThreadError("raising queued exception") from exn_info[1]
+        if threading.get_ident() in _lock_delegates:
+            return m(*args, **kwargs)
 
+        with blivet_lock:
+            _raise_thread_exception()
             return m(*args, **kwargs)
 
     return run_with_lock
 
 
+def shared(m):
+    """ Run a callable that only reads while holding the global lock shared. """
+    @functools.wraps(m, set(functools.WRAPPER_ASSIGNMENTS) & set(dir(m)))
+    def run_with_shared_lock(*args, **kwargs):
+        if threading.get_ident() in _lock_delegates:
+            return m(*args, **kwargs)
+
+        with blivet_lock.shared():
+            _raise_thread_exception()
+            return m(*args, **kwargs)
+
+    return run_with_shared_lock
+
+
 class SynchronizedMeta(type):
     """ Metaclass that wraps all methods with the exclusive decorator.
 
         To prevent specific methods from being wrapped, add the method name(s)
         to a class attribute called _unsynchronized_methods (list of str).
+
+        Methods and property getters that only read can be listed in a class
+        attribute called _shared_methods (list of str) to be wrapped with the
+        shared decorator instead. The list is inherited, so overrides of the
+        listed methods in subclasses are wrapped the same way. The others
+        raise :class:`RuntimeError` when called with the lock held shared.
     """
     def __new__(cls, name, bases, dct):
         new_dct = {}
 
+        shared_methods = set(dct.get('_shared_methods', []))
+        for base in bases:
+            shared_methods.update(getattr(base, '_shared_methods', []))
+
         for n in dct:
             obj = dct[n]
             # Do not decorate class or static methods.
             if n in dct.get('_unsynchronized_methods', []):
                 pass
             elif isinstance(obj, FunctionType):
-                obj = exclusive(obj)
+                obj = shared(obj) if n in shared_methods else exclusive(obj)
             elif isinstance(obj, property):
-                obj = property(fget=exclusive(obj.__get__),
+                obj = property(fget=(shared if n in shared_methods else exclusive)(obj.__get__),
                                fset=exclusive(obj.__set__),
                                fdel=exclusive(obj.__delete__),
                                doc=obj.__doc__)
 
             new_dct[n] = obj
 
+        if shared_methods:
+            new_dct['_shared_methods'] = frozenset(shared_methods)
+
         return super(SynchronizedMeta, cls).__new__(cls, name, bases, new_dct)
 
 
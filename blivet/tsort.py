@@ -26,31 +26,47 @@ class CyclicGraphError(Exception):
 
 
 def tsort(graph):
+    """ Sort the items of a graph so that parents precede their children.
+
+        Nodes without remaining incoming edges are processed last-in,
+        first-out, with the children of each node in the order of their
+        edges. The graph is not modified.
+
+        :param dict graph: a graph as returned by :func:`create_graph`
+        :returns: the sorted items
+        :rtype: list
+        :raises: :class:`CyclicGraphError` if the graph contains cycles
+    """
     order = []  # sorted list of items
 
     if not graph or not graph['items']:
         return order
 
+    outgoing = graph.get('outgoing')
+    if outgoing is None:
+        outgoing = _get_outgoing(graph['items'], graph['edges'])
+
+    incoming = dict(graph['incoming'])
+
     # determine which nodes have no incoming edges
-    roots = [n for n in graph['items'] if graph['incoming'][n] == 0]
+    roots = [n for n in graph['items'] if incoming[n] == 0]
     if not roots:
         raise CyclicGraphError("no root nodes")
 
-    visited = []    # list of nodes visited, for cycle detection
+    visited = set()     # nodes visited, for cycle detection
     while roots:
         # remove a root, add it to the order
         root = roots.pop()
         if root in visited:
             raise CyclicGraphError("graph contains cycles")
 
-        visited.append(root)
+        visited.add(root)
         order.append(root)
         # remove each edge from the root to another node
-        for (parent, child) in [e for e in graph['edges'] if e[0] == root]:
-            graph['incoming'][child] -= 1
-            graph['edges'].remove((parent, child))
+        for child in outgoing[root]:
+            incoming[child] -= 1
             # if destination node is now a root, add it to roots
-            if graph['incoming'][child] == 0:
+            if incoming[child] == 0:
                 roots.append(child)
 
     if len(graph['items']) != len(visited):
@@ -59,6 +75,14 @@ def tsort(graph):
     return order
 
 
+def _get_outgoing(items, edges):
+    outgoing = dict((item, []) for item in items)
+    for (parent, child) in edges:
+        outgoing[parent].append(child)
+
+    return outgoing
+
+
 def create_graph(items, edges):
     """ Create a graph based on a list of items and a list of edges.
 
@@ -70,16 +94,18 @@ def create_graph(items, edges):
         Return Value:
 
             The return value is a dictionary representing the directed graph.
-            It has three keys:
+            It has four keys:
 
                 items is the same as the input argument of the same name
                 edges is the same as the input argument of the same name
                 incoming is a dict of incoming edge count hashed by item
+                outgoing is a dict of lists of children hashed by item
 
     """
     graph = {'items': [],       # the items to sort
              'edges': [],       # partial order info: (parent, child) pairs
-             'incoming': {}}    # incoming edge count for each item
+             'incoming': {},    # incoming edge count for each item
+             'outgoing': {}}    # children of each item, in order of edges
 
     graph['items'] = items
     graph['edges'] = edges
@@ -89,6 +115,8 @@ def create_graph(items, edges):
     for (_parent, child) in edges:
         graph['incoming'][child] += 1
 
+    graph['outgoing'] = _get_outgoing(items, edges)
+
     return graph
 
 
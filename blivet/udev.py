@@ -26,7 +26,13 @@ import re
 import subprocess
 import logging
 import pyudev
+import sys
+import threading
 import time
+from collections import namedtuple
+from collections.abc import Mapping
+from contextlib import contextmanager
+from threading import Lock
 
 from . import util
 from .size import Size
@@ -85,7 +91,164 @@ def device_to_dict(device):
     return result
 
 
+# libudev device objects must not be used by more threads at once
+_decode_lock = Lock()
+
+
+class UdevDevice(Mapping):
+
+    """ A snapshot of the udev properties of a block device.
+
+        Behaves like a read-only dict of the properties plus SYS_NAME and
+        SYS_PATH. The property names are read (and interned) when the
+        snapshot is taken, the values are decoded on first access. Values
+        the device_get_* functions derive from the properties can be cached
+        in the snapshot, see :meth:`derived`.
+    """
+
+    __slots__ = ("_device", "_keys", "_values", "_derived")
+
+    def __init__(self, device):
+        """
+            :param device: the udev device
+            :type device: :class:`pyudev.Device`
+        """
+        self._device = device
+        with _decode_lock:
+            self._keys = tuple(sys.intern(key) for key in device.properties.keys())
+        self._values = {"SYS_NAME": device.sys_name, "SYS_PATH": device.sys_path}
+        self._derived = None
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            if key not in self._keys:
+                raise
+
+        with _decode_lock:
+            try:
+                value = self._device.properties.get(key)
+            except Exception as e:  # pylint: disable=broad-except
+                log.error("Failed to get %s property of %s: %s", key, self._values["SYS_NAME"], str(e))
+                self._keys = tuple(k for k in self._keys if k != key)
+                raise KeyError(key)
+
+        self._values[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._values or key in self._keys
+
+    def __iter__(self):
+        yield "SYS_NAME"
+        yield "SYS_PATH"
+        for key in self._keys:
+            if key not in ("SYS_NAME", "SYS_PATH"):
+                yield key
+
+    def __len__(self):
+        return len(self._keys) + sum(1 for key in ("SYS_NAME", "SYS_PATH") if key not in self._keys)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # snapshots are immutable
+        return self
+
+    def __repr__(self):
+        return "UdevDevice(%r)" % self._values["SYS_PATH"]
+
+    def derived(self, name, func):
+        """ Return a value derived from the snapshot, computed only once.
+
+            :param str name: name of the derived value
+            :param func: function computing the value from the snapshot
+            :returns: func(self)
+        """
+        if self._derived is None:
+            self._derived = {}
+
+        try:
+            return self._derived[name]
+        except KeyError:
+            value = func(self)
+            self._derived[name] = value
+            return value
+
+
+class _SnapshotCache(object):
+
+    """ Snapshots of the block devices' udev data keyed by sysfs path.
+
+        The snapshots are valid as long as the kernel emits no uevents and
+        the udev queue is empty, so they are all dropped whenever the uevent
+        sequence number changes.
+    """
+
+    def __init__(self):
+        self._seqnum = None
+        self._snapshots = {}
+
+    def validate(self):
+        """ Drop the snapshots if the udev database changed since they were taken.
+
+            Check this once before looking up or taking a number of snapshots
+            and pass the result to :meth:`get` and :meth:`snapshot`.
+
+            :returns: the uevent seqnum if the udev database is up to date
+            :rtype: int or NoneType
+        """
+        seqnum = _get_uevent_seqnum()
+        if not _udev_queue_empty():
+            seqnum = None
+
+        if seqnum is None or seqnum != self._seqnum:
+            self.clear()
+
+        return seqnum
+
+    def get(self, sysfs_path, seqnum):
+        """ Return the cached snapshot of a device or None.
+
+            :param seqnum: result of :meth:`validate`
+        """
+        if seqnum is None:
+            return None
+
+        return self._snapshots.get(sysfs_path)
+
+    def snapshot(self, device, seqnum):
+        """ Return the snapshot of a device, take it if not cached.
+
+            :param seqnum: result of :meth:`validate`
+        """
+        info = self.get(device.sys_path, seqnum)
+        if info is None:
+            info = UdevDevice(device)
+            if seqnum is not None:
+                self._seqnum = seqnum
+                self._snapshots[device.sys_path] = info
+
+        return info
+
+    def clear(self):
+        self._seqnum = None
+        self._snapshots = {}
+
+
+snapshot_cache = _SnapshotCache()
+
+
 def get_device(sysfs_path=None, device_node=None):
+    settle_pending()
+    seqnum = snapshot_cache.validate()
+    if sysfs_path is not None:
+        result = snapshot_cache.get(sysfs_path, seqnum)
+        if result is not None:
+            return result
+
     try:
         if sysfs_path is not None:
             device = pyudev.Devices.from_sys_path(global_udev, sysfs_path)
@@ -97,7 +260,7 @@ def get_device(sysfs_path=None, device_node=None):
         log.error(e)
         result = None
     else:
-        result = device_to_dict(device)
+        result = snapshot_cache.snapshot(device, seqnum)
 
     return result
 
@@ -106,20 +269,204 @@ def get_devices(subsystem="block"):
     if not flags.uevents:
         settle()
 
+    return _list_devices(subsystem=subsystem)
+
+
+def _list_devices(subsystem="block"):
+    settle_pending()
+    seqnum = snapshot_cache.validate()
     result = []
     for device in global_udev.list_devices(subsystem=subsystem):
         if not __is_ignored_blockdev(device.sys_name):
-            dev = device_to_dict(device)
+            dev = snapshot_cache.snapshot(device, seqnum)
             result.append(dev)
 
     return result
 
 
+class DeviceMonitor(object):
+
+    """ Collects the devices udev announces.
+
+        Start the monitor before enumerating the devices, so that no device
+        showing up after the enumeration goes unnoticed.
+    """
+
+    receive_buffer_size = 32 * 1024 * 1024
+
+    def __init__(self, subsystem="block"):
+        self._monitor = pyudev.Monitor.from_netlink(global_udev)
+        self._monitor.filter_by(subsystem)
+        try:
+            self._monitor.set_receive_buffer_size(self.receive_buffer_size)
+        except EnvironmentError as e:
+            log.debug("failed to enlarge the udev monitor's receive buffer: %s", e)
+        self._monitor.start()
+
+    def get_devices(self):
+        """ Return the devices added or changed since the last call.
+
+            :returns: udev info for the devices or None if events were lost
+            :rtype: list of :class:`UdevDevice` or NoneType
+        """
+        if not flags.uevents:
+            settle()
+
+        announced = {}
+        try:
+            while True:
+                device = self._monitor.poll(timeout=0)
+                if device is None:
+                    break
+
+                if device.action in ("add", "change", "move"):
+                    announced[device.sys_path] = device.sys_name
+                else:
+                    announced.pop(device.sys_path, None)
+        except EnvironmentError as e:
+            # most likely the receive buffer overflowed
+            log.warning("failed to read udev events: %s", e)
+            return None
+
+        seqnum = snapshot_cache.validate()
+        result = []
+        for (sys_path, sys_name) in announced.items():
+            if _is_ignored_blockdev(sys_name):
+                continue
+
+            try:
+                device = pyudev.Devices.from_sys_path(global_udev, sys_path)
+            except pyudev.DeviceNotFoundError:
+                # gone already
+                continue
+
+            result.append(snapshot_cache.snapshot(device, seqnum))
+
+        return result
+
+
+def start_device_monitor(subsystem="block"):
+    """ Start collecting the devices udev announces.
+
+        :returns: the monitor or None if it could not be started
+        :rtype: :class:`DeviceMonitor` or NoneType
+    """
+    try:
+        return DeviceMonitor(subsystem=subsystem)
+    except (EnvironmentError, ValueError) as e:
+        log.info("failed to start udev monitor: %s", e)
+        return None
+
+
+class SettleStatistics(object):
+
+    """ Numbers of udev settles run and avoided. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.executed = 0
+        """ settles that ran udevadm """
+        self.skipped = 0
+        """ settles not needed because no uevents were emitted since the last one """
+        self.merged = 0
+        """ settles merged into the settle at the end of a :func:`settle_batch` """
+
+    @property
+    def avoided(self):
+        return self.skipped + self.merged
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+settle_stats = SettleStatistics()
+
+_settle_batch = threading.local()
+_settled_seqnum = None
+""" kernel uevent sequence number at the start of the last settle """
+
+
+def _get_uevent_seqnum():
+    try:
+        with open("/sys/kernel/uevent_seqnum") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _udev_queue_empty():
+    return not os.path.exists("/run/udev/queue")
+
+
+@contextmanager
+def settle_batch(quiet=False):
+    """ Merge the settles requested by this thread in a block into one.
+
+        :func:`settle` calls made in the block return immediately and the
+        udev queue is settled once, when the (outermost) block is left or
+        before the thread next reads from the udev database or calls
+        :func:`settle_pending`, if there was a settle call in it. Only use
+        it for settles that happen back to back (e.g. after a series of
+        triggers): external tools run in the block may not find the device
+        nodes and symlinks udev has yet to create.
+
+        :keyword bool quiet: bypass :meth:`blivet.util.run_program`
+    """
+    depth = getattr(_settle_batch, "depth", 0)
+    if depth == 0:
+        _settle_batch.pending = False
+        _settle_batch.quiet = quiet
+
+    _settle_batch.depth = depth + 1
+    try:
+        yield
+    finally:
+        _settle_batch.depth = depth
+        if depth == 0:
+            settle_pending()
+
+
+def settle_pending():
+    """ Run the settle deferred by a :func:`settle_batch` block now.
+
+        Code that needs the udev queue settled before touching a block device
+        (e.g. to not find it busy) calls this; reads from the udev database
+        do it implicitly.
+    """
+    if getattr(_settle_batch, "pending", False):
+        _settle_batch.pending = False
+        _settle_now(quiet=_settle_batch.quiet)
+
+
 def settle(quiet=False):
     """ Wait for the udev queue to settle.
 
+        The settle is skipped if the udev queue is empty and the kernel has
+        not emitted any uevents since the last settle. Inside a
+        :func:`settle_batch` block the settle is deferred (see there).
+
         :keyword bool quiet: bypass :meth:`blivet.util.run_program`
     """
+    if getattr(_settle_batch, "depth", 0):
+        if _settle_batch.pending:
+            settle_stats.count("merged")
+        _settle_batch.pending = True
+        return
+
+    _settle_now(quiet=quiet)
+
+
+def _settle_now(quiet=False):
+    if _settle_if_needed(quiet=quiet):
+        # the udev database may have changed while we were waiting
+        invalidate_devspec_index()
+
+
+def _settle(quiet=False):
     # wait maximal 300 seconds for udev to be done running blkid, lvm,
     # mdadm etc. This large timeout is needed when running on machines with
     # lots of disks, or with slow disks
@@ -135,6 +482,25 @@ def settle(quiet=False):
         util.run_program(argv)
 
 
+def _settle_if_needed(quiet=False):
+    """ Settle the udev queue unless nothing happened since the last settle.
+
+        :returns: whether the queue was settled
+        :rtype: bool
+    """
+    global _settled_seqnum
+
+    seqnum = _get_uevent_seqnum()
+    if seqnum is not None and seqnum == _settled_seqnum and _udev_queue_empty():
+        settle_stats.count("skipped")
+        return False
+
+    _settle(quiet=quiet)
+    _settled_seqnum = seqnum
+    settle_stats.count("executed")
+    return True
+
+
 def trigger(subsystem=None, action="add", name=None, path=None):
     argv = ["trigger", "--action=%s" % action]
     if subsystem:
@@ -148,38 +514,142 @@ def trigger(subsystem=None, action="add", name=None, path=None):
     settle()
 
 
-def resolve_devspec(devspec, sysname=False):
-    if not devspec:
-        return None
+class DevspecIndex(object):
+
+    """ Lookup tables for resolving device specifications.
+
+        The tables map labels, UUIDs, names, sysnames and symlinks to the
+        udev info of the block devices. They are built from a single udev
+        enumeration and rebuilt on the first lookup after the index has been
+        invalidated, which happens whenever :func:`settle` waits for the udev
+        queue or a uevent is received. Without the uevent handler the kernel's
+        uevent sequence number is checked on every lookup as well, so devices
+        that appeared or changed since the index was built are found without
+        an explicit settle. Code changing block devices without settling the
+        udev queue afterwards should call :func:`invalidate_devspec_index`.
+
+        The lookups match the ones done by walking the udev database: names
+        and sysnames resolve to the first device with them, symlinks only
+        if no device has the name and then to the last device with them.
+    """
 
-    # import devices locally to avoid cyclic import (devices <-> udev)
-    from . import devices
+    def __init__(self):
+        self._lock = Lock()
+        self._generation = 0
+        self._built = None
+        self._built_seqnum = None
+
+        self.devices = []
+        self._labels = {}
+        self._uuids = {}
+        self._names = {}
+        self._links = {}
+
+    @property
+    def generation(self):
+        """ Generation number, incremented by every invalidation. """
+        return self._generation
+
+    def invalidate(self):
+        """ Mark the index as out of date. """
+        with self._lock:
+            self._generation += 1
+
+    def _build(self):
+        self.devices = []
+        self._labels = {}
+        self._uuids = {}
+        self._names = {}
+        self._links = {}
+
+        for dev in _list_devices():
+            self.devices.append(dev)
+
+            # labels, UUIDs and names resolve to the first device with them
+            # (a name match takes precedence over any symlink match)...
+            label = device_get_label(dev)
+            if label is not None:
+                self._labels.setdefault(label, dev)
+
+            uuid = device_get_uuid(dev)
+            if uuid is not None:
+                self._uuids.setdefault(uuid, dev)
+
+            for name in (device_get_name(dev), dev["SYS_NAME"]):
+                if name is not None:
+                    self._names.setdefault(name, dev)
+
+            # ...symlinks to the last one
+            for link in device_get_symlinks(dev):
+                self._links[link] = dev
+
+    def update(self):
+        """ Rebuild the index if it has been invalidated since it was built. """
+        settle_pending()
+        with self._lock:
+            generation = self._generation
+            seqnum = None
+            if flags.uevents:
+                if self._built == generation:
+                    return
+            else:
+                # nothing invalidates the index on uevents, look for them
+                # (read before settling, so that a uevent emitted while
+                # building the index is noticed by the next lookup)
+                seqnum = _get_uevent_seqnum()
+                if self._built == generation and seqnum is not None and seqnum == self._built_seqnum:
+                    return
+
+                _settle_if_needed()
+
+            self._build()
+            self._built = generation
+            self._built_seqnum = seqnum
+
+    def resolve(self, devspec):
+        """ Return the udev info of the device matching devspec.
+
+            :param str devspec: a device name, path, symlink, "LABEL=" or "UUID=" spec
+            :returns: udev info of the matching device or None
+            :rtype: dict or NoneType
+        """
+        # import devices locally to avoid cyclic import (devices <-> udev)
+        from . import devices
 
-    devname = devices.device_path_to_name(devspec)
+        self.update()
 
-    ret = None
-    for dev in get_devices():
         if devspec.startswith("LABEL="):
-            if device_get_label(dev) == devspec[6:]:
-                ret = dev
-                break
+            return self._labels.get(devspec[6:])
         elif devspec.startswith("UUID="):
-            if device_get_uuid(dev) == devspec[5:]:
-                ret = dev
-                break
-        elif device_get_name(dev) == devname or dev["SYS_NAME"] == devname:
-            ret = dev
-            break
-        else:
+            return self._uuids.get(devspec[5:])
+
+        devname = devices.device_path_to_name(devspec)
+        ret = self._names.get(devname)
+        if ret is None:
             spec = devspec
             if not spec.startswith("/dev/"):
                 spec = os.path.normpath("/dev/" + spec)
 
-            for link in device_get_symlinks(dev):
-                if spec == link:
-                    ret = dev
-                    break
+            ret = self._links.get(spec)
+
+        return ret
+
+
+devspec_index = DevspecIndex()
+""" index used by :func:`resolve_devspec` and :func:`resolve_glob` """
 
+
+def invalidate_devspec_index():
+    """ Make the next devspec resolution re-read the udev database. """
+    devspec_index.invalidate()
+    snapshot_cache.clear()
+
+
+def resolve_devspec(devspec, sysname=False):
+    if not devspec:
+        return None
+
+    ret = devspec_index.resolve(devspec)
     if ret:
         return ret["SYS_NAME"] if sysname else device_get_name(ret)
 
@@ -198,7 +668,8 @@ def resolve_glob(glob):
     if not glob:
         return ret
 
-    for dev in get_devices():
+    devspec_index.update()
+    for dev in devspec_index.devices:
         name = device_get_name(dev)
         path = device_get_devname(dev)
 
@@ -234,12 +705,23 @@ def __is_ignored_blockdev(dev_name):
 
     return False
 
+
+# names starting with two underscores get mangled in class bodies
+_is_ignored_blockdev = __is_ignored_blockdev
+
 # These are functions for retrieving specific pieces of information from
 # udev database entries.
 
 
 def device_get_name(udev_info):
     """ Return the best name for a device based on the udev db data. """
+    if isinstance(udev_info, UdevDevice):
+        return udev_info.derived("name", _device_get_name)
+
+    return _device_get_name(udev_info)
+
+
+def _device_get_name(udev_info):
     if "DM_NAME" in udev_info:
         name = udev_info["DM_NAME"]
     elif "MD_DEVNAME" in udev_info:
@@ -319,12 +801,26 @@ def device_get_part_size(udev_info):
 
 def device_is_dm(info):
     """ Return True if the device is a device-mapper device. """
+    if isinstance(info, UdevDevice):
+        return info.derived("is_dm", _device_is_dm)
+
+    return _device_is_dm(info)
+
+
+def _device_is_dm(info):
     dm_dir = os.path.join(device_get_sysfs_path(info), "dm")
     return 'DM_NAME' in info or os.path.exists(dm_dir)
 
 
 def device_is_md(info):
     """ Return True if the device is a mdraid array device. """
+    if isinstance(info, UdevDevice):
+        return info.derived("is_md", _device_is_md)
+
+    return _device_is_md(info)
+
+
+def _device_is_md(info):
     # Don't identify partitions on mdraid arrays as raid arrays
     if device_is_partition(info):
         return False
@@ -438,6 +934,14 @@ def device_is_disk(info):
 
 
 def device_is_partition(info):
+    """ Return True if the device is a partition. """
+    if isinstance(info, UdevDevice):
+        return info.derived("is_partition", _device_is_partition)
+
+    return _device_is_partition(info)
+
+
+def _device_is_partition(info):
     has_start = os.path.exists("%s/start" % device_get_sysfs_path(info))
     return info.get("DEVTYPE") == "partition" or has_start
 
@@ -708,22 +1212,35 @@ def device_get_lv_type(info):
     return info['LVM2_SEGTYPE']
 
 
-def device_dm_subsystem_match(info, subsystem):
-    """ Return True if the device matches a given device-mapper subsystem. """
+def device_get_dm_subsystem(info):
+    """ Return the (lowercase) device-mapper subsystem of the device or None. """
+    if isinstance(info, UdevDevice):
+        return info.derived("dm_subsystem", _device_get_dm_subsystem)
+
+    return _device_get_dm_subsystem(info)
+
+
+def _device_get_dm_subsystem(info):
     name = info.get("DM_NAME")
     if name is None:
-        return False
+        return None
 
     try:
         _subsystem = blockdev.dm.get_subsystem_from_name(name)
     except blockdev.DMError as e:
         log.error("Failed to get subsystem for %s: %s", name, str(e))
+        return None
+
+    return _subsystem.lower() if _subsystem else None
+
+
+def device_dm_subsystem_match(info, subsystem):
+    """ Return True if the device matches a given device-mapper subsystem. """
+    _subsystem = device_get_dm_subsystem(info)
+    if not _subsystem:
         return False
-    else:
-        if not _subsystem:
-            return False
 
-    return _subsystem.lower() == subsystem.lower()
+    return _subsystem == subsystem.lower()
 
 
 def device_is_dm_lvm(info):
@@ -852,6 +1369,13 @@ def device_is_dm_partition(info):
 
 def device_get_disklabel_type(info):
     """ Return the type of disklabel on the device or None. """
+    if isinstance(info, UdevDevice):
+        return info.derived("disklabel_type", _device_get_disklabel_type)
+
+    return _device_get_disklabel_type(info)
+
+
+def _device_get_disklabel_type(info):
     if device_is_partition(info) or device_is_dm_partition(info):
         # For partitions, ID_PART_TABLE_TYPE is the disklabel type for the
         # partition's disk. It does not mean the partition contains a disklabel.
@@ -867,6 +1391,34 @@ def device_get_disklabel_uuid(info):
 def device_get_partition_uuid(info):
     return info.get("ID_PART_ENTRY_UUID")
 
+
+DeviceFeatures = namedtuple("DeviceFeatures", ["dm_subsystem", "is_dm", "is_md", "is_partition",
+                                               "fs_type", "disklabel_type"])
+
+
+def device_get_features(info):
+    """ Return the features the populator classifies a device by.
+
+        The features of a udev snapshot are computed only once, see
+        :meth:`UdevDevice.derived`.
+
+        :param info: udev data describing a device
+        :rtype: :class:`DeviceFeatures`
+    """
+    if isinstance(info, UdevDevice):
+        return info.derived("features", _device_get_features)
+
+    return _device_get_features(info)
+
+
+def _device_get_features(info):
+    return DeviceFeatures(dm_subsystem=device_get_dm_subsystem(info),
+                          is_dm=device_is_dm(info),
+                          is_md=device_is_md(info),
+                          is_partition=device_is_partition(info),
+                          fs_type=device_get_format(info),
+                          disklabel_type=device_get_disklabel_type(info))
+
 # iscsi disks' ID_PATH form depends on the driver:
 # for software iscsi:
 # ip-${iscsi_address}:${iscsi_port}-iscsi-${iscsi_tgtname}-lun-${lun}
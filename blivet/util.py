@@ -11,10 +11,12 @@ import uuid
 import hashlib
 import warnings
 import abc
+import weakref
 from decimal import Decimal
 from contextlib import contextmanager
 from functools import wraps
-from collections import namedtuple
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
 from .errors import DependencyError
@@ -180,54 +182,70 @@ class Path(str):
         return self._path.__hash__()
 
 
+_next_program_id = functools.partial(next, itertools.count())
+
+# default limit of programs run at once by run_programs_parallel
+MAX_PARALLEL_PROGRAMS = 8
+
+
 def _run_program(argv, root='/', stdin=None, env_prune=None, stderr_to_stdout=False, binary_output=False):
     if env_prune is None:
         env_prune = []
 
     def chroot():
-        if root and root != '/':
-            os.chroot(root)
+        os.chroot(root)
 
+    # preexec_fn is not safe to use while other threads are running, which
+    # they may be when programs are run concurrently, so only chroot needs it
+    preexec_fn = chroot if root and root != '/' else None
+
+    # The program runs without holding program_log_lock so that programs
+    # can run concurrently. Its output is logged in one go once it exits,
+    # tagged with an id that matches the one of the "Running..." message.
+    program_id = _next_program_id()
     with program_log_lock:  # pylint: disable=not-context-manager
-        program_log.info("Running... %s", " ".join(argv))
+        program_log.info("Running [%d]... %s", program_id, " ".join(argv))
 
-        env = os.environ.copy()
-        env.update({"LC_ALL": "C",
-                    "INSTALL_PATH": root})
-        for var in env_prune:
-            env.pop(var, None)
+    env = os.environ.copy()
+    env.update({"LC_ALL": "C",
+                "INSTALL_PATH": root})
+    for var in env_prune:
+        env.pop(var, None)
 
-        if stderr_to_stdout:
-            stderr_dir = subprocess.STDOUT
-        else:
-            stderr_dir = subprocess.PIPE
-        try:
-            proc = subprocess.Popen(argv,  # pylint: disable=subprocess-popen-preexec-fn
-                                    stdin=stdin,
-                                    stdout=subprocess.PIPE,
-                                    stderr=stderr_dir,
-                                    close_fds=True,
-                                    preexec_fn=chroot, cwd=root, env=env)
-
-            out, err = proc.communicate()
-            if not binary_output:
-                out = out.decode("utf-8")
-            if out:
-                if not stderr_to_stdout:
-                    program_log.info("stdout:")
-                for line in out.splitlines():
-                    program_log.info("%s", line)
-
-            if not stderr_to_stdout and err:
-                program_log.info("stderr:")
-                for line in err.splitlines():
-                    program_log.info("%s", line)
-
-        except OSError as e:
-            program_log.error("Error running %s: %s", argv[0], e.strerror)
-            raise
-
-        program_log.debug("Return code: %d", proc.returncode)
+    if stderr_to_stdout:
+        stderr_dir = subprocess.STDOUT
+    else:
+        stderr_dir = subprocess.PIPE
+    try:
+        proc = subprocess.Popen(argv,  # pylint: disable=subprocess-popen-preexec-fn
+                                stdin=stdin,
+                                stdout=subprocess.PIPE,
+                                stderr=stderr_dir,
+                                close_fds=True,
+                                preexec_fn=preexec_fn, cwd=root, env=env)
+
+        out, err = proc.communicate()
+    except OSError as e:
+        with program_log_lock:  # pylint: disable=not-context-manager
+            program_log.error("[%d] Error running %s: %s", program_id, argv[0], e.strerror)
+        raise
+
+    if not binary_output:
+        out = out.decode("utf-8")
+
+    with program_log_lock:  # pylint: disable=not-context-manager
+        if out:
+            if not stderr_to_stdout:
+                program_log.info("[%d] stdout:", program_id)
+            for line in out.splitlines():
+                program_log.info("[%d] %s", program_id, line)
+
+        if not stderr_to_stdout and err:
+            program_log.info("[%d] stderr:", program_id)
+            for line in err.splitlines():
+                program_log.info("[%d] %s", program_id, line)
+
+        program_log.debug("[%d] Return code: %d", program_id, proc.returncode)
 
     return (proc.returncode, out)
 
@@ -254,6 +272,28 @@ def run_program_and_capture_output_binary(*args, **kwargs):
     return _run_program(*args, **kwargs)
 
 
+def run_programs_parallel(argvs, max_workers=None, **kwargs):
+    """ Run several programs concurrently.
+
+        :param argvs: the programs' argument lists
+        :type argvs: list of list of str
+        :keyword int max_workers: maximum number of programs running at once
+                                  (default: :data:`MAX_PARALLEL_PROGRAMS`)
+        :returns: return code and output of each program, in the order of argvs
+        :rtype: list of (int, str)
+
+        All other keyword arguments are passed to each program's run as they
+        are to :func:`run_program_and_capture_output`.
+    """
+    if not argvs:
+        return []
+
+    max_workers = min(max_workers or MAX_PARALLEL_PROGRAMS, len(argvs))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_program, argv, **kwargs) for argv in argvs]
+        return [future.result() for future in futures]
+
+
 def mount(device, mountpoint, fstype, options=None):
     if not options:
         options = "defaults"
@@ -661,6 +701,103 @@ class ObjectID(object):
         return self
 
 
+class ChangeLog(object):
+
+    """A bounded record of objects that have been modified.
+
+       Each recorded change gets a serial number. Consumers remember the
+       serial number of the last change they processed and ask for the
+       objects changed since then using :meth:`since`. Only the most recent
+       changes are kept, so a consumer that falls too far behind is told to
+       rebuild its state from scratch instead.
+
+       Only the changes of the objects passed to :meth:`watch` are recorded
+       (see :func:`record_change`). Objects are referenced weakly so that
+       recording a change does not keep the object alive.
+    """
+
+    def __init__(self, maxlen=4096):
+        """
+            :keyword int maxlen: the maximum number of changes to keep
+        """
+        self._serial = 0
+        self._changes = deque(maxlen=maxlen)
+        self._lock = Lock()
+
+    def __deepcopy__(self, memo):
+        # copies of the watched objects are not watched
+        return ChangeLog(maxlen=self._changes.maxlen)
+
+    @property
+    def serial(self):
+        """ Serial number of the most recent change. """
+        return self._serial
+
+    def watch(self, obj):
+        """ Record the changes of obj from now on. """
+        logs = obj.__dict__.get("_change_logs")
+        if logs is None:
+            logs = obj.__dict__["_change_logs"] = _ChangeLogs()
+        if self not in logs:
+            logs.append(self)
+
+    def unwatch(self, obj):
+        """ Stop recording the changes of obj. """
+        logs = obj.__dict__.get("_change_logs")
+        if logs is not None and self in logs:
+            logs.remove(self)
+
+    def record(self, obj):
+        """ Record a change to obj. """
+        with self._lock:
+            self._serial += 1
+            self._changes.append((self._serial, weakref.ref(obj)))
+
+    def since(self, serial):
+        """ Return the objects changed after the change with a given serial number.
+
+            :param int serial: serial number of the last change already seen
+            :returns: the current serial number and a list of the changed
+                      objects (which may contain duplicates) or None if the
+                      changes are no longer available
+            :rtype: tuple of (int, list or NoneType)
+        """
+        with self._lock:
+            if serial == self._serial:
+                return (serial, [])
+
+            if not self._changes or self._changes[0][0] > serial + 1:
+                return (self._serial, None)
+
+            changed = []
+            for (change_serial, ref) in reversed(self._changes):
+                if change_serial <= serial:
+                    break
+                obj = ref()
+                if obj is not None:
+                    changed.append(obj)
+
+            return (self._serial, changed)
+
+
+class _ChangeLogs(list):
+
+    """ The change logs watching an object.
+
+        Copies of the object are not watched by the logs, they start with
+        an empty list.
+    """
+
+    def __deepcopy__(self, memo):
+        return _ChangeLogs()
+
+
+def record_change(obj):
+    """ Record a change to obj in the change logs watching it (see :meth:`ChangeLog.watch`). """
+    for change_log in obj.__dict__.get("_change_logs", ()):
+        change_log.record(obj)
+
+
 def canonicalize_UUID(a_uuid):
     """ Converts uuids to canonical form.
 
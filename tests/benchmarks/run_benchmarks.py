@@ -0,0 +1,373 @@
+#!/usr/bin/python3
+
+""" Benchmarks for the device tree, action planning and allocation code.
+
+    The benchmarks build synthetic device trees out of disks with LVM, MD
+    and BTRFS devices stacked on top of them, the same way the unit tests
+    do, and don't touch any existing block devices.  Partition allocation
+    and device factories use sparse disk image files.
+
+    The results are written as JSON so they can be compared between runs::
+
+        PYTHONPATH=. python3 tests/benchmarks/run_benchmarks.py --sizes 10,100 --output results.json
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import time
+
+from collections import OrderedDict
+from unittest.mock import Mock, patch
+
+import blivet
+from blivet import devicefactory
+from blivet.devices import DiskDevice, DiskFile, StorageDevice, DMDevice, LUKSDevice, FileDevice
+from blivet.devices import PartitionDevice, MDRaidArrayDevice
+from blivet.devices import LVMVolumeGroupDevice, LVMLogicalVolumeDevice
+from blivet.devices import BTRFSVolumeDevice, BTRFSSubVolumeDevice
+from blivet.devicetree import DeviceTree
+from blivet.formats import get_format
+from blivet.formats.fs import Ext4FS, XFS, BTRFS
+from blivet.formats.lvmpv import LVMPhysicalVolume
+from blivet.formats.mdraid import MDRaidMember
+from blivet.partitioning import do_partitioning, grow_lvm
+from blivet.size import Size
+from blivet.util import create_sparse_tempfile
+
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+
+DISK_SIZE = Size("100 GiB")
+LV_SIZE = Size("1 GiB")
+PART_SIZE = Size("64 MiB")
+
+# partitions per disk image, GPT allows up to 128 of them
+PARTS_PER_DISK = 100
+
+DEVICE_CLASSES = [
+    DiskDevice,
+    MDRaidArrayDevice,
+    LVMVolumeGroupDevice,
+    LVMLogicalVolumeDevice,
+    BTRFSVolumeDevice,
+    BTRFSSubVolumeDevice,
+    PartitionDevice
+]
+
+FORMAT_CLASSES = [
+    Ext4FS,
+    XFS,
+    BTRFS,
+    LVMPhysicalVolume,
+    MDRaidMember
+]
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, max_count=None):
+    """ Register a benchmark.
+
+        :param str name: name of the benchmark in the results
+        :keyword max_count: largest tree size the benchmark is run with
+        :type max_count: int or NoneType
+
+        The benchmark function is called with the tree size and a
+        :class:`Timer`, only the code run in the timer's context is timed.
+        It returns the number of timed operations.
+    """
+    def register(func):
+        BENCHMARKS[name] = (func, max_count)
+        return func
+
+    return register
+
+
+class Timer(object):
+    """ Accumulate the time spent in the timer's context. """
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed += time.perf_counter() - self._start
+
+
+@contextlib.contextmanager
+def isolated_environment():
+    """ Keep the benchmarks away from the host's devices and tools. """
+    with contextlib.ExitStack() as stack:
+        for cls in (StorageDevice, DMDevice, LUKSDevice, LVMVolumeGroupDevice,
+                    MDRaidArrayDevice, FileDevice):
+            stack.enter_context(patch.object(cls, "status", False))
+
+        for cls in DEVICE_CLASSES:
+            stack.enter_context(patch.object(cls, "type_external_dependencies", return_value=set()))
+
+        for cls in FORMAT_CLASSES:
+            stack.enter_context(patch.object(cls, "formattable", return_value=True))
+            stack.enter_context(patch.object(cls, "destroyable", return_value=True))
+
+        stack.enter_context(patch.object(Ext4FS, "supported", return_value=True))
+        stack.enter_context(patch.object(XFS, "supported", return_value=True))
+        stack.enter_context(patch("blivet.formats.fs.mounts_cache._get_active_mounts", Mock()))
+        stack.enter_context(patch("blivet.static_data.lvm_info.blockdev.lvm.lvs", return_value=[]))
+        yield
+
+
+def build_tree(storage, count):
+    """ Schedule the creation of a synthetic tree of at least count devices.
+
+        The tree consists of repeating LVM, MD and BTRFS stacks on top of
+        existing disks, all devices on top of the disks are new.
+    """
+    disk_ids = itertools.count()
+
+    def new_disk(fmt_type):
+        disk = DiskDevice("bench_sd%d" % next(disk_ids), size=DISK_SIZE, exists=True)
+        storage.devicetree._add_device(disk)
+        storage.format_device(disk, get_format(fmt_type))
+        return disk
+
+    stack = 0
+    while len(storage.devicetree.devices) < count:
+        kind = stack % 3
+        if kind == 0:
+            vg = LVMVolumeGroupDevice("benchvg%d" % stack,
+                                      parents=[new_disk("lvmpv"), new_disk("lvmpv")])
+            storage.create_device(vg)
+            for i in range(2):
+                storage.create_device(LVMLogicalVolumeDevice("lv%d" % i, parents=[vg], size=LV_SIZE,
+                                                             grow=True, fmt=get_format("ext4")))
+        elif kind == 1:
+            members = [new_disk("mdmember"), new_disk("mdmember")]
+            storage.create_device(MDRaidArrayDevice("benchmd%d" % stack, level="raid1",
+                                                    member_devices=2, total_devices=2,
+                                                    parents=members, fmt=get_format("xfs")))
+        else:
+            vol = BTRFSVolumeDevice("benchbtrfs%d" % stack, parents=[new_disk("btrfs")])
+            storage.create_device(vol)
+            storage.create_device(BTRFSSubVolumeDevice("sub%d" % stack, parents=[vol]))
+
+        stack += 1
+
+
+@contextlib.contextmanager
+def disk_images(storage, count):
+    """ Add initialized disk images for count new partitions to the tree. """
+    n_disks = (count + PARTS_PER_DISK - 1) // PARTS_PER_DISK
+    size = PART_SIZE * (min(count, PARTS_PER_DISK) + 2)
+    files = [create_sparse_tempfile("benchmark", size) for _i in range(n_disks)]
+    try:
+        disks = []
+        for filename in files:
+            disk = DiskFile(filename)
+            storage.devicetree._add_device(disk)
+            storage.initialize_disk(disk)
+            disks.append(disk)
+
+        yield disks
+    finally:
+        for filename in files:
+            os.unlink(filename)
+
+
+@benchmark("insert")
+def bench_insert(count, timer):
+    """ Populate-like insertion of devices into an empty tree. """
+    storage = blivet.Blivet()
+    build_tree(storage, count)
+    devices = storage.devicetree.devices
+
+    tree = DeviceTree()
+    with timer:
+        for device in devices:
+            tree._add_device(device)
+
+    return len(devices)
+
+
+@benchmark("lookup")
+def bench_lookup(count, timer):
+    """ Lookups by name, path and UUID. """
+    storage = blivet.Blivet()
+    build_tree(storage, count)
+    devices = storage.devicetree.devices
+    tree = storage.devicetree
+
+    with timer:
+        for device in devices:
+            tree.get_device_by_name(device.name)
+            tree.get_device_by_path(device.path)
+            if device.uuid:
+                tree.get_device_by_uuid(device.uuid)
+
+    return len(devices)
+
+
+@benchmark("register_actions")
+def bench_register_actions(count, timer):
+    """ Scheduling of the actions creating the tree. """
+    storage = blivet.Blivet()
+    with timer:
+        build_tree(storage, count)
+
+    return len(list(storage.devicetree.actions))
+
+
+@benchmark("prune_actions")
+def bench_prune_actions(count, timer):
+    """ Removal of obsolete actions from the queue. """
+    storage = blivet.Blivet()
+    build_tree(storage, count)
+    actions = storage.devicetree.actions
+
+    with timer:
+        actions.prune()
+
+    return len(list(actions))
+
+
+@benchmark("sort_actions")
+def bench_sort_actions(count, timer):
+    """ Dependency ordering of the action queue. """
+    storage = blivet.Blivet()
+    build_tree(storage, count)
+    actions = storage.devicetree.actions
+
+    with timer:
+        actions.sort()
+
+    return len(list(actions))
+
+
+@benchmark("copy")
+def bench_copy(count, timer):
+    """ Copying the whole storage configuration. """
+    storage = blivet.Blivet()
+    build_tree(storage, count)
+
+    with timer:
+        storage.copy()
+
+    return len(storage.devicetree.devices)
+
+
+@benchmark("grow_lvm")
+def bench_grow_lvm(count, timer):
+    """ Growing of the new LVs to fill their VGs. """
+    storage = blivet.Blivet()
+    build_tree(storage, count)
+
+    with timer:
+        grow_lvm(storage)
+
+    return len(storage.lvs)
+
+
+@benchmark("do_partitioning", max_count=1000)
+def bench_do_partitioning(count, timer):
+    """ Allocation of new partitions on disk images. """
+    storage = blivet.Blivet()
+    with disk_images(storage, count) as disks:
+        for i in range(count):
+            part = storage.new_partition(size=PART_SIZE, parents=[disks[i % len(disks)]],
+                                         fmt_type="ext4")
+            storage.create_device(part)
+
+        with timer:
+            do_partitioning(storage)
+
+    return count
+
+
+@benchmark("factory", max_count=100)
+def bench_factory(count, timer):
+    """ Device factory configuration of LVs on partitioned disk images. """
+    storage = blivet.Blivet()
+    with disk_images(storage, count) as disks:
+        with timer:
+            for i in range(count):
+                factory = devicefactory.get_device_factory(storage, devicefactory.DeviceTypes.LVM,
+                                                           size=PART_SIZE, disks=disks,
+                                                           fstype="ext4", mountpoint="/bench%d" % i)
+                factory.configure()
+
+    return count
+
+
+def run_benchmark(func, count, rounds):
+    """ Run a benchmark and return its statistics. """
+    timings = []
+    operations = 0
+    for _i in range(rounds):
+        timer = Timer()
+        operations = func(count, timer)
+        timings.append(timer.elapsed)
+
+    return OrderedDict([("operations", operations),
+                        ("best", min(timings)),
+                        ("mean", sum(timings) / len(timings)),
+                        ("rounds", timings)])
+
+
+def parse_sizes(value):
+    try:
+        return [int(size) for size in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid list of tree sizes: %s" % value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blivet's device tree and planning code")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="comma-separated tree sizes (default: %s)" % ",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per benchmark and size")
+    parser.add_argument("--output", default="benchmark-results.json", help="file to write the results to")
+    parser.add_argument("--all-sizes", action="store_true",
+                        help="also run the slow benchmarks with sizes over their limit")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help="benchmarks to run (default: all of %s)" % ", ".join(BENCHMARKS.keys()))
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS.keys())
+    if unknown:
+        parser.error("unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+
+    results = []
+    with isolated_environment():
+        for (name, (func, max_count)) in BENCHMARKS.items():
+            if args.benchmarks and name not in args.benchmarks:
+                continue
+
+            for count in args.sizes:
+                if max_count is not None and count > max_count and not args.all_sizes:
+                    print("%-18s %6d  skipped (over %d)" % (name, count, max_count))
+                    continue
+
+                result = OrderedDict([("benchmark", name), ("size", count)])
+                result.update(run_benchmark(func, count, args.rounds))
+                results.append(result)
+                print("%-18s %6d  %10.4f s  (%d ops)" % (name, count, result["best"], result["operations"]))
+
+    report = OrderedDict([("blivet_version", blivet.__version__),
+                          ("python", platform.python_version()),
+                          ("machine", platform.machine()),
+                          ("timestamp", time.strftime("%Y-%m-%dT%H:%M:%S%z")),
+                          ("results", results)])
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("results written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
+import threading
+import time
 import unittest
 from unittest.mock import Mock, patch
 
 from .blivettestcase import BlivetTestCase
 import blivet
 from blivet.formats import get_format
+from blivet.threads import blivet_lock
 from blivet.size import Size
 
 # device classes for brevity's sake -- later on, that is
@@ -1466,3 +1469,176 @@ class ConfigurationActionsTest(unittest.TestCase):
         ac.apply()
         ac.execute()
         mock_format.do_conf1.assert_called_once_with(dry_run=False)
+
+
+class ParallelActionsTest(unittest.TestCase):
+
+    def _get_action(self, execute=None, device_type="luks/dm-crypt", format_type=None):
+        fmt = Mock(type=format_type)
+        device = Mock(type=device_type, partitioned=False, format=fmt, original_format=fmt)
+        return Mock(device=device, format=fmt, execute=Mock(side_effect=execute))
+
+    def _get_action_list(self, actions):
+        from blivet.actionlist import ActionList
+        from blivet import tsort
+
+        # actions[0] must precede actions[1], actions[2] is unrelated to both
+        action_list = ActionList()
+        action_list._actions = list(actions)
+        graph = tsort.create_graph([0, 1, 2], [(0, 1)])
+        action_list._graph = (list(actions), graph, [[0, 1], [2]])
+        return action_list
+
+    @patch("blivet.actionlist.flags.action_workers", 2)
+    def test_parallel_execution(self):
+        started = threading.Event()
+        finished = []
+
+        def first(_callbacks):
+            started.set()
+            time.sleep(0.2)
+            finished.append(actions[0])
+
+        def unrelated(_callbacks):
+            # runs while the first action is still running
+            self.assertTrue(started.wait(5))
+            self.assertEqual(finished, [])
+            finished.append(actions[2])
+
+        actions = [self._get_action(first),
+                   self._get_action(lambda _cb: finished.append(actions[1])),
+                   self._get_action(unrelated)]
+
+        action_list = self._get_action_list(actions)
+        with blivet_lock:
+            action_list._process_parallel(None, [])
+
+        self.assertEqual(finished, [actions[2], actions[0], actions[1]])
+        # completed actions are reported in the sorted order
+        self.assertEqual(action_list._completed_actions, actions)
+        self.assertEqual(action_list._actions, [])
+
+    @patch("blivet.actionlist.flags.action_workers", 2)
+    def test_parallel_execution_failure(self):
+        actions = [self._get_action(RuntimeError("failed")),
+                   self._get_action(),
+                   self._get_action()]
+
+        action_list = self._get_action_list(actions)
+        with blivet_lock:
+            with self.assertRaisesRegex(RuntimeError, "failed"):
+                action_list._process_parallel(None, [])
+
+        # no action is started after the failure, unrelated ones are kept
+        actions[1].execute.assert_not_called()
+        self.assertEqual(action_list._completed_actions, [actions[2]])
+        self.assertEqual(action_list._actions, actions[:2])
+
+    @patch("blivet.actionlist.flags.action_workers", 2)
+    def test_parallel_execution_exclusive(self):
+        running = []
+        overlapped = []
+
+        def execute(_callbacks):
+            running.append(True)
+            overlapped.append(len(running) > 1)
+            time.sleep(0.1)
+            running.pop()
+
+        # unrelated, but both change the LVM configuration
+        actions = [self._get_action(execute, device_type="lvmvg"),
+                   self._get_action(),
+                   self._get_action(execute, format_type="lvmpv")]
+
+        action_list = self._get_action_list(actions)
+        with blivet_lock:
+            action_list._process_parallel(None, [])
+
+        self.assertEqual(overlapped, [False, False])
+        self.assertEqual(action_list._completed_actions, actions)
+
+    @patch("blivet.actionlist.flags.action_workers", 2)
+    def test_parallel_execution_callbacks(self):
+        from blivet.callbacks import create_new_callbacks_register
+
+        running = []
+        calls = []
+
+        def wait_for_entropy(data):
+            running.append(True)
+            calls.append((data, threading.get_ident(), len(running) > 1))
+            time.sleep(0.1)
+            running.pop()
+            return True
+
+        def execute(callbacks):
+            self.assertTrue(callbacks.wait_for_entropy("entropy"))
+            self.assertIsNone(callbacks.create_format_pre)
+
+        # unrelated actions running in parallel call their callbacks
+        actions = [self._get_action(execute),
+                   self._get_action(),
+                   self._get_action(execute)]
+
+        action_list = self._get_action_list(actions)
+        callbacks = create_new_callbacks_register(wait_for_entropy=wait_for_entropy)
+        with blivet_lock:
+            action_list._process_parallel(callbacks, [])
+
+        # the callbacks are run by the thread processing the actions, one at a time
+        self.assertEqual(calls, [("entropy", threading.get_ident(), False)] * 2)
+        self.assertEqual(action_list._completed_actions, actions)
+
+
+class ActionListSortTest(unittest.TestCase):
+
+    def _get_actions(self, count):
+        disk = DiskDevice("sda", size=Size("10 TiB"), exists=True,
+                          fmt=get_format("lvmpv", exists=True))
+        vg = LVMVolumeGroupDevice("vg", parents=[disk], exists=True)
+        actions = []
+        for i in range(count):
+            lv = LVMLogicalVolumeDevice("lv%d" % i, parents=[vg], size=Size("1 GiB"), exists=False)
+            actions.append(ActionCreateDevice(lv))
+            lv.format = get_format("ext4")
+            actions.append(ActionCreateFormat(lv))
+
+        return actions
+
+    def _sort(self, actions):
+        from blivet.actionlist import ActionList
+
+        calls = []
+
+        def counting(cls):
+            requires = cls.requires
+
+            def wrapper(action, other):
+                calls.append((action, other))
+                return requires(action, other)
+
+            return wrapper
+
+        action_list = ActionList()
+        action_list._actions = list(actions)
+        with patch.object(ActionCreateDevice, "requires", counting(ActionCreateDevice)), \
+                patch.object(ActionCreateFormat, "requires", counting(ActionCreateFormat)):
+            action_list.sort()
+
+        return action_list, len(calls)
+
+    @_patch_device_dependencies
+    @_patch_format_dependencies
+    def test_sort_single_vg(self):
+        actions = self._get_actions(25)
+        action_list, small = self._sort(actions)
+
+        # every format is created after its logical volume
+        order = action_list._actions
+        for create_device, create_format in zip(actions[::2], actions[1::2]):
+            self.assertLess(order.index(create_device), order.index(create_format))
+
+        # four times as many logical volumes must not mean sixteen times as
+        # many comparisons, only actions on related devices are compared
+        _action_list, large = self._sort(self._get_actions(100))
+        self.assertLess(large, small * 8)
@@ -41,3 +41,31 @@ class LVMTestCase(unittest.TestCase):
             handle = m()
             handle.write.assert_called_once_with("test\n")
             self.assertTrue(lvm.AUTO_ACTIVATION)
+
+    @unittest.skipUnless(lvm.availability.BLOCKDEV_LVM_PLUGIN.available, "libblockdev lvm plugin not available")
+    @patch("blivet.devicelibs.lvm._set_lvm_devices")
+    @patch("blivet.devicelibs.lvm._set_global_config")
+    def test_lvm_devices_batch(self, set_global_config, set_lvm_devices):
+        devices = lvm.lvm_devices_copy()
+        try:
+            with lvm.devices_batch():
+                lvm.lvm_devices_add("/dev/sda1")
+                with lvm.devices_batch():
+                    lvm.lvm_devices_add("/dev/sdb1")
+                lvm.lvm_devices_remove("/dev/sda1")
+                self.assertFalse(set_global_config.called)
+
+            set_global_config.assert_called_once_with()
+            set_lvm_devices.assert_called_once_with()
+            self.assertIn("/dev/sdb1", lvm.lvm_devices_copy())
+            self.assertNotIn("/dev/sda1", lvm.lvm_devices_copy())
+
+            # without changes there is nothing to refresh
+            with lvm.devices_batch():
+                pass
+            self.assertEqual(set_global_config.call_count, 1)
+
+            lvm.lvm_devices_add("/dev/sdc1")
+            self.assertEqual(set_global_config.call_count, 2)
+        finally:
+            lvm.lvm_devices_restore(devices)
@@ -413,3 +413,31 @@ class MDRaidArrayDeviceMethodsTestCase(StorageDeviceMethodsTestCase):
             super(MDRaidArrayDeviceMethodsTestCase, self).test_create()
         self.device._create()
         self.assertTrue(self.patches["md"].create.called)
+
+
+class DeviceAncestorsTestCase(unittest.TestCase):
+
+    def test_ancestors(self):
+        disk1 = StorageDevice("disk1", exists=True)
+        disk2 = StorageDevice("disk2", exists=True)
+        part = StorageDevice("part", parents=[disk1])
+        dev = StorageDevice("dev", parents=[part])
+
+        self.assertEqual(set(dev.ancestors), set([dev, part, disk1]))
+        self.assertTrue(dev.depends_on(disk1))
+        self.assertFalse(dev.depends_on(dev))
+        self.assertFalse(dev.depends_on(disk2))
+        self.assertFalse(disk1.depends_on(dev))
+
+        # changes of the parents are reflected by the descendants
+        part.parents.append(disk2)
+        self.assertTrue(dev.depends_on(disk2))
+        self.assertEqual(set(dev.ancestors), set([dev, part, disk1, disk2]))
+
+        part.parents.remove(disk1)
+        self.assertFalse(dev.depends_on(disk1))
+        self.assertEqual(set(dev.ancestors), set([dev, part, disk2]))
+
+        dev.parents = [disk1]
+        self.assertFalse(dev.depends_on(part))
+        self.assertEqual(set(dev.ancestors), set([dev, disk1]))
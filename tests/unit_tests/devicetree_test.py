@@ -1,3 +1,4 @@
+import copy
 import unittest
 from unittest import mock
 from unittest.mock import patch, Mock, PropertyMock
@@ -164,6 +165,28 @@ class DeviceTreeTestCase(unittest.TestCase):
             tree._remove_device(lv)
             self.assertFalse(lv.name in tree.names)
 
+    @patch.object(LVsInfo, 'cache', new_callable=PropertyMock, return_value={"vg-lv": "dummy"})
+    def test_device_names_list(self, *args):  # pylint: disable=unused-argument
+        tree = DeviceTree()
+        tree._add_device(StorageDevice("dev1", size=Size("1 GiB")))
+        self.assertEqual(tree.names, ["dev1", "vg-lv"])
+
+        # callers get a new list every time
+        names = tree.names
+        names.append("dev2")
+        self.assertEqual(tree.names, ["dev1", "vg-lv"])
+
+        # the names are only listed again after a change
+        with patch.object(tree.actions, "find", wraps=tree.actions.find) as find:
+            self.assertEqual(tree.names, ["dev1", "vg-lv"])
+            find.assert_not_called()
+            tree._add_device(StorageDevice("dev2", size=Size("1 GiB")))
+            self.assertEqual(tree.names, ["dev1", "dev2", "vg-lv"])
+            find.assert_called()
+
+        tree.get_device_by_name("dev1").name = "dev3"
+        self.assertEqual(tree.names, ["dev3", "dev2", "vg-lv"])
+
     def test_reset(self):
         dt = DeviceTree()
         names = ["fakedev1", "fakedev2"]
@@ -346,6 +369,123 @@ class DeviceTreeTestCase(unittest.TestCase):
         dev2.uuid = mock.sentinel.uuid1
         self.assertRaises(DuplicateUUIDError, dt.get_device_by_uuid, mock.sentinel.uuid1)
 
+    def test_lookup_after_change(self):
+        # lookups must reflect changes made to the devices after they were added
+        dt = DeviceTree()
+
+        dev1 = StorageDevice("dev1", exists=False, parents=[])
+        dt._add_device(dev1)
+        self.assertEqual(dt.get_device_by_name("dev1"), dev1)
+        self.assertEqual(dt.get_device_by_path("/dev/dev1"), dev1)
+
+        dev1.name = "dev2"
+        self.assertIsNone(dt.get_device_by_name("dev1"))
+        self.assertIsNone(dt.get_device_by_path("/dev/dev1"))
+        self.assertEqual(dt.get_device_by_name("dev2"), dev1)
+        self.assertEqual(dt.get_device_by_path("/dev/dev2"), dev1)
+
+        dev1.sysfs_path = "/devices/virtual/block/dev2"
+        self.assertEqual(dt.get_device_by_sysfs_path("/devices/virtual/block/dev2"), dev1)
+
+        dev1.format = get_format("ext4", uuid=mock.sentinel.fs_uuid)
+        self.assertEqual(dt.get_device_by_uuid(mock.sentinel.fs_uuid), dev1)
+        dev1.format.uuid = mock.sentinel.fs_uuid2
+        self.assertIsNone(dt.get_device_by_uuid(mock.sentinel.fs_uuid))
+        self.assertEqual(dt.get_device_by_uuid(mock.sentinel.fs_uuid2), dev1)
+
+        dt._remove_device(dev1)
+        self.assertIsNone(dt.get_device_by_name("dev2"))
+        self.assertIsNone(dt.get_device_by_uuid(mock.sentinel.fs_uuid2))
+
+    def test_lookup_after_many_changes(self):
+        # the changes are recorded by the tree, even if it falls behind
+        dt = DeviceTree()
+        dev1 = StorageDevice("dev1", exists=False, parents=[])
+        dt._add_device(dev1)
+        dev2 = StorageDevice("dev2", exists=False, parents=[])
+        dt._add_device(dev2)
+        dev1.format = get_format(None)
+        self.assertEqual(dt.get_device_by_name("dev1"), dev1)
+
+        # more changes than the tree's change log keeps
+        for i in range(5000):
+            dev1.name = "dev1-%d" % i
+        dev2.name = "dev3"
+        dev1.format.uuid = mock.sentinel.uuid
+
+        self.assertIsNone(dt.get_device_by_name("dev1"))
+        self.assertIsNone(dt.get_device_by_name("dev2"))
+        self.assertEqual(dt.get_device_by_name("dev1-4999"), dev1)
+        self.assertEqual(dt.get_device_by_name("dev3"), dev2)
+        self.assertEqual(dt.get_device_by_uuid(mock.sentinel.uuid), dev1)
+
+        # lookups stay correct after the rebuild
+        dev2.name = "dev4"
+        self.assertIsNone(dt.get_device_by_name("dev3"))
+        self.assertEqual(dt.get_device_by_name("dev4"), dev2)
+
+    def test_changes_of_other_devices(self):
+        # changes of devices that are not in a tree don't concern it
+        dt = DeviceTree()
+        dt2 = DeviceTree()
+        dev1 = StorageDevice("dev1", exists=False, parents=[])
+        dt._add_device(dev1)
+        dev2 = StorageDevice("dev2", exists=False, parents=[])
+        dt2._add_device(dev2)
+        generation = dt.generation
+
+        dev2.name = "dev3"
+        StorageDevice("dev4", exists=False, parents=[]).name = "dev5"
+        copied = copy.deepcopy(dev1)
+        copied.name = "dev6"
+        self.assertEqual(dt.generation, generation)
+        self.assertEqual(dt2.get_device_by_name("dev3"), dev2)
+        self.assertEqual(dt.get_device_by_name("dev1"), dev1)
+
+        # neither do the changes of devices removed from it
+        dt._remove_device(dev1)
+        generation = dt.generation
+        dev1.name = "dev7"
+        self.assertEqual(dt.generation, generation)
+
+    def test_rollback(self):
+        dt = DeviceTree()
+
+        dev1 = StorageDevice("dev1", exists=False, parents=[])
+        dt._add_device(dev1)
+        dev2 = StorageDevice("dev2", exists=False, parents=[dev1], size=Size("1 GiB"))
+        dt._add_device(dev2)
+        ext4 = get_format("ext4")
+        dev2.format = ext4
+
+        savepoint = dt.savepoint()
+
+        dev2.name = "dev3"
+        dev2.size = Size("2 GiB")
+        dev2.format = get_format("xfs")
+        dev4 = StorageDevice("dev4", exists=False, parents=[dev1])
+        dt._add_device(dev4)
+        dev2.parents.remove(dev1)
+        self.assertEqual(dt.get_device_by_name("dev3"), dev2)
+
+        dt.rollback(savepoint)
+
+        self.assertEqual(dt.devices, [dev1, dev2])
+        self.assertEqual(dev2.name, "dev2")
+        self.assertEqual(dev2.size, Size("1 GiB"))
+        self.assertIs(dev2.format, ext4)
+        self.assertEqual(list(dev2.parents), [dev1])
+        self.assertEqual(dev1.children, [dev2])
+        self.assertEqual(dt.get_device_by_name("dev2"), dev2)
+        self.assertIsNone(dt.get_device_by_name("dev3"))
+        self.assertIsNone(dt.get_device_by_name("dev4"))
+
+        # the savepoint can be rolled back to again
+        dt._remove_device(dev2)
+        dt.rollback(savepoint)
+        self.assertEqual(dt.devices, [dev1, dev2])
+        self.assertEqual(dev1.children, [dev2])
+
     def test_recursive_remove(self):
         dt = DeviceTree()
         dev1 = StorageDevice("dev1", exists=False, parents=[])
@@ -1,3 +1,5 @@
+import asyncio
+import threading
 import time
 from unittest import TestCase
 from unittest.mock import patch, Mock
@@ -79,3 +81,101 @@ class EventManagerTest(TestCase):
         time.sleep(1)
         self.assertEqual(handler_cb.call_count, 0)
         mgr.remove_mask(mask)
+
+    def test_event_queue(self):
+        started = threading.Event()
+        release = threading.Event()
+        handled = []
+
+        def handler_cb(event, notify_cb):  # pylint: disable=unused-argument
+            handled.append((event.action, event.device))
+            if event.device == "sda":
+                started.set()
+                release.wait(5)
+
+        mgr = FakeEventManager(handler_cb=handler_cb)
+        with patch("blivet.events.manager.flags.event_workers", 1):
+            # the only worker is busy with sda, the other events wait
+            mgr.handle_event("change", "sda")
+            self.assertTrue(started.wait(5))
+            for action in ("change", "change", "change"):
+                mgr.handle_event(action, "sdb")
+            for action in ("add", "change", "remove"):
+                mgr.handle_event(action, "sdc")
+            mgr.handle_event("change", "sda")
+            self.assertEqual(mgr.stats.queued, 2)
+            self.assertEqual(mgr.stats.coalesced, 2)
+            self.assertEqual(mgr.stats.cancelled, 3)
+
+            release.set()
+            for _i in range(50):
+                if mgr.stats.handled == 3 and mgr._workers == 0:
+                    break
+                time.sleep(0.1)
+
+        self.assertEqual(handled, [("change", "sda"), ("change", "sdb"), ("change", "sda")])
+        self.assertEqual(mgr.stats.queued, 0)
+        self.assertEqual(mgr.stats.max_queued, 3)
+
+    def test_event_queue_asyncio(self):
+        handled = []
+
+        async def handler_cb(event, notify_cb):  # pylint: disable=unused-argument
+            await asyncio.sleep(0)
+            handled.append((event.action, event.device))
+
+        async def run():
+            mgr = FakeEventManager(handler_cb=handler_cb, loop=asyncio.get_running_loop())
+            mgr.handle_event("add", "sda")
+            mgr.handle_event("change", "sda")
+            for _i in range(50):
+                if mgr.stats.handled == 2 and mgr._workers == 0:
+                    break
+                await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        self.assertEqual(handled, [("add", "sda"), ("change", "sda")])
+
+    def test_event_queue_asyncio_sync_handler(self):
+        handled = []
+        release = threading.Event()
+
+        def handler_cb(event, notify_cb):  # pylint: disable=unused-argument
+            # only released by the loop if the handler doesn't block it
+            handled.append((event.action, event.device, release.wait(5)))
+
+        async def run():
+            mgr = FakeEventManager(handler_cb=handler_cb, loop=asyncio.get_running_loop())
+            mgr.handle_event("add", "sda")
+            await asyncio.sleep(0.1)
+            release.set()
+            for _i in range(50):
+                if mgr.stats.handled == 1 and mgr._workers == 0:
+                    break
+                await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        self.assertEqual(handled, [("add", "sda", True)])
+
+    def test_event_queue_asyncio_stopped_loop(self):
+        handler_cb = Mock()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        with patch("blivet.events.manager.validate_cb", return_value=True):
+            mgr = FakeEventManager(handler_cb=handler_cb, loop=loop)
+
+        # no worker can run, the event stays queued for the next one
+        mgr.handle_event("add", "sda")
+        self.assertEqual(mgr._workers, 0)
+        self.assertEqual(mgr.stats.queued, 1)
+
+        async def run():
+            mgr.handle_event("change", "sdb")
+            for _i in range(50):
+                if mgr.stats.handled == 2 and mgr._workers == 0:
+                    break
+                await asyncio.sleep(0.1)
+
+        loop.run_until_complete(run())
+        self.assertEqual(handler_cb.call_count, 2)
+        self.assertEqual(mgr._workers, 0)
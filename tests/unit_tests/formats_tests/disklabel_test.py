@@ -1,3 +1,4 @@
+import copy
 import parted
 import unittest
 from unittest.mock import Mock, PropertyMock, patch
@@ -184,3 +185,28 @@ class DiskLabelTestCase(unittest.TestCase):
                     dl._parted_device.type = parted.DEVICE_DASD
                     self.assertEqual(dl._get_best_label_type(), "dasd")
         arch.is_s390.return_value = False
+
+    def test_copy_shares_parted_disk(self):
+        dl = blivet.formats.disklabel.DiskLabel()
+        parted_disk = Mock()
+        parted_disk.duplicate.side_effect = lambda: Mock()
+        dl._parted_disk = parted_disk
+
+        # the copies don't duplicate the parted disk up front
+        copy1 = copy.deepcopy(dl)
+        copy2 = copy.deepcopy(dl)
+        copy3 = copy.deepcopy(copy1)
+        self.assertEqual(parted_disk.duplicate.call_count, 0)
+        self.assertIsNone(copy1._orig_parted_disk)
+
+        # a copy duplicates the parted disk on first access
+        disk1 = copy1._parted_disk
+        self.assertIsNot(disk1, parted_disk)
+        self.assertIs(copy1._parted_disk, disk1)
+        self.assertEqual(parted_disk.duplicate.call_count, 1)
+
+        # the original hands out the duplicates to the remaining copies first
+        self.assertIs(dl._parted_disk, parted_disk)
+        self.assertEqual(parted_disk.duplicate.call_count, 3)
+        self.assertEqual(len(set(id(d) for d in (disk1, copy2._parted_disk, copy3._parted_disk, parted_disk))), 4)
+        self.assertEqual(parted_disk.duplicate.call_count, 3)
@@ -1,8 +1,9 @@
 import unittest
 from decimal import Decimal
+from unittest.mock import Mock, patch
 
-from blivet.formats.fs import FS, Ext2FS, Ext3FS, Ext4FS, BTRFS, FATFS
-from blivet.size import Size
+from blivet.formats.fs import FS, Ext2FS, Ext3FS, Ext4FS, BTRFS, FATFS, prefetch_size_info
+from blivet.size import Size, MiB
 
 
 class FSOverheadTestCase(unittest.TestCase):
@@ -25,3 +26,49 @@ class FSOverheadTestCase(unittest.TestCase):
                 pass
 
             FS.biggest_overhead_FS([Dummy])
+
+
+class FSSizeInfoTestCase(unittest.TestCase):
+
+    @patch("blivet.formats.fs.os.path.exists", return_value=True)
+    @patch("blivet.formats.fs.udev")
+    @patch.object(Ext4FS, "_resize_class")
+    @patch.object(Ext4FS, "_size_info_class")
+    @patch.object(Ext4FS, "_minsize_class")
+    @patch("blivet.formats.fs.flags.auto_dev_updates", True)
+    def test_lazy_size_info(self, minsize_class, size_info_class, resize_class, _udev, exists):
+        resize_class.return_value.unit = MiB
+        size_info_class.return_value.do_task.return_value = Size("10 GiB")
+        minsize_class.return_value.do_task.return_value = Size("2 GiB")
+
+        fmts = [Ext4FS(device="/dev/sda%d" % i, exists=True) for i in range(1, 4)]
+        # nothing is probed by the constructor
+        self.assertFalse(size_info_class.return_value.do_task.called)
+
+        self.assertEqual(fmts[0].current_size, Size("10 GiB"))
+        self.assertEqual(fmts[0].target_size, Size("10 GiB"))
+        self.assertEqual(size_info_class.return_value.do_task.call_count, 1)
+        self.assertEqual(minsize_class.return_value.do_task.call_count, 1)
+
+        # the probe runs only once
+        self.assertGreaterEqual(fmts[0].min_size, Size("2 GiB"))
+        self.assertEqual(size_info_class.return_value.do_task.call_count, 1)
+
+        # the probe is postponed while the device is not accessible
+        exists.return_value = False
+        self.assertEqual(fmts[1].current_size, Size(0))
+        self.assertTrue(fmts[1]._size_info_pending)
+        self.assertEqual(size_info_class.return_value.do_task.call_count, 1)
+
+        # the device is set up for the probe and torn down again
+        device = Mock(exists=True)
+        device.setup.side_effect = lambda: setattr(exists, "return_value", True)
+        fmts[1].size_probe_device = device
+        self.assertEqual(fmts[1].current_size, Size("10 GiB"))
+        self.assertFalse(fmts[1]._size_info_pending)
+        device.setup.assert_called_once_with()
+        device.teardown.assert_called_once_with()
+
+        prefetch_size_info(fmts)
+        self.assertEqual(size_info_class.return_value.do_task.call_count, 3)
+        self.assertEqual([fmt.current_size for fmt in fmts], [Size("10 GiB")] * 3)
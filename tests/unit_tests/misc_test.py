@@ -4,6 +4,10 @@ from unittest.mock import patch, Mock
 import blivet
 
 from blivet.devices import PartitionDevice, DiskDevice, StorageDevice
+from blivet.devices import LVMLogicalVolumeDevice, LVMVolumeGroupDevice, MDRaidArrayDevice
+from blivet.errors import DuplicateUUIDError
+from blivet.formats import get_format
+from blivet.size import Size
 
 
 class SuggestNameTestCase(unittest.TestCase):
@@ -85,3 +89,98 @@ class SortDevicesTest(unittest.TestCase):
 
         self.assertEqual([d.name for d in self.b.devices],
                          ["10", "nvme0n1", "sda"] + ["sda%d" % i for i in range(1, 12)] + ["sdb"])
+
+
+class DeviceViewsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.b = blivet.Blivet()
+
+    def test_device_views(self):
+        tree = self.b.devicetree
+        dev1 = StorageDevice("dev1", parents=[], fmt=get_format("lvmpv"))
+        tree._add_device(dev1)
+
+        generation = tree.generation
+        self.assertEqual(self.b.pvs, [dev1])
+        views = self.b._device_views
+
+        # the views are reused while the tree doesn't change
+        self.assertEqual(self.b.devices, [dev1])
+        self.assertEqual(self.b.swaps, [])
+        self.assertIs(self.b._device_views, views)
+        self.assertEqual(tree.generation, generation)
+
+        # callers get copies of the lists
+        self.b.devices.append(None)
+        self.assertEqual(self.b.devices, [dev1])
+
+        dev1.format = get_format("swap")
+        self.assertGreater(tree.generation, generation)
+        self.assertEqual(self.b.pvs, [])
+        self.assertEqual(self.b.swaps, [dev1])
+
+        savepoint = tree.savepoint()
+
+        dev1.name = "dev3"
+        dev2 = StorageDevice("dev2", parents=[])
+        tree._add_device(dev2)
+        self.assertEqual(self.b.devices, [dev2, dev1])
+
+        generation = tree.generation
+        tree.rollback(savepoint)
+        self.assertGreater(tree.generation, generation)
+        self.assertEqual(self.b.devices, [dev1])
+        self.assertEqual(dev1.name, "dev1")
+
+        tree._remove_device(dev1)
+        self.assertEqual(self.b.devices, [])
+        self.assertEqual(self.b.swaps, [])
+
+        # copies build their own views
+        self.assertIsNot(self.b.copy()._device_views, self.b._device_views)
+
+    def test_device_views_complete(self):
+        tree = self.b.devicetree
+        pv = StorageDevice("pv", parents=[], exists=True, fmt=get_format("lvmpv", exists=True))
+        tree._add_device(pv)
+        vg = LVMVolumeGroupDevice("vg", parents=[pv], exists=True)
+        vg._complete = False
+        tree._add_device(vg)
+        lv = LVMLogicalVolumeDevice("lv", parents=[vg], exists=True, size=Size("1 GiB"))
+        tree._add_device(lv)
+        self.assertEqual(self.b.vgs, [])
+        self.assertEqual(self.b.lvs, [])
+
+        # the LV is listed once its VG is complete
+        vg._complete = True
+        self.assertEqual(self.b.vgs, [vg])
+        self.assertEqual(self.b.lvs, [lv])
+
+        md_member = StorageDevice("sdb1", parents=[], exists=True, fmt=get_format("mdmember", exists=True))
+        tree._add_device(md_member)
+        md = MDRaidArrayDevice("md0", level="raid1", member_devices=2, total_devices=2,
+                               parents=[md_member], exists=True)
+        tree._add_device(md)
+        self.assertEqual(self.b.mdarrays, [])
+
+        # non-existent and complete arrays are listed
+        md.exists = False
+        self.assertEqual(self.b.mdarrays, [md])
+        md.exists = True
+        md.member_devices = 1
+        self.assertEqual(self.b.mdarrays, [md])
+
+    def test_device_views_duplicate_uuids(self):
+        tree = self.b.devicetree
+        with patch("blivet.devicetree.flags.allow_inconsistent_config", True):
+            tree._add_device(StorageDevice("dev1", parents=[], uuid="1234"))
+            tree._add_device(StorageDevice("dev2", parents=[], uuid="1234"))
+            self.assertEqual(len(self.b.devices), 2)
+
+        # the views built while inconsistencies were allowed are not reused
+        with patch("blivet.devicetree.flags.allow_inconsistent_config", False):
+            with self.assertRaises(DuplicateUUIDError):
+                self.b.devices  # pylint: disable=pointless-statement
+            with self.assertRaises(DuplicateUUIDError):
+                self.b.devices  # pylint: disable=pointless-statement
@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from blivet.mounts import MountsCache
+
+MOUNTINFO = """\
+22 1 252:1 / / rw,relatime shared:1 - ext4 /dev/vda1 rw,seclabel
+23 22 0:21 / /proc rw,nosuid,nodev,noexec,relatime shared:12 - proc proc rw
+24 22 0:35 /home /home rw,relatime shared:30 - btrfs /dev/vdb rw,space_cache=v2,subvolid=256,subvol=/home
+25 22 0:35 / /mnt/btrfs rw,relatime shared:31 - btrfs /dev/vdb rw,space_cache=v2,subvolid=5,subvol=/
+26 22 252:1 / /mnt/root rw,relatime shared:1 - ext4 /dev/vda1 rw,seclabel
+"""
+
+
+class MountsCacheTest(unittest.TestCase):
+
+    @mock.patch("blivet.mounts.resolve_devspec", side_effect=lambda devspec, sysname=False: devspec[5:])
+    def test_get_active_mounts(self, resolve_devspec):
+        cache = MountsCache()
+        with mock.patch.object(cache, "_read_mountinfo", return_value=MOUNTINFO), \
+             mock.patch.object(cache, "_get_sysname", wraps=cache._get_sysname) as get_sysname, \
+             mock.patch("blivet.mounts.os.path.exists", return_value=True), \
+             mock.patch("blivet.mounts.os.path.realpath", return_value="/sys/devices/virtual/block/vda1"):
+            cache._get_active_mounts()
+
+        # the device number is resolved once
+        self.assertEqual(get_sysname.call_count, 2)
+        # btrfs has an anonymous device number, the mount source is used instead
+        resolve_devspec.assert_called_once_with("/dev/vdb", sysname=True)
+
+        self.assertEqual(cache.mountpoints[("vda1", None)], ["/", "/mnt/root"])
+        self.assertEqual(cache.mountpoints[("proc", None)], ["/proc"])
+        self.assertEqual(cache.mountpoints[("vdb", "home")], ["/home"])
+        self.assertEqual(cache.mountpoints[("vdb", "5")], ["/mnt/btrfs"])
+
+        with mock.patch.object(cache, "_cache_check"):
+            self.assertTrue(cache.is_mountpoint("/mnt/root"))
+            self.assertFalse(cache.is_mountpoint("/mnt"))
+
+    def test_cache_check(self):
+        cache = MountsCache()
+        with mock.patch.object(cache, "_get_active_mounts") as get_active_mounts:
+            cache._cache_check()
+            self.assertEqual(get_active_mounts.call_count, 1)
+
+            # nothing was mounted or unmounted since the last check
+            cache._cache_check()
+            self.assertEqual(get_active_mounts.call_count, 1)
+
+            with mock.patch.object(cache, "_poller") as poller:
+                poller.poll.return_value = [(cache._mountinfo.fileno(), 0)]
+                cache._cache_check()
+            self.assertEqual(get_active_mounts.call_count, 2)
@@ -1,3 +1,4 @@
+import threading
 import unittest
 from unittest import mock
 from unittest.mock import call, patch, Mock, PropertyMock
@@ -6,12 +7,14 @@ import gi
 gi.require_version("BlockDev", "3.0")
 from gi.repository import BlockDev as blockdev
 
+from blivet import udev
 from blivet.devices import DiskDevice, DMDevice, FileDevice, LoopDevice
 from blivet.devices import MDRaidArrayDevice, MultipathDevice, OpticalDevice
 from blivet.devices import PartitionDevice, StorageDevice
 from blivet.devices import NVMeNamespaceDevice, NVMeFabricsNamespaceDevice
 from blivet.devicetree import DeviceTree
 from blivet.errors import DeviceTreeError
+from blivet.flags import flags
 from blivet.formats import get_device_format_class, get_format, DeviceFormat
 from blivet.formats.disklabel import DiskLabel
 from blivet.populator.helpers import DiskDevicePopulator, DMDevicePopulator, LoopDevicePopulator
@@ -20,10 +23,14 @@ from blivet.populator.helpers import OpticalDevicePopulator, PartitionDevicePopu
 from blivet.populator.helpers import LVMFormatPopulator, MDFormatPopulator
 from blivet.populator.helpers import NVMeNamespaceDevicePopulator, NVMeFabricsNamespaceDevicePopulator
 from blivet.populator.helpers import get_format_helper, get_device_helper
+from blivet.populator.helpers import LUKSDevicePopulator, LUKSFormatPopulator
+import blivet.populator.helpers as helpers
 from blivet.populator.helpers.boot import EFIFormatPopulator, MacEFIFormatPopulator
 from blivet.populator.helpers.formatpopulator import FormatPopulator
 from blivet.populator.helpers.disklabel import DiskLabelFormatPopulator
 from blivet.size import Size
+from blivet.static_data.lvm_info import LVsInfo, PVsInfo, VGsInfo, _LVMInfo
+from blivet.static_data.prefetch import prefetch_caches
 
 
 class PopulatorTestCase(unittest.TestCase):
@@ -151,6 +158,279 @@ class PopulatorTestCase(unittest.TestCase):
                          msg="original_format should not be overwritten once "
                              "it has been properly set")
 
+    @patch.object(DeviceTree, "handle_format")
+    @patch.object(DeviceTree, "_get_device_helper", return_value=None)
+    def test_handle_device_logs_udev_properties(self, *args):  # pylint: disable=unused-argument
+        """ The debug log of handle_device contains the udev properties of the device. """
+        devicetree = DeviceTree()
+        devicetree._add_device(StorageDevice("sdz", exists=True))
+
+        properties = mock.MagicMock()
+        properties.keys.return_value = ["DEVTYPE", "ID_FS_TYPE"]
+        properties.get.side_effect = dict(DEVTYPE="disk", ID_FS_TYPE="ext4").get
+        info = udev.UdevDevice(Mock(sys_name="sdz", sys_path="/fake/sys/path/sdz", properties=properties))
+
+        with patch.object(flags, "debug", True):
+            with self.assertLogs("blivet", level="DEBUG") as logs:
+                devicetree.handle_device(info)
+
+        record = next(r for r in logs.records if "handle_device" in r.getMessage())
+        self.assertIn("'ID_FS_TYPE': 'ext4'", record.getMessage())
+        self.assertIn("'SYS_PATH': '/fake/sys/path/sdz'", record.getMessage())
+
+    @patch("blivet.populator.populator.disklib.update_volume_info")
+    @patch("blivet.populator.populator.lvm.lvm_dbusd_refresh")
+    @patch.object(DeviceTree, "_hide_ignored_disks")
+    @patch.object(DeviceTree, "drop_device_info_cache")
+    @patch.object(DeviceTree, "handle_device")
+    @patch("blivet.udev.get_devices")
+    def test_repopulate(self, *args):
+        """ Test that repopulate only rescans new and changed devices. """
+        (get_devices, handle_device) = args[:2]
+
+        devicetree = DeviceTree()
+        dev1 = StorageDevice("dev1", exists=True, sysfs_path="/sys/devices/virtual/block/dev1")
+        dev2 = StorageDevice("dev2", exists=True, sysfs_path="/sys/devices/virtual/block/dev2")
+        dev3 = StorageDevice("dev3", exists=True, sysfs_path="/sys/devices/virtual/block/dev3")
+        devicetree._add_device(dev1)
+        devicetree._add_device(dev2)
+        devicetree._add_device(dev3)
+        dev2.format = get_format("ext4", uuid="1234", exists=True)
+
+        # dev1 is unchanged, dev2 got a new filesystem, dev3 is gone and dev4 is new
+        infos = [dict(SYS_NAME="dev1", SYS_PATH=dev1.sysfs_path),
+                 dict(SYS_NAME="dev2", SYS_PATH=dev2.sysfs_path, ID_FS_UUID="5678"),
+                 dict(SYS_NAME="dev4", SYS_PATH="/sys/devices/virtual/block/dev4")]
+        get_devices.return_value = infos
+
+        devicetree.repopulate()
+        self.assertEqual(handle_device.call_args_list, [call(infos[1]), call(infos[2])])
+        self.assertIn(dev1, devicetree.devices)
+        self.assertNotIn(dev2, devicetree.devices)
+        self.assertNotIn(dev3, devicetree.devices)
+
+        # devices passed explicitly are rescanned even if they look unchanged
+        handle_device.reset_mock()
+        devicetree.repopulate(changed=[dev1])
+        self.assertEqual(handle_device.call_args_list, [call(infos[0]), call(infos[1]), call(infos[2])])
+
+        # repopulating is not possible with scheduled actions
+        with patch.object(devicetree.actions, "find", return_value=[Mock()]):
+            self.assertRaises(DeviceTreeError, devicetree.repopulate)
+
+    @patch.object(MDFormatPopulator, "match",
+                  side_effect=lambda data, device: udev.device_get_format(data) == "linux_raid_member")
+    def test_device_changed(self, *args):
+        """ Test that the formats' uuids are compared with the udev properties they come from. """
+        devicetree = DeviceTree()
+        sda = StorageDevice("sda", exists=True)
+        sda.format = get_format("btrfs", uuid="5ea6c4ff-8b4e-4d0e-9cdd-2c8bdc8e1d4b",
+                                vol_uuid="a4c5c9f1-0e76-4c8c-b2bf-0c12a3cd1b3b", exists=True)
+        sdb = StorageDevice("sdb", exists=True)
+        sdb.format = get_format("mdmember", uuid="3386ff85-f501-2621-4a43-5f061eb47236",
+                                md_uuid="9b4e32d4-d7b1-4b2d-8c5c-c38b4e9f8b2c", exists=True)
+        sdc = StorageDevice("sdc", exists=True)
+        sdc.format = get_format("ext4", uuid="1234", exists=True)
+
+        # the btrfs volume and md array uuids are the same for all members
+        sda_info = dict(SYS_NAME="sda", SYS_PATH="/sys/devices/virtual/block/sda", ID_FS_TYPE="btrfs",
+                        ID_FS_UUID="a4c5c9f1-0e76-4c8c-b2bf-0c12a3cd1b3b",
+                        ID_FS_UUID_SUB="5ea6c4ff-8b4e-4d0e-9cdd-2c8bdc8e1d4b")
+        sdb_info = dict(SYS_NAME="sdb", SYS_PATH="/sys/devices/virtual/block/sdb", ID_FS_TYPE="linux_raid_member",
+                        ID_FS_UUID="9b4e32d4:d7b14b2d:8c5cc38b:4e9f8b2c",
+                        ID_FS_UUID_SUB="3386ff85:f5012621:4a435f06:1eb47236")
+        sdc_info = dict(SYS_NAME="sdc", SYS_PATH="/sys/devices/virtual/block/sdc", ID_FS_TYPE="ext4",
+                        ID_FS_UUID="1234")
+        self.assertFalse(devicetree._device_changed(sda, sda_info))
+        self.assertFalse(devicetree._device_changed(sdb, sdb_info))
+        self.assertFalse(devicetree._device_changed(sdc, sdc_info))
+
+        sda_info["ID_FS_UUID_SUB"] = "0f3c1a0e-5c8b-4a1e-9d6e-7b1c9a2f3e4d"
+        sdb_info["ID_FS_UUID_SUB"] = "1eb47236:4a435f06:f5012621:3386ff85"
+        sdc_info["ID_FS_UUID"] = "5678"
+        self.assertTrue(devicetree._device_changed(sda, sda_info))
+        self.assertTrue(devicetree._device_changed(sdb, sdb_info))
+        self.assertTrue(devicetree._device_changed(sdc, sdc_info))
+
+    @patch.object(DeviceTree, "handle_device")
+    @patch("blivet.udev.start_device_monitor")
+    @patch("blivet.udev.get_devices")
+    def test_scan_devices_monitor(self, *args):
+        """ Test that devices appearing during the scan come from the udev monitor. """
+        (get_devices, start_device_monitor, handle_device) = args
+        sda = dict(SYS_NAME="sda", SYS_PATH="/sys/devices/virtual/block/sda")
+        sdb = dict(SYS_NAME="sdb", SYS_PATH="/sys/devices/virtual/block/sdb")
+        dm0 = dict(SYS_NAME="dm-0", SYS_PATH="/sys/devices/virtual/block/dm-0", DM_NAME="vg-lv")
+        get_devices.return_value = [sda, sdb]
+        monitor = start_device_monitor.return_value
+        monitor.get_devices.side_effect = [[dm0, sda], []]
+
+        devicetree = DeviceTree()
+        devicetree._scan_devices()
+        self.assertEqual(handle_device.call_args_list, [call(sda), call(sdb), call(dm0)])
+        self.assertEqual(get_devices.call_count, 1)
+        self.assertEqual(monitor.get_devices.call_count, 2)
+
+        # the devices are enumerated again if the monitor lost some events
+        handle_device.reset_mock()
+        monitor.get_devices.side_effect = [None]
+        get_devices.side_effect = [[sda], [sda, dm0], [sda, dm0]]
+        devicetree._scan_devices()
+        self.assertEqual(handle_device.call_args_list, [call(sda), call(dm0)])
+        self.assertEqual(monitor.get_devices.call_count, 3)
+
+    @patch("blivet.populator.populator.get_helper_probes", return_value={})
+    @patch("blivet.populator.populator.get_device_helper")
+    @patch.object(DeviceTree, "_is_readonly_device")
+    def test_probe_devices(self, *args):
+        """ Test that devices probed in parallel give the same results as the serial path. """
+        (is_readonly_device, get_device_helper_patch, _get_helper_probes) = args
+        is_readonly_device.side_effect = lambda info: info["SYS_NAME"] == "sdb"
+        get_device_helper_patch.side_effect = lambda info: getattr(mock.sentinel, info["SYS_NAME"])
+
+        devicetree = DeviceTree()
+        infos = [dict(SYS_NAME="sd%s" % c, SYS_PATH="/devices/fake/sd%s" % c) for c in "abcd"]
+
+        # one worker -> no probing
+        with patch("blivet.populator.populator.flags.populate_workers", 1):
+            devicetree._probe_devices(infos)
+        self.assertEqual(devicetree._device_probes, {})
+
+        with patch("blivet.populator.populator.flags.populate_workers", 3):
+            devicetree._probe_devices(infos)
+        self.assertEqual(len(devicetree._device_probes), 4)
+        self.assertEqual(get_device_helper_patch.call_count, 4)
+
+        # the probes are used instead of probing again
+        for info in infos:
+            self.assertEqual(devicetree._get_device_helper(info), getattr(mock.sentinel, info["SYS_NAME"]))
+            device = StorageDevice(info["SYS_NAME"])
+            devicetree._mark_readonly_device(info, device)
+            self.assertEqual(device.readonly, info["SYS_NAME"] == "sdb")
+        self.assertEqual(get_device_helper_patch.call_count, 4)
+        self.assertEqual(is_readonly_device.call_count, 4)
+
+        # info re-read from udev is probed again
+        devicetree._get_device_helper(dict(infos[0]))
+        self.assertEqual(get_device_helper_patch.call_count, 5)
+
+    @patch("blivet.populator.populator.get_device_helper", return_value=None)
+    @patch.object(DeviceTree, "_is_readonly_device", return_value=False)
+    def test_probe_devices_concurrency(self, *args):
+        """ Test that the helpers probe the devices concurrently. """
+        # the probes only get past the barrier if they all run at once
+        barrier = threading.Barrier(3, timeout=5)
+
+        def examine(path):
+            barrier.wait()
+            return Mock(uuid=path)
+
+        devicetree = DeviceTree()
+        infos = [dict(SYS_NAME="sd%s" % c, SYS_PATH="/devices/fake/sd%s" % c, DEVNAME="/dev/sd%s" % c,
+                      ID_FS_TYPE="linux_raid_member") for c in "abc"]
+        with patch("blivet.populator.helpers.mdraid.blockdev.md.examine", side_effect=examine) as md_examine:
+            with patch("blivet.populator.populator.flags.populate_workers", 3):
+                devicetree._probe_devices(infos)
+            self.assertEqual(md_examine.call_count, 3)
+
+            # the helpers use the results instead of probing again
+            for info in infos:
+                helper = devicetree._get_helper(MDFormatPopulator, info, device=Mock())
+                self.assertEqual(helper.probe_data.uuid, info["DEVNAME"])
+            self.assertEqual(md_examine.call_count, 3)
+
+    @patch.object(LVsInfo, "_prefetch_wanted", return_value=True)
+    @patch("blivet.static_data.lvm_info.blockdev.lvm.lvs")
+    def test_prefetch_device_info(self, *args):
+        """ Test that device info caches can be loaded in the background. """
+        lvs = args[0]
+        lv = Mock(vg_name="testvg", lv_name="testlv")
+        lvs.return_value = [lv]
+
+        lvs_info = LVsInfo()
+        prefetch_caches([lvs_info])
+        self.assertEqual(lvs_info.cache, {"testvg-testlv": lv})
+        self.assertEqual(lvs_info.cache, {"testvg-testlv": lv})
+        self.assertEqual(lvs.call_count, 1)
+
+        # errors of the background load are raised on access
+        lvs_info.drop_cache()
+        lvs.side_effect = blockdev.LVMError("lvs failed")
+        prefetch_caches([lvs_info])
+        with self.assertRaises(blockdev.LVMError):
+            lvs_info.cache  # pylint: disable=pointless-statement
+
+        # a dropped cache does not use the result of an earlier prefetch
+        lvs.side_effect = None
+        prefetch_caches([lvs_info])
+        lvs_info.drop_cache()
+        lvs.return_value = []
+        self.assertEqual(lvs_info.cache, {})
+
+
+class HelperDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        helpers._build_helper_lists()
+        self.addCleanup(helpers._build_helper_lists)
+
+    @patch("blivet.udev.device_get_dm_subsystem", return_value="lvm")
+    def test_device_dispatch(self, *args):  # pylint: disable=unused-argument
+        data = dict(SYS_PATH="/sys/devices/virtual/block/dm-0", DM_NAME="vg-lv")
+        candidates = helpers._get_device_candidates(data)
+        self.assertIn(LVMDevicePopulator, candidates)
+        self.assertIn(DMDevicePopulator, candidates)
+        self.assertIn(DiskDevicePopulator, candidates)
+        self.assertNotIn(LUKSDevicePopulator, candidates)
+        self.assertNotIn(MultipathDevicePopulator, candidates)
+        self.assertNotIn(MDDevicePopulator, candidates)
+        # priority order is kept
+        self.assertEqual(candidates, [h for h in helpers._device_helpers if h in candidates])
+
+        # the classification is computed once and the table entry reused
+        self.assertIs(helpers._get_device_candidates(dict(data)), candidates)
+
+    def test_device_dispatch_no_dm(self):
+        candidates = helpers._get_device_candidates(dict(SYS_PATH="/sys/devices/virtual/block/sda"))
+        self.assertIn(DiskDevicePopulator, candidates)
+        self.assertIn(PartitionDevicePopulator, candidates)
+        self.assertIn(LoopDevicePopulator, candidates)
+        self.assertNotIn(DMDevicePopulator, candidates)
+        self.assertNotIn(LVMDevicePopulator, candidates)
+        self.assertNotIn(LUKSDevicePopulator, candidates)
+        self.assertNotIn(MDDevicePopulator, candidates)
+
+    @patch("blivet.udev.device_is_md", return_value=True)
+    def test_device_dispatch_md(self, *args):  # pylint: disable=unused-argument
+        candidates = helpers._get_device_candidates(dict(SYS_PATH="/sys/devices/virtual/block/md127"))
+        self.assertIn(MDDevicePopulator, candidates)
+        self.assertIn(DiskDevicePopulator, candidates)
+        self.assertNotIn(DMDevicePopulator, candidates)
+
+    @patch("blivet.udev.device_get_format", return_value="ext4")
+    def test_format_dispatch(self, *args):  # pylint: disable=unused-argument
+        candidates = helpers._get_format_candidates(dict())
+        self.assertIn(FormatPopulator, candidates)
+        self.assertIn(DiskLabelFormatPopulator, candidates)
+        self.assertNotIn(LUKSFormatPopulator, candidates)
+        self.assertNotIn(LVMFormatPopulator, candidates)
+        self.assertNotIn(EFIFormatPopulator, candidates)
+        self.assertEqual(candidates, [h for h in helpers._format_helpers if h in candidates])
+
+    @patch("blivet.udev.device_get_dm_subsystem", return_value="crypt")
+    @patch("blivet.udev.device_is_dm_luks", return_value=True)
+    def test_verify_dispatch(self, *args):  # pylint: disable=unused-argument
+        # simulate a broken dispatch table
+        data = dict(SYS_NAME="dm-0")
+
+        with patch.object(helpers, "_get_device_candidates", return_value=[DMDevicePopulator]), \
+             patch.object(helpers, "_device_helpers", [LUKSDevicePopulator, DMDevicePopulator]), \
+             patch.object(DMDevicePopulator, "match", return_value=True):
+            self.assertEqual(get_device_helper(data), DMDevicePopulator)
+
+            with patch.object(flags, "verify_helper_dispatch", True):
+                with self.assertLogs("blivet", level="ERROR"):
+                    self.assertEqual(get_device_helper(data), LUKSDevicePopulator)
+
 
 class PopulatorHelperTestCase(unittest.TestCase):
     helper_class = None
@@ -350,6 +630,7 @@ class LVMDevicePopulatorTestCase(PopulatorHelperTestCase):
     @patch("blivet.udev.device_is_dm_luks", return_value=False)
     @patch("blivet.udev.device_is_dm_integrity", return_value=False)
     @patch("blivet.udev.device_is_dm_bitlk", return_value=False)
+    @patch("blivet.udev.device_get_dm_subsystem", return_value="lvm")
     @patch("blivet.udev.device_is_dm_lvm", return_value=True)
     def test_get_helper(self, *args):
         """Test get_device_helper for lvm devices."""
@@ -862,6 +1143,7 @@ class MultipathDevicePopulatorTestCase(PopulatorHelperTestCase):
     @patch("blivet.udev.device_is_md", return_value=False)
     @patch("blivet.udev.device_is_dm_partition", return_value=False)
     @patch("blivet.udev.device_is_dm", return_value=True)
+    @patch("blivet.udev.device_get_dm_subsystem", return_value="mpath")
     @patch("blivet.udev.device_is_dm_mpath", return_value=True)
     def test_get_helper(self, *args):
         """Test get_device_helper for multipaths."""
@@ -1226,6 +1508,45 @@ class LVMFormatPopulatorTestCase(FormatPopulatorTestCase):
                         lv2_device = devicetree.get_device_by_name(lv2_name)
                         self.assertEqual(lv2_device.uuid, lv2.uuid)
 
+    @patch.object(flags, "prefetch_device_info", True)
+    @patch.object(_LVMInfo, "_prefetch_wanted", return_value=True)
+    @patch("blivet.devicelibs.lvm.lvm_devices_add")
+    @patch("blivet.devicelibs.lvm._lvm_devices", new_callable=set)
+    @patch("blivet.static_data.lvm_info.blockdev.lvm.lvs", return_value=[])
+    @patch("blivet.static_data.lvm_info.blockdev.lvm.vgs", return_value=[])
+    @patch("blivet.static_data.lvm_info.blockdev.lvm.pvs", return_value=[])
+    def test_lvm_info_reload(self, *args):
+        """ Test that the LVM caches are only reloaded when loaded without the new PV. """
+        pvs, vgs, lvs, lvm_devices, lvm_devices_add = args[:5]
+        lvm_devices_add.side_effect = lvm_devices.add
+
+        device = Mock(path="/dev/sda1")
+        infos = (PVsInfo(), VGsInfo(), LVsInfo())
+        with patch.multiple("blivet.populator.helpers.lvm", pvs_info=infos[0], vgs_info=infos[1], lvs_info=infos[2]):
+            # loaded before LVM was allowed to use the PV: reloaded in the background
+            for info in infos:
+                info.cache  # pylint: disable=pointless-statement
+                self.assertFalse(info.loaded_with_device(device.path))
+
+            with patch("blivet.populator.helpers.lvm.prefetch_caches", wraps=prefetch_caches) as prefetch:
+                self.helper_class(DeviceTree(), {"SYS_NAME": "sda1"}, device)._get_kwargs()
+                prefetch.assert_called_once_with(list(infos))
+
+            for info in infos:
+                info.cache  # pylint: disable=pointless-statement
+                self.assertTrue(info.loaded_with_device(device.path))
+            self.assertEqual([pvs.call_count, vgs.call_count, lvs.call_count], [2, 2, 2])
+
+            # prefetched with the PV allowed: the results are used
+            for info in infos:
+                info.drop_cache()
+                self.assertFalse(info.loaded_with_device(device.path))
+            prefetch_caches(list(infos))
+            self.helper_class(DeviceTree(), {"SYS_NAME": "sda1"}, device)._get_kwargs()
+            for info in infos:
+                info.cache  # pylint: disable=pointless-statement
+            self.assertEqual([pvs.call_count, vgs.call_count, lvs.call_count], [3, 3, 3])
+
 
 class MDFormatPopulatorTestCase(FormatPopulatorTestCase):
     helper_class = MDFormatPopulator
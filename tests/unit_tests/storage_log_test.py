@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from blivet import storage_log
+from blivet.flags import flags
+
+
+class Traced(object):
+    @storage_log.traced
+    def outer(self, arg):
+        return self.inner(arg + 1)
+
+    @storage_log.traced
+    def inner(self, arg):
+        storage_log.log_method_call(self, arg=arg)
+        return arg
+
+
+class TracingTestCase(unittest.TestCase):
+
+    def test_disabled(self):
+        formatter = Mock(return_value="formatted")
+
+        with patch.object(flags, "debug", False):
+            self.assertFalse(storage_log.tracing_enabled())
+            with patch.object(storage_log.log, "debug") as debug:
+                self.assertEqual(Traced().outer(1), 2)
+                storage_log.log_method_call(self, info=storage_log.lazy_format(formatter))
+                storage_log.log_method_return(self, None)
+                self.assertFalse(debug.called)
+
+        self.assertFalse(formatter.called)
+        self.assertEqual(storage_log._trace_state.depth, 0)
+
+    def test_spans(self):
+        spans = []
+        storage_log.add_span_handler(spans.append)
+        self.addCleanup(storage_log.remove_span_handler, spans.append)
+        traced = Traced()
+
+        with patch.object(storage_log.log, "debug") as debug:
+            with patch.object(flags, "debug", True):
+                self.assertEqual(traced.outer(1), 2)
+
+        # the inner call finishes first and is nested in the outer one
+        self.assertEqual([(s.name, s.args, s.depth) for s in spans],
+                         [("Traced.inner", (2,), 1), ("Traced.outer", (1,), 0)])
+        self.assertGreaterEqual(spans[1].duration, spans[0].duration)
+        self.assertEqual(storage_log._trace_state.depth, 0)
+
+        # the log message is indented by the depth and names the logging method
+        (fmt, spaces, classname, methodname) = debug.call_args[0][:4]
+        self.assertEqual(fmt, "%s%s.%s: %s: %s ;")
+        self.assertEqual((spaces, classname, methodname), ("   ", "Traced", "inner"))
+
+        # spans are recorded without debug logging too
+        with patch.object(flags, "debug", False):
+            with storage_log.trace("block", "arg"):
+                pass
+        self.assertEqual(spans[-1].name, "block")
+        self.assertEqual(spans[-1].args, ("arg",))
+
+        storage_log.remove_span_handler(spans.append)
+        traced.outer(1)
+        self.assertEqual(len(spans), 3)
+
+    def test_lazy_format(self):
+        formatter = Mock(return_value="formatted")
+        arg = storage_log.lazy_format(formatter, 1, 2)
+        self.assertFalse(formatter.called)
+        self.assertEqual("%s" % arg, "formatted")
+        formatter.assert_called_once_with(1, 2)
@@ -1,4 +1,8 @@
+import os
+import tempfile
+import threading
 import unittest
+from unittest.mock import patch
 
 import blivet.tasks.task as task
 import blivet.tasks.availability as availability
@@ -32,6 +36,75 @@ class ResourceTestCase(unittest.TestCase):
         self.assertTrue(available_resource.available)
 
 
+class CountingMethod(availability.Method):
+
+    def __init__(self, errors, event=None):
+        self.errors = errors
+        self.event = event
+        self.calls = 0
+
+    def availability_errors(self, resource):
+        self.calls += 1
+        if self.event is not None:
+            self.event.wait(5)
+        return self.errors[:]
+
+    def cache_key(self, resource):
+        return "counting:%s" % resource.name
+
+
+class ProbeTestCase(unittest.TestCase):
+
+    def _resources(self, event=None):
+        methods = [CountingMethod([], event), CountingMethod(["missing"], event)]
+        resources = [availability.ExternalResource(method, "probe%d" % i) for (i, method) in enumerate(methods)]
+        return (methods, resources)
+
+    def test_probe(self):
+        (methods, resources) = self._resources()
+        availability.probe_resources(resources)
+        self.assertEqual([m.calls for m in methods], [1, 1])
+
+        self.assertTrue(resources[0].available)
+        self.assertEqual(resources[1].availability_errors, ["missing"])
+        self.assertEqual([m.calls for m in methods], [1, 1])
+
+        # checked resources are not probed again
+        availability.probe_resources(resources)
+        self.assertEqual([m.calls for m in methods], [1, 1])
+
+    def test_probe_background(self):
+        event = threading.Event()
+        (methods, resources) = self._resources(event)
+        availability.probe_resources(resources, wait=False)
+
+        # the resource waits for the running check
+        threading.Timer(0.1, event.set).start()
+        self.assertFalse(resources[1].available)
+        self.assertTrue(resources[0].available)
+        self.assertEqual([m.calls for m in methods], [1, 1])
+
+    def test_probe_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_file = os.path.join(tmpdir, "availability.json")
+            (methods, resources) = self._resources()
+            availability.probe_resources(resources, cache_file=cache_file)
+            self.assertTrue(os.path.exists(cache_file))
+
+            # another run takes the results from the cache
+            (methods, resources) = self._resources()
+            availability.probe_resources(resources, cache_file=cache_file)
+            self.assertEqual([m.calls for m in methods], [0, 0])
+            self.assertTrue(resources[0].available)
+            self.assertEqual(resources[1].availability_errors, ["missing"])
+
+            # the cache is not used after the system changed
+            with patch("blivet.tasks.availability._environment_fingerprint", return_value={"blivet": "0"}):
+                (methods, resources) = self._resources()
+                availability.probe_resources(resources, cache_file=cache_file)
+                self.assertEqual([m.calls for m in methods], [1, 1])
+
+
 class TasksTestCase(unittest.TestCase):
 
     def test_availability(self):
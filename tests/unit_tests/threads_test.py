@@ -0,0 +1,178 @@
+import threading
+import time
+import unittest
+
+from blivet.threads import ReadWriteLock, SynchronizedMeta, blivet_lock
+
+
+class Account(object, metaclass=SynchronizedMeta):
+    """ Two balances whose sum must never change. """
+
+    _shared_methods = ["total", "balances"]
+
+    def __init__(self):
+        self.a = 100
+        self.b = 0
+        self.readers = 0
+        self.max_readers = 0
+        self._count_lock = threading.Lock()
+
+    def transfer(self, amount):
+        self.a -= amount
+        time.sleep(0.001)
+        self.b += amount
+
+    def total(self):
+        with self._count_lock:
+            self.readers += 1
+            self.max_readers = max(self.max_readers, self.readers)
+        try:
+            # a nested shared call must not block the reader
+            (a, b) = self.balances
+            time.sleep(0.001)
+            return a + b
+        finally:
+            with self._count_lock:
+                self.readers -= 1
+
+    @property
+    def balances(self):
+        return (self.a, self.b)
+
+
+class ReadWriteLockTestCase(unittest.TestCase):
+
+    def _in_thread(self, func):
+        result = []
+        t = threading.Thread(target=lambda: result.append(func()))
+        t.start()
+        t.join(5)
+        return result[0]
+
+    def test_modes(self):
+        lock = ReadWriteLock()
+
+        with lock.shared():
+            # other readers are let in, writers are not
+            self.assertTrue(self._in_thread(lambda: lock.acquire_shared(blocking=False) and lock.release() is None))
+            self.assertFalse(self._in_thread(lambda: lock.acquire(blocking=False)))
+
+            # nested requests don't block, but readers can't write
+            with lock.shared():
+                pass
+            with self.assertRaises(RuntimeError):
+                lock.acquire()
+            with lock.caching():
+                with lock:
+                    pass
+
+        with lock:
+            with lock:
+                self.assertFalse(self._in_thread(lambda: lock.acquire_shared(blocking=False)))
+        self.assertTrue(self._in_thread(lambda: lock.acquire(blocking=False) and lock.release() is None))
+
+        with lock.upgradable():
+            self.assertTrue(self._in_thread(lambda: lock.acquire_shared(blocking=False) and lock.release() is None))
+            self.assertFalse(self._in_thread(lambda: lock.acquire(blocking=False)))
+            self.assertFalse(self._in_thread(lambda: lock.acquire_upgradable(blocking=False)))
+            with lock:
+                self.assertFalse(self._in_thread(lambda: lock.acquire_shared(blocking=False)))
+
+        with self.assertRaises(RuntimeError):
+            lock.release()
+
+    def test_caching(self):
+        lock = ReadWriteLock()
+
+        # readers fill caches one at a time
+        with lock.shared():
+            with lock.caching():
+                self.assertFalse(self._in_thread(lambda: lock._cache_lock.acquire(blocking=False)))
+                with lock.caching():
+                    pass
+            self.assertTrue(self._in_thread(lambda: lock._cache_lock.acquire(blocking=False) and
+                                            lock._cache_lock.release() is None))
+
+        # the upgradable lock is upgraded for the block
+        with lock.upgradable():
+            with lock.caching():
+                self.assertFalse(self._in_thread(lambda: lock.acquire_shared(blocking=False)))
+            self.assertTrue(self._in_thread(lambda: lock.acquire_shared(blocking=False) and lock.release() is None))
+
+    def test_consistency(self):
+        account = Account()
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                total = account.total()
+                if total != 100:
+                    errors.append(total)
+
+        def write():
+            for _i in range(50):
+                account.transfer(1)
+                account.transfer(-1)
+            done.set()
+
+        threads = [threading.Thread(target=read) for _i in range(4)]
+        threads.append(threading.Thread(target=write))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+
+        self.assertEqual(errors, [])
+        self.assertEqual((account.a, account.b), (100, 0))
+        self.assertGreater(account.max_readers, 1)
+
+    def test_reader_and_writer(self):
+        account = Account()
+        reading = threading.Event()
+        done_reading = threading.Event()
+        events = []
+
+        def read():
+            with blivet_lock.shared():
+                events.append("read")
+                reading.set()
+                done_reading.wait(5)
+                events.append("done reading")
+
+        def write():
+            reading.wait(5)
+            account.transfer(10)
+            events.append("written")
+
+        threads = [threading.Thread(target=read), threading.Thread(target=write)]
+        for t in threads:
+            t.start()
+
+        # the writer waits for the reader to finish
+        reading.wait(5)
+        for _i in range(500):
+            if blivet_lock._writers_waiting:
+                break
+            time.sleep(0.01)
+        self.assertEqual(blivet_lock._writers_waiting, 1)
+        self.assertEqual(events, ["read"])
+
+        done_reading.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(events, ["read", "done reading", "written"])
+        self.assertEqual(account.balances, (90, 10))
+
+        # a reader cannot write
+        with blivet_lock.shared():
+            with self.assertRaises(RuntimeError):
+                account.transfer(10)
+        self.assertEqual(account.balances, (90, 10))
+
+    def test_global_lock(self):
+        # the global lock is still usable as a plain re-entrant lock
+        with blivet_lock:
+            with blivet_lock:
+                pass
+        self.assertTrue(self._in_thread(lambda: blivet_lock.acquire(blocking=False) and blivet_lock.release() is None))
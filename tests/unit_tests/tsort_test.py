@@ -51,3 +51,15 @@ class TopologicalSortTestCase(unittest.TestCase):
         # verify that all ordering constraints are satisfied
         self.assertTrue(check_order(order, graph),
                         "ordering constraints not satisfied")
+
+    def test_tsort_graph(self):
+        items = [5, 2, 3, 4, 1]
+        edges = [(1, 2), (2, 4), (4, 5), (3, 2)]
+        graph = blivet.tsort.create_graph(items, edges)
+        self.assertEqual(graph['outgoing'], {1: [2], 2: [4], 3: [2], 4: [5], 5: []})
+
+        # the graph is left intact, so it can be sorted again
+        self.assertEqual(blivet.tsort.tsort(graph), [1, 3, 2, 4, 5])
+        self.assertEqual(graph['edges'], edges)
+        self.assertEqual(blivet.tsort.tsort(graph), [1, 3, 2, 4, 5])
+        self._tsort_test(graph)
@@ -33,11 +33,193 @@ class UdevTest(unittest.TestCase):
         blivet.udev.settle()
         self.assertTrue(blivet.udev.util.run_program.called)
 
+    @mock.patch('blivet.udev._udev_queue_empty', return_value=True)
+    @mock.patch('blivet.udev._get_uevent_seqnum', return_value=42)
+    def test_udev_settle_coalescing(self, get_seqnum, queue_empty):
+        import blivet.udev
+        blivet.udev.settle_stats.reset()
+
+        # nothing happened since the last settle
+        blivet.udev.settle()
+        blivet.udev.util.run_program.reset_mock()
+        blivet.udev.settle()
+        self.assertFalse(blivet.udev.util.run_program.called)
+        self.assertEqual(blivet.udev.settle_stats.skipped, 1)
+
+        # new uevents
+        get_seqnum.return_value = 43
+        with blivet.udev.settle_batch():
+            blivet.udev.settle()
+            with blivet.udev.settle_batch():
+                blivet.udev.settle()
+            blivet.udev.settle()
+            self.assertFalse(blivet.udev.util.run_program.called)
+        self.assertEqual(blivet.udev.util.run_program.call_count, 1)
+        self.assertEqual(blivet.udev.settle_stats.merged, 2)
+        self.assertEqual(blivet.udev.settle_stats.executed, 2)
+        self.assertEqual(blivet.udev.settle_stats.avoided, 3)
+
+        # no settle requested in the block
+        with blivet.udev.settle_batch():
+            pass
+        self.assertEqual(blivet.udev.util.run_program.call_count, 1)
+
+        # reading from the udev database runs the deferred settle first
+        get_seqnum.return_value = 44
+        with blivet.udev.settle_batch():
+            blivet.udev.settle()
+            with mock.patch.object(blivet.udev.global_udev, "list_devices", return_value=[]):
+                blivet.udev.get_devices()
+            self.assertEqual(blivet.udev.util.run_program.call_count, 2)
+            blivet.udev.settle_pending()
+        self.assertEqual(blivet.udev.util.run_program.call_count, 2)
+
+        # so does looking up the sysfs path of a device
+        from blivet.devices import StorageDevice
+        device = StorageDevice("sda", exists=True)
+        get_seqnum.return_value = 45
+        settled = []
+        with blivet.udev.settle_batch():
+            blivet.udev.settle()
+            with mock.patch("blivet.devices.storage.pyudev") as pyudev:
+                pyudev.Devices.from_device_file.side_effect = \
+                    lambda *args: settled.append(blivet.udev.util.run_program.call_count) or mock.DEFAULT
+                device.update_sysfs_path()
+            self.assertEqual(settled, [3])
+        self.assertEqual(blivet.udev.util.run_program.call_count, 3)
+
+    @mock.patch('blivet.udev._udev_queue_empty', return_value=True)
+    @mock.patch('blivet.udev._get_uevent_seqnum', return_value=42)
+    def test_udev_device_snapshot(self, get_seqnum, queue_empty):
+        import blivet.udev
+        properties = mock.MagicMock()
+        properties.keys.return_value = ["DEVTYPE", "ID_FS_TYPE"]
+        properties.get.side_effect = dict(DEVTYPE="disk", ID_FS_TYPE="ext4").get
+        device = mock.Mock(sys_name="sda", sys_path="/sys/block/sda", properties=properties)
+
+        cache = blivet.udev.snapshot_cache
+        cache.clear()
+        info = cache.snapshot(device, cache.validate())
+        self.assertEqual(dict(info), dict(SYS_NAME="sda", SYS_PATH="/sys/block/sda",
+                                          DEVTYPE="disk", ID_FS_TYPE="ext4"))
+        self.assertIn("DEVTYPE", info)
+        self.assertNotIn("DM_NAME", info)
+        self.assertIsNone(info.get("DM_NAME"))
+
+        # values are decoded once
+        properties.get.reset_mock()
+        self.assertEqual(blivet.udev.device_get_format(info), "ext4")
+        self.assertEqual(blivet.udev.device_get_format(info), "ext4")
+        self.assertEqual(properties.get.call_count, 0)
+
+        # derived values are cached
+        self.assertEqual(blivet.udev.device_get_name(info), "sda")
+        self.assertEqual(info.derived("name", lambda i: "other"), "sda")
+
+        # the snapshot is reused until a uevent is emitted
+        self.assertIs(cache.snapshot(device, cache.validate()), info)
+        self.assertIs(blivet.udev.get_device("/sys/block/sda"), info)
+
+        # the cache is validated once per enumeration
+        get_seqnum.reset_mock()
+        other = mock.Mock(sys_name="sdb", sys_path="/sys/block/sdb", properties=properties)
+        with mock.patch.object(blivet.udev.global_udev, "list_devices", return_value=[device, other]), \
+             mock.patch("blivet.udev.__is_ignored_blockdev", return_value=False):
+            self.assertIs(blivet.udev._list_devices()[0], info)
+        self.assertEqual(get_seqnum.call_count, 1)
+
+        get_seqnum.return_value = 43
+        self.assertIsNot(cache.snapshot(device, cache.validate()), info)
+
+        # nothing is cached while udev is processing uevents
+        queue_empty.return_value = False
+        self.assertIsNot(cache.snapshot(device, cache.validate()),
+                         cache.snapshot(device, cache.validate()))
+        cache.clear()
+
+    @mock.patch("blivet.udev.blockdev.dm.get_subsystem_from_name", return_value="LVM")
+    def test_udev_device_features(self, get_subsystem):
+        import blivet.udev
+        properties = mock.MagicMock()
+        properties.keys.return_value = ["DEVTYPE", "DM_NAME", "DM_UUID", "ID_FS_TYPE"]
+        properties.get.side_effect = dict(DEVTYPE="disk", DM_NAME="vg-lv", DM_UUID="LVM-abc",
+                                          ID_FS_TYPE="xfs").get
+        device = mock.Mock(sys_name="dm-0", sys_path="/sys/devices/virtual/block/dm-0",
+                           properties=properties)
+        info = blivet.udev.UdevDevice(device)
+        blivet.udev.os.path.exists.return_value = False
+
+        features = blivet.udev.device_get_features(info)
+        self.assertEqual(features, blivet.udev.DeviceFeatures(dm_subsystem="lvm", is_dm=True, is_md=False,
+                                                              is_partition=False, fs_type="xfs",
+                                                              disklabel_type=None))
+
+        # the device_is_* functions reuse the features computed for the snapshot
+        blivet.udev.os.path.exists.reset_mock()
+        self.assertTrue(blivet.udev.device_is_dm_lvm(info))
+        self.assertFalse(blivet.udev.device_is_dm_crypt(info))
+        self.assertFalse(blivet.udev.device_is_dm_luks(info))
+        self.assertFalse(blivet.udev.device_is_md(info))
+        self.assertFalse(blivet.udev.device_is_partition(info))
+        self.assertIs(blivet.udev.device_get_features(info), features)
+        self.assertEqual(get_subsystem.call_count, 1)
+        self.assertEqual(blivet.udev.os.path.exists.call_count, 0)
+
+        # plain dicts are not cached
+        data = dict(info)
+        self.assertEqual(blivet.udev.device_get_features(data), features)
+        self.assertEqual(get_subsystem.call_count, 2)
+
     def test_udev_trigger(self):
         import blivet.udev
         blivet.udev.trigger()
         self.assertTrue(blivet.udev.util.run_program.called)
 
+    @mock.patch('blivet.udev._udev_queue_empty', return_value=True)
+    @mock.patch('blivet.udev._get_uevent_seqnum', return_value=42)
+    @mock.patch('blivet.udev._list_devices')
+    def test_udev_resolve_devspec(self, list_devices, get_seqnum, queue_empty):  # pylint: disable=unused-argument
+        import blivet.udev
+        sda1 = dict(SYS_NAME="sda1", DEVNAME="/dev/sda1", ID_FS_UUID="1234", ID_FS_LABEL="boot",
+                    DEVLINKS="/dev/disk/by-uuid/1234 /dev/disk/by-label/boot")
+        dm = dict(SYS_NAME="dm-0", DEVNAME="/dev/dm-0", DM_NAME="fedora-root",
+                  DEVLINKS="/dev/mapper/fedora-root /dev/fedora/root")
+        list_devices.return_value = [sda1, dm]
+        blivet.udev.invalidate_devspec_index()
+
+        self.assertEqual(blivet.udev.resolve_devspec("UUID=1234"), "sda1")
+        self.assertEqual(blivet.udev.resolve_devspec("LABEL=boot"), "sda1")
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/sda1"), "sda1")
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/dm-0"), "fedora-root")
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/fedora/root", sysname=True), "dm-0")
+        self.assertIsNone(blivet.udev.resolve_devspec("UUID=5678"))
+        self.assertEqual(blivet.udev.resolve_glob("fedora-*"), ["fedora-root"])
+
+        # the udev database is only enumerated again after invalidation
+        self.assertEqual(list_devices.call_count, 1)
+        list_devices.return_value = [sda1]
+        queue_empty.return_value = False
+        blivet.udev.settle()
+        queue_empty.return_value = True
+        self.assertIsNone(blivet.udev.resolve_devspec("/dev/fedora/root"))
+        self.assertEqual(list_devices.call_count, 2)
+
+        # new uevents are noticed without a settle
+        list_devices.return_value = [sda1, dm]
+        get_seqnum.return_value = 43
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/fedora/root"), "fedora-root")
+        self.assertEqual(list_devices.call_count, 3)
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/fedora/root"), "fedora-root")
+        self.assertEqual(list_devices.call_count, 3)
+
+        # a name matches before symlinks of other devices, symlinks match the last device
+        sdb = dict(SYS_NAME="sdb", DEVNAME="/dev/sdb", DEVLINKS="/dev/sda1 /dev/disk/by-id/x")
+        sdc = dict(SYS_NAME="sdc", DEVNAME="/dev/sdc", DEVLINKS="/dev/disk/by-id/x")
+        list_devices.return_value = [sdb, sda1, sdc]
+        blivet.udev.invalidate_devspec_index()
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/sda1"), "sda1")
+        self.assertEqual(blivet.udev.resolve_devspec("/dev/disk/by-id/x"), "sdc")
+
     @mock.patch('blivet.udev.device_is_cdrom', return_value=False)
     @mock.patch('blivet.udev.device_is_partition', return_value=False)
     @mock.patch('blivet.udev.device_is_dm_partition', return_value=False)
@@ -1,6 +1,8 @@
 # pylint: skip-file
 import os
 import tempfile
+import threading
+import time
 import unittest
 from unittest import mock
 from unittest.mock import patch
@@ -45,6 +47,53 @@ class MiscTest(unittest.TestCase):
         in_virt = not util.run_program(["systemd-detect-virt", "--vm"])
         self.assertEqual(util.detect_virt(), in_virt)
 
+    def test_run_programs_parallel(self):
+        self.assertEqual(util.run_programs_parallel([]), [])
+
+        results = util.run_programs_parallel([["echo", "first"], ["false"], ["echo", "third"]], max_workers=2)
+        self.assertEqual(results, [(0, "first\n"), (1, ""), (0, "third\n")])
+
+        # the programs run concurrently, not one after another: all of them
+        # have to be running to get past the barrier
+        barrier = threading.Barrier(4, timeout=10)
+
+        def run_program(argv, **kwargs):
+            barrier.wait()
+            return (0, argv[1])
+
+        with patch("blivet.util._run_program", side_effect=run_program):
+            results = util.run_programs_parallel([["echo", str(i)] for i in range(4)], max_workers=4)
+        self.assertEqual(results, [(0, str(i)) for i in range(4)])
+
+        # but not more of them than allowed
+        lock = threading.Lock()
+        running = []
+        most_running = []
+
+        def run_program_counting(argv, **kwargs):
+            with lock:
+                running.append(argv)
+                most_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(argv)
+            return (0, "")
+
+        with patch("blivet.util._run_program", side_effect=run_program_counting):
+            util.run_programs_parallel([["echo", str(i)] for i in range(6)], max_workers=2)
+        self.assertLessEqual(max(most_running), 2)
+
+    def test_run_program_chroot(self):
+        # preexec_fn is not thread-safe, it is only used to chroot
+        with mock.patch("blivet.util.subprocess.Popen") as popen:
+            popen.return_value.communicate.return_value = (b"", b"")
+            popen.return_value.returncode = 0
+            util.run_program(["true"])
+            self.assertIsNone(popen.call_args[1]["preexec_fn"])
+
+            util.run_program(["true"], root="/mnt/sysroot")
+            self.assertIsNotNone(popen.call_args[1]["preexec_fn"])
+
 
 class TestDefaultNamedtuple(unittest.TestCase):
     def test_default_namedtuple(self):